@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class DocumentConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'Document'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .db import configure_sqlite
+
+        connection_created.connect(configure_sqlite, dispatch_uid='Document.db.configure_sqlite')
+
+        if getattr(settings, 'CONVERSION_RESUME_ON_START', True):
+            from django.core.signals import request_started
+
+            from .jobs import RESUME_DISPATCH_UID, resume_jobs_on_first_request
+
+            request_started.connect(resume_jobs_on_first_request, dispatch_uid=RESUME_DISPATCH_UID)
@@ -0,0 +1,117 @@
+"""
+Async variants of the read-heavy endpoints, for deployments served over ASGI.
+
+They return the same bodies and headers as their views.py counterparts but are
+plain Django async views (DRF views are synchronous): queries go through the
+async ORM, files are read on worker threads and PyMuPDF runs on a worker
+thread, so one process keeps serving other requests while any of them waits.
+Under WSGI they still work, but Django then runs each of them in an event loop
+of its own, so the synchronous views are the better fit there.
+"""
+import asyncio
+
+from django.http import Http404, JsonResponse
+from django.views.decorators.http import require_safe
+from rest_framework import status
+from rest_framework.request import Request
+
+from .db import reads_from_replica
+from .filters import IMAGE_FILTER_FIELDS, PDF_FILTER_FIELDS, filter_queryset, get_ordering
+from .media import accel_response, aiter_range, amedia_access_allowed, file_response, normalize_name, stat_media_file
+from .models import Image, PDF
+from .pagination import KeysetPagination
+from .rendering import aensure_page_table
+from .serializers import ImageSerializer, PDFSerializer
+from .views import _page_table_body, _page_table_rows, _page_table_window
+
+
+@require_safe
+@reads_from_replica
+async def image_list_async(request):
+    """
+    Async variant of image_list.
+    """
+    return await _list(Request(request), Image, IMAGE_FILTER_FIELDS, ImageSerializer)
+
+
+@require_safe
+@reads_from_replica
+async def pdf_list_async(request):
+    """
+    Async variant of pdf_list.
+    """
+    return await _list(Request(request), PDF, PDF_FILTER_FIELDS, PDFSerializer)
+
+
+async def _list(request, model, fields, serializer_class):
+    try:
+        queryset = filter_queryset(model.objects.all(), request.query_params, fields)
+        paginator = KeysetPagination(get_ordering(request.query_params, fields))
+        rows = await paginator.apaginate_queryset(queryset, request)
+        serializer = serializer_class(rows, many=True)
+        return JsonResponse(serializer.data, safe=False, headers=paginator.get_paginated_headers())
+    except ValueError as ve:
+        return JsonResponse({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return JsonResponse({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_safe
+@reads_from_replica
+async def image_detail_async(request, id):
+    """
+    Async variant of image_detail.
+    """
+    try:
+        image = await Image.objects.aget(id=id)
+        return JsonResponse(ImageSerializer(image).data, status=status.HTTP_200_OK)
+    except Image.DoesNotExist:
+        return JsonResponse({"error": "Image not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return JsonResponse(
+            {"error": f"An internal error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@require_safe
+@reads_from_replica
+async def pdf_detail_async(request, id):
+    """
+    Async variant of pdf_detail, including ?include=pages. A page table missing
+    from an older PDF is read on a worker thread.
+    """
+    request = Request(request)
+    include_pages = 'pages' in request.query_params.get('include', '').split(',')
+    if include_pages:
+        try:
+            pages_after, pages_size = _page_table_window(request)
+        except ValueError as ve:
+            return JsonResponse({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        pdf = await PDF.objects.aget(id=id)
+        data = PDFSerializer(pdf).data
+        if include_pages:
+            await aensure_page_table(pdf)
+            rows = [row async for row in _page_table_rows(pdf, pages_after, pages_size)]
+            data['pages'] = _page_table_body(request, pdf, rows, pages_size)
+        return JsonResponse(data, status=status.HTTP_200_OK)
+    except PDF.DoesNotExist:
+        return JsonResponse({"error": "PDF not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return JsonResponse(
+            {"error": f"An internal error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+
+@require_safe
+async def serve_media_async(request, name):
+    """
+    Async variant of serve_media. Without MEDIA_ACCEL, files and byte ranges are
+    streamed a block at a time from worker threads.
+    """
+    name = normalize_name(name)
+    if name is None or not await amedia_access_allowed(name):
+        raise Http404("Media file not found.")
+    path, stat = await asyncio.to_thread(stat_media_file, name)
+    return accel_response(name, path) or file_response(request, name, path, stat, read_range=aiter_range)
@@ -0,0 +1,95 @@
+"""
+Database concurrency settings.
+
+SQLite connections are tuned as they open (connection_created): WAL journaling
+lets readers carry on while a conversion writes its page rows, busy_timeout
+makes a writer wait for the lock instead of failing with "database is locked",
+and synchronous=NORMAL only syncs the WAL at checkpoints, which is safe in WAL
+mode. The SQLite backend also starts its transactions with BEGIN IMMEDIATE (see
+the DATABASES setting), so a transaction that reads before it writes takes the
+write lock up front and waits for it, rather than failing when it upgrades.
+
+ReadReplicaRouter sends the reads of the list and detail views to the
+'replica' database when one is configured. Views opt in with
+@reads_from_replica; everything else, and every write, uses 'default', so a
+client reading back what it just wrote is never served a lagging replica
+except through the list and detail endpoints.
+"""
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+
+REPLICA = 'replica'
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """
+    connection_created receiver applying the SQLITE_* settings to new SQLite connections.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"PRAGMA journal_mode={getattr(settings, 'SQLITE_JOURNAL_MODE', 'WAL')}")
+        cursor.execute(f"PRAGMA busy_timeout={int(getattr(settings, 'SQLITE_BUSY_TIMEOUT', 5000))}")
+        cursor.execute(f"PRAGMA synchronous={getattr(settings, 'SQLITE_SYNCHRONOUS', 'NORMAL')}")
+
+
+@contextmanager
+def read_from_replica():
+    """
+    Route the reads made inside the block to the replica, when there is one.
+    """
+    token = _use_replica.set(True)
+    try:
+        yield
+    finally:
+        _use_replica.reset(token)
+
+
+def reads_from_replica(view):
+    """
+    Decorator routing the reads of a view, sync or async, to the replica.
+    """
+    if iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return await view(*args, **kwargs)
+    else:
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with read_from_replica():
+                return view(*args, **kwargs)
+    return wrapper
+
+
+class ReadReplicaRouter:
+    """
+    Send reads made under read_from_replica to the replica database, and
+    everything else to 'default'. The replica mirrors 'default', so relations
+    between the two are allowed and it is never migrated.
+    """
+    replica = REPLICA
+
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and self.replica in settings.DATABASES:
+            return self.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if {obj1._state.db, obj2._state.db} <= {'default', self.replica}:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db == self.replica:
+            return False
+        return None
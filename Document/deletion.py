@@ -0,0 +1,169 @@
+"""
+Deletion of images and PDFs, one or many at a time.
+
+The rows are deleted in one transaction, and everything stored for them (the
+uploaded files, derivatives, tile pyramids and transformed files) is queued in
+the FileDeletion table in that same transaction. A background sweeper removes
+the queued files afterwards, so the cost of a bulk delete does not depend on
+the number of files. Nothing is queued while another row still uses it, and
+the sweeper checks again before removing anything, so a file that has been
+reused since it was queued is kept.
+
+An upload reusing a stored blob (see uploads.create_document) deletes the
+queue entries of that blob in the transaction inserting its row, and the
+sweeper locks the entries it processes until their files are gone: either the
+upload waits for the sweeper and then finds the blob missing, or the sweeper
+no longer sees the entry.
+"""
+from django.db import transaction
+from django.core.files.storage import default_storage
+
+from .jobs import run_in_background
+from .models import FileDeletion, Image, PDF, RenderedPage
+from .tiles import delete_pyramid
+from .transforms import delete_transformed_files, transforms_key
+
+# Number of ids or names per query, below the parameter limits of every backend
+BATCH_SIZE = 500
+
+
+def _batches(values, size=BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _referenced_files(names):
+    """
+    The names among `names` that an Image or PDF row still points at.
+    """
+    referenced = set()
+    for batch in _batches(names):
+        for model in (Image, PDF):
+            referenced.update(model.objects.filter(file__in=batch).values_list('file', flat=True))
+    return referenced
+
+
+def _image_key(sha256, transforms):
+    key = transforms_key(transforms)
+    return f'{sha256}-{key}' if key else sha256
+
+
+def _used_keys(digests):
+    """
+    Content keys (see transforms.content_key) of the images with one of the given digests.
+    """
+    used = set()
+    for batch in _batches(digests):
+        for sha256, transforms in Image.objects.filter(sha256__in=batch).values_list('sha256', 'transforms'):
+            used.add(_image_key(sha256, transforms))
+    return used
+
+
+def delete_images(queryset):
+    """
+    Delete the images of a queryset in one transaction and queue their files
+    for the sweeper. Returns the number of images deleted.
+    """
+    with transaction.atomic():
+        rows = list(queryset.values_list('id', 'file', 'sha256', 'transforms', 'derivatives'))
+        for batch in _batches([row[0] for row in rows]):
+            Image.objects.filter(id__in=batch).delete()
+
+        files = {row[1] for row in rows if row[1]}
+        derivatives = {entry['file'] for row in rows for entry in (row[4] or {}).values()}
+        keys = {_image_key(row[2], row[3]): bool(row[3]) for row in rows if row[2]}
+        used_keys = _used_keys({row[2] for row in rows if row[2]})
+
+        queue = [FileDeletion(name=name) for name in (files - _referenced_files(files)) | derivatives]
+        for key, transformed in keys.items():
+            if key in used_keys:
+                continue
+            queue.append(FileDeletion(kind=FileDeletion.KIND_TILES, name=key))
+            if transformed:
+                queue.append(FileDeletion(kind=FileDeletion.KIND_TRANSFORMED, name=key))
+        FileDeletion.objects.bulk_create(queue, batch_size=BATCH_SIZE)
+        if queue:
+            schedule_sweep()
+    return len(rows)
+
+
+def delete_pdfs(queryset):
+    """
+    Delete the PDFs of a queryset in one transaction and queue their files for
+    the sweeper. Returns the number of PDFs deleted.
+
+    Pages rendered from a deleted PDF are still valid for a remaining PDF with
+    the same content and are handed over to it; otherwise the page images are
+    deleted with them.
+    """
+    with transaction.atomic():
+        rows = list(queryset.values_list('id', 'file', 'sha256'))
+        deleted_ids = {row[0] for row in rows}
+
+        # Oldest remaining PDF of each content
+        successors = {}
+        for batch in _batches({row[2] for row in rows if row[2]}):
+            for sha256, pdf_id in PDF.objects.filter(sha256__in=batch).order_by('-id').values_list('sha256', 'id'):
+                if pdf_id not in deleted_ids:
+                    successors[sha256] = pdf_id
+
+        orphaned_ids = []
+        for pdf_id, _, sha256 in rows:
+            if sha256 in successors:
+                RenderedPage.objects.filter(pdf_id=pdf_id).update(pdf_id=successors[sha256])
+            else:
+                orphaned_ids.append(pdf_id)
+        page_image_ids = []
+        for batch in _batches(orphaned_ids):
+            page_image_ids.extend(RenderedPage.objects.filter(pdf_id__in=batch).values_list('image_id', flat=True))
+
+        for batch in _batches(deleted_ids):
+            PDF.objects.filter(id__in=batch).delete()
+        for batch in _batches(page_image_ids):
+            delete_images(Image.objects.filter(id__in=batch))
+
+        files = {row[1] for row in rows if row[1]}
+        queue = [FileDeletion(name=name) for name in files - _referenced_files(files)]
+        FileDeletion.objects.bulk_create(queue, batch_size=BATCH_SIZE)
+        if queue:
+            schedule_sweep()
+    return len(rows)
+
+
+def schedule_sweep():
+    """
+    Run the sweeper on the background worker pool once the current transaction has committed.
+    """
+    run_in_background(sweep_deleted_files)
+
+
+def sweep_deleted_files():
+    """
+    Remove the queued files, a batch at a time, and their queue entries.
+    Entries whose file is in use again are dropped without removing it.
+    Returns the number of entries processed.
+    """
+    processed = 0
+    while True:
+        # The entries stay locked until their files are gone, see the module docstring
+        with transaction.atomic():
+            entries = list(FileDeletion.objects.select_for_update().order_by('id')[:BATCH_SIZE])
+            if not entries:
+                return processed
+
+            names = [entry.name for entry in entries if entry.kind == FileDeletion.KIND_FILE]
+            referenced = _referenced_files(names)
+            keys = [entry.name for entry in entries if entry.kind != FileDeletion.KIND_FILE]
+            used_keys = _used_keys({key.split('-')[0] for key in keys})
+
+            for entry in entries:
+                if entry.kind == FileDeletion.KIND_FILE and entry.name not in referenced:
+                    default_storage.delete(entry.name)
+                elif entry.kind == FileDeletion.KIND_TILES and entry.name not in used_keys:
+                    delete_pyramid(entry.name)
+                elif entry.kind == FileDeletion.KIND_TRANSFORMED and entry.name not in used_keys:
+                    delete_transformed_files(entry.name)
+
+            FileDeletion.objects.filter(id__in=[entry.id for entry in entries]).delete()
+        processed += len(entries)
@@ -0,0 +1,46 @@
+from datetime import timezone as dt_timezone
+
+from django.core.exceptions import ValidationError
+from django.utils import timezone
+
+# Fields of each model that the list endpoints can filter and order on.
+# Every field is backed by an index on (field, id), see the model Meta.
+IMAGE_FILTER_FIELDS = ('uploaded_at', 'width', 'height', 'channels')
+PDF_FILTER_FIELDS = ('uploaded_at', 'num_pages', 'page_width', 'page_height')
+
+# Query parameter suffixes accepted for each field, e.g. ?width__gte=4000
+LOOKUPS = ('', 'gt', 'gte', 'lt', 'lte')
+
+
+def filter_queryset(queryset, params, fields):
+    """
+    Apply the exact and range filters found in the query parameters.
+    Raises ValueError when a value cannot be parsed for its field.
+    """
+    for name in fields:
+        field = queryset.model._meta.get_field(name)
+        for lookup in LOOKUPS:
+            key = f'{name}__{lookup}' if lookup else name
+            value = params.get(key)
+            if value is None:
+                continue
+            try:
+                value = field.to_python(value)
+            except ValidationError:
+                raise ValueError(f"Invalid value for {key}: {params.get(key)}")
+            if value is None:
+                raise ValueError(f"Invalid value for {key}: {params.get(key)}")
+            if hasattr(value, 'tzinfo') and timezone.is_naive(value):
+                value = timezone.make_aware(value, dt_timezone.utc)
+            queryset = queryset.filter(**{key: value})
+    return queryset
+
+
+def get_ordering(params, fields, default='uploaded_at'):
+    """
+    Return the 'ordering' query parameter, checked against the allowed fields.
+    """
+    ordering = params.get('ordering') or default
+    if ordering.lstrip('-') not in fields:
+        raise ValueError(f"Invalid ordering. Supported fields: {', '.join(fields)}")
+    return ordering
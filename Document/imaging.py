@@ -0,0 +1,162 @@
+import io
+import math
+import posixpath
+import uuid
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image as PILImage
+
+from .jobs import run_in_background
+from .models import Image
+from .storage import sharded_path
+from .transforms import apply_transforms, scale_transforms
+from .uploads import large_image_limit
+
+
+def derivative_sizes():
+    """
+    Longest-side sizes, in pixels, of the derivatives generated for every image.
+    """
+    return sorted(getattr(settings, 'IMAGE_DERIVATIVE_SIZES', [128, 512, 2048]), reverse=True)
+
+
+def derivative_name(image, size, extension):
+    """
+    Storage name of a new derivative of an image: derivatives/ab/cd/<image id>_<uuid>_<size><extension>.
+    """
+    return sharded_path('derivatives', f'{image.pk}_{uuid.uuid4()}_{size}{extension}')
+
+
+def derivative_owner(name):
+    """
+    The id of the image a derivative was made for, from its storage name, or
+    None for names of the older <uuid>_<size> layout.
+    """
+    parts = posixpath.basename(name).split('_')
+    if len(parts) == 3 and parts[0].isdigit():
+        return int(parts[0])
+    return None
+
+
+def downscale(pil_image, size):
+    """
+    Return a copy of the image whose longest side is `size` pixels.
+
+    A box reduction by the largest integer factor is done first with reduce(),
+    which is much cheaper than resampling from full resolution; the final
+    resize then only covers the remaining factor.
+    """
+    scale = size / max(pil_image.size)
+    target = (max(1, round(pil_image.width * scale)), max(1, round(pil_image.height * scale)))
+    factor = min(pil_image.width // target[0], pil_image.height // target[1])
+    if factor >= 2:
+        pil_image = pil_image.reduce(factor)
+    return pil_image.resize(target, PILImage.LANCZOS)
+
+
+def _encode_derivative(pil_image):
+    """
+    Encode a derivative as JPEG, or PNG when it has transparency.
+    Returns (bytes, extension).
+    """
+    buffer = io.BytesIO()
+    if pil_image.mode in ('RGBA', 'LA'):
+        pil_image.save(buffer, format='PNG', optimize=True)
+        return buffer.getvalue(), '.png'
+    if pil_image.mode not in ('RGB', 'L'):
+        pil_image = pil_image.convert('RGB')
+    pil_image.save(buffer, format='JPEG', quality=85)
+    return buffer.getvalue(), '.jpg'
+
+
+def delete_derivatives(image):
+    """
+    Delete the stored derivative files of an image.
+    """
+    delete_derivatives_files(image.derivatives)
+
+
+def delete_derivatives_files(derivatives):
+    """
+    Delete the stored files of a `derivatives` mapping, as recorded on Image rows.
+    """
+    for entry in (derivatives or {}).values():
+        default_storage.delete(entry['file'])
+
+
+def generate_derivatives(image):
+    """
+    Build the downscaled copies of an image and record them on the Image row.
+
+    JPEGs are decoded with draft(), so the decoder already downsamples by a power
+    of two towards the largest derivative size. Each smaller size is then made from
+    the previous one instead of from the original. The image's transforms are
+    applied to the decoded draft, so derivatives never need the transformed
+    file. Sizes that are not smaller than the image itself are skipped.
+
+    Returns the derivatives recorded on the row. When the row was deleted or
+    changed meanwhile, the files just written are deleted and the row is left alone.
+    """
+    sizes = [size for size in derivative_sizes() if size < max(image.width or 0, image.height or 0)]
+
+    derivatives = {}
+    if sizes:
+        image.file.open('rb')
+        try:
+            with large_image_limit(), PILImage.open(image.file) as pil_image:
+                # Decode at the scale that makes the transformed image just larger than the biggest size
+                source_width, source_height = pil_image.size
+                factor = sizes[0] / max(image.width, image.height)
+                pil_image.draft('RGB', (math.ceil(source_width * factor), math.ceil(source_height * factor)))
+                pil_image.load()
+                if pil_image.mode == 'P':
+                    pil_image = pil_image.convert('RGBA' if 'transparency' in pil_image.info else 'RGB')
+
+                # Transforms are applied to the draft, which is much smaller than the original
+                transforms = scale_transforms(image.transforms, pil_image.width / source_width)
+                current = apply_transforms(pil_image, transforms)
+                for size in sizes:
+                    if max(current.size) > size:
+                        current = downscale(current, size)
+                    data, extension = _encode_derivative(current)
+                    filename = derivative_name(image, size, extension)
+                    name = default_storage.save(filename, ContentFile(data))
+                    derivatives[str(size)] = {'file': name, 'width': current.width, 'height': current.height}
+        finally:
+            image.file.close()
+
+    # The row is read again under lock: the image may have been deleted or changed
+    # (new file, new transforms, derivatives of another run) while it was decoded
+    with transaction.atomic():
+        current = Image.objects.select_for_update().filter(pk=image.pk).values('file', 'transforms', 'derivatives').first()
+        stale = current is None or current['file'] != image.file.name or current['transforms'] != image.transforms
+        if not stale:
+            Image.objects.filter(pk=image.pk).update(derivatives=derivatives)
+
+    if stale:
+        # Drop what was built from the outdated row, the current one is left as it is
+        delete_derivatives_files(derivatives)
+        image.derivatives = current['derivatives'] if current is not None else {}
+        return image.derivatives
+
+    image.derivatives = derivatives
+    delete_derivatives_files(current['derivatives'])
+    return derivatives
+
+
+def _generate_derivatives_by_id(image_id):
+    image = Image.objects.filter(pk=image_id).first()
+    if image is not None:
+        generate_derivatives(image)
+
+
+def schedule_derivatives(image):
+    """
+    Generate the derivatives of an image on the background worker pool, off the
+    request path, once the current transaction has committed.
+    """
+    run_in_background(_generate_derivatives_by_id, image.pk)
+
@@ -0,0 +1,197 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import ConversionJob, ConversionJobPage
+from .rendering import convert_pdf
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+RESUME_DISPATCH_UID = 'Document.jobs.resume_jobs_on_first_request'
+_process_started_at = timezone.now()
+
+
+def _get_executor():
+    """
+    Return the process-wide worker pool, creating it on first use.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'CONVERSION_WORKERS', 2),
+                thread_name_prefix='conversion-worker',
+            )
+        return _executor
+
+
+def shutdown_executor():
+    """
+    Wait for the tasks submitted to the worker pool, then drop it. A new pool is
+    created on the next submission.
+    """
+    global _executor
+    with _executor_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+
+
+def enqueue_conversion(pdf, options=None):
+    """
+    Record a pending conversion job for a PDF and hand it to the local worker pool
+    once the surrounding transaction has committed.
+    """
+    job = ConversionJob.objects.create(pdf=pdf, pages_total=pdf.num_pages, render_options=options or {})
+    transaction.on_commit(lambda: _get_executor().submit(run_job, job.id))
+    return job
+
+
+def run_in_background(func, *args):
+    """
+    Run func(*args) on the local worker pool once the surrounding transaction has
+    committed. For best-effort work that does not need a job row.
+    """
+    transaction.on_commit(lambda: _get_executor().submit(_run_task, func, *args))
+
+
+def _run_task(func, *args):
+    try:
+        func(*args)
+    except Exception:
+        logger.exception("Background task %s failed", func.__name__)
+    finally:
+        _release_connections()
+
+
+def _release_connections():
+    """
+    Close the stale connections of a worker thread between tasks. A task run
+    inline inside a transaction (e.g. by run_pending_jobs from a test) leaves
+    the caller's connection open.
+    """
+    if not connection.in_atomic_block:
+        close_old_connections()
+
+
+def _claimable_jobs():
+    """
+    Jobs a worker may claim: pending ones, and running ones whose worker has
+    not reported progress for CONVERSION_JOB_STALE_SECONDS, i.e. whose process died.
+    """
+    stale_before = timezone.now() - timedelta(seconds=getattr(settings, 'CONVERSION_JOB_STALE_SECONDS', 600))
+    return ConversionJob.objects.filter(
+        Q(status=ConversionJob.STATUS_PENDING)
+        | Q(status=ConversionJob.STATUS_RUNNING, heartbeat_at__lt=stale_before)
+    )
+
+
+def claim_job(job_id):
+    """
+    Atomically move a pending or stale job to running, recording when it started.
+    Returns False when another live worker has already claimed it.
+    """
+    now = timezone.now()
+    claimed = _claimable_jobs().filter(id=job_id).update(
+        status=ConversionJob.STATUS_RUNNING, started_at=now, heartbeat_at=now, attempts=F('attempts') + 1
+    )
+    return claimed == 1
+
+
+def run_job(job_id):
+    """
+    Render the PDF of a conversion job, recording progress as pages complete.
+
+    The job table is the queue: any worker thread or process_conversion_jobs
+    command can run a job, and claim_job makes sure it only runs once at a
+    time. Every page rendered refreshes the job's heartbeat; a job whose
+    heartbeat goes stale is claimed again, up to CONVERSION_JOB_MAX_ATTEMPTS times.
+    """
+    try:
+        if not claim_job(job_id):
+            return
+
+        job = ConversionJob.objects.select_related('pdf').get(id=job_id)
+        max_attempts = getattr(settings, 'CONVERSION_JOB_MAX_ATTEMPTS', 3)
+        if job.attempts > max_attempts:
+            ConversionJob.objects.filter(id=job_id).update(
+                status=ConversionJob.STATUS_FAILED, finished_at=timezone.now(),
+                error=f"Gave up after {max_attempts} interrupted attempts",
+            )
+            return
+
+        def progress(pages_done, pages_total):
+            ConversionJob.objects.filter(id=job_id).update(
+                pages_done=pages_done, pages_total=pages_total, heartbeat_at=timezone.now()
+            )
+
+        try:
+            images = convert_pdf(job.pdf, progress=progress, options=job.render_options)
+        except Exception as e:
+            logger.exception("Conversion job %s failed", job_id)
+            ConversionJob.objects.filter(id=job_id).update(
+                status=ConversionJob.STATUS_FAILED, error=str(e), finished_at=timezone.now()
+            )
+            return
+
+        with transaction.atomic():
+            ConversionJobPage.objects.filter(job_id=job_id).delete()
+            ConversionJobPage.objects.bulk_create([
+                ConversionJobPage(job_id=job_id, image=image, page_number=page_number)
+                for page_number, image in enumerate(images, start=1)
+            ])
+        ConversionJob.objects.filter(id=job_id).update(status=ConversionJob.STATUS_DONE, finished_at=timezone.now())
+
+    finally:
+        # Worker threads hold their own connections, release them between jobs
+        _release_connections()
+
+
+def run_pending_jobs():
+    """
+    Run every pending or stale job in the calling thread. Returns the number of jobs run.
+    """
+    job_ids = list(_claimable_jobs().order_by('created_at').values_list('id', flat=True))
+    for job_id in job_ids:
+        run_job(job_id)
+    return len(job_ids)
+
+
+def resume_jobs(created_before=None):
+    """
+    Hand the pending and stale jobs to the local worker pool, e.g. the jobs
+    left behind when the web process restarted. Returns the number of jobs submitted.
+    """
+    jobs = _claimable_jobs()
+    if created_before is not None:
+        jobs = jobs.filter(created_at__lt=created_before)
+    job_ids = list(jobs.order_by('created_at').values_list('id', flat=True))
+    for job_id in job_ids:
+        _get_executor().submit(run_job, job_id)
+    return len(job_ids)
+
+
+def resume_jobs_on_first_request(sender, **kwargs):
+    """
+    request_started receiver resuming the jobs once, when the process serves its
+    first request. Jobs created since the process started were submitted by
+    enqueue_conversion already and are left alone.
+    """
+    request_started.disconnect(dispatch_uid=RESUME_DISPATCH_UID)
+    try:
+        count = resume_jobs(created_before=_process_started_at)
+    except Exception:
+        logger.exception("Could not resume the conversion jobs")
+        return
+    if count:
+        logger.info("Resumed %s conversion job(s)", count)
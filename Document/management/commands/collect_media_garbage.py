@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from Document.media_gc import collect_garbage
+
+
+class Command(BaseCommand):
+    help = "Report and delete stored files, derivatives, transformed files and tile pyramids that no row references."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Only report the unreferenced files.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Files checked per query.")
+        parser.add_argument('--grace', type=float, default=None, help="Seconds during which a new file is kept.")
+        parser.add_argument('--interval', type=float, default=None, help="Run again every this many seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            report = collect_garbage(options['dry_run'], options['batch_size'], options['grace'])
+            self.stdout.write(
+                f"Scanned {report.scanned} file(s), {report.orphaned} unreferenced "
+                f"({filesizeformat(report.orphaned_bytes)}), {report.deleted} deleted"
+            )
+            if options['interval'] is None:
+                return
+            time.sleep(options['interval'])
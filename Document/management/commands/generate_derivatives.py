@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from Document.imaging import generate_derivatives
+from Document.models import Image
+
+
+class Command(BaseCommand):
+    help = "Generate the downscaled derivatives of images that do not have them yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Regenerate the derivatives of every image.")
+
+    def handle(self, *args, **options):
+        images = Image.objects.all() if options['all'] else Image.objects.filter(derivatives={})
+        count = 0
+        for image in images.iterator(chunk_size=500):
+            try:
+                generate_derivatives(image)
+                count += 1
+            except Exception as e:
+                self.stderr.write(f"Image {image.pk}: {e}")
+        self.stdout.write(f"Generated derivatives for {count} image(s)")
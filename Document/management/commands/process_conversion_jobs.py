@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Document.jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = "Run pending PDF conversion jobs, and jobs left stale by a dead worker, from the job table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Run the pending jobs once and exit.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to wait between polls.")
+
+    def handle(self, *args, **options):
+        while True:
+            count = run_pending_jobs()
+            if count:
+                self.stdout.write(f"Processed {count} conversion job(s)")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
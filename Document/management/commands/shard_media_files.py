@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from Document.models import Image, PDF
+from Document.storage import shard_derivative_files, shard_stored_files
+
+
+class Command(BaseCommand):
+    help = "Move stored files from the flat media layout to the sharded one and update their rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows moved per transaction.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        steps = [
+            ('image', shard_stored_files(Image, batch_size)),
+            ('PDF', shard_stored_files(PDF, batch_size)),
+            ('derivative', shard_derivative_files(Image, batch_size)),
+        ]
+        for label, batches in steps:
+            moved = updated = 0
+            for batch_moved, batch_updated in batches:
+                moved += batch_moved
+                updated += batch_updated
+                self.stdout.write(f"Moved {moved} {label} file(s) so far", ending='\r')
+            self.stdout.write(f"Moved {moved} {label} file(s), updated {updated} row(s)")
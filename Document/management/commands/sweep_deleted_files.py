@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from Document.deletion import sweep_deleted_files
+
+
+class Command(BaseCommand):
+    help = "Remove the files queued for deletion by bulk deletes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Sweep the queue once and exit.")
+        parser.add_argument('--interval', type=float, default=60.0, help="Seconds to wait between sweeps.")
+
+    def handle(self, *args, **options):
+        while True:
+            count = sweep_deleted_files()
+            if count:
+                self.stdout.write(f"Processed {count} queued deletion(s)")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
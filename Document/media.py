@@ -0,0 +1,228 @@
+"""
+Delivery of stored media files.
+
+serve_media checks that a file may be served, then either hands the transfer
+to the front proxy (MEDIA_ACCEL: 'nginx' for X-Accel-Redirect, 'sendfile' for
+the X-Sendfile header of Apache and lighttpd) or sends the file itself. The
+proxy then handles Range and conditional requests on its own. Without a proxy
+the view answers conditional requests from the file's ETag and Last-Modified,
+sends single byte ranges with 206 Partial Content, and sends whole files through
+FileResponse, which lets the WSGI server use sendfile().
+
+The async view reads files on worker threads instead, so the event loop is
+never blocked on the disk.
+"""
+import asyncio
+import mimetypes
+import os
+import posixpath
+import re
+from collections import namedtuple
+from stat import S_ISREG
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+
+from .models import Image, PDF
+
+# Block size used when streaming a byte range
+RANGE_BLOCK_SIZE = 64 * 1024
+
+# Directories whose files can only be served while a row references them
+REFERENCED_DIRECTORIES = {
+    Image._meta.get_field('file').upload_to.directory: Image,
+    PDF._meta.get_field('file').upload_to.directory: PDF,
+}
+# Directories of files derived from images, served while they exist
+DERIVED_DIRECTORIES = ('derivatives', 'transformed')
+
+ByteRange = namedtuple('ByteRange', ['start', 'end'])  # Inclusive bounds
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def normalize_name(name):
+    """
+    Return the storage name of a media path, or None when it escapes the media directory.
+    """
+    if not name or '\\' in name or '\0' in name:
+        return None
+    normalized = posixpath.normpath(name)
+    if normalized.startswith(('/', '../')) or normalized in ('.', '..'):
+        return None
+    return normalized
+
+
+def media_access_allowed(name):
+    """
+    Whether a stored file may be served. Uploads are only served while an image
+    or PDF references them, so the files of deleted documents are not served
+    while they wait for the sweeper; derived files follow their own caches.
+    """
+    directory = name.split('/', 1)[0]
+    model = REFERENCED_DIRECTORIES.get(directory)
+    if model is not None:
+        return model.objects.filter(file=name).exists()
+    return directory in DERIVED_DIRECTORIES
+
+
+async def amedia_access_allowed(name):
+    """
+    media_access_allowed for async views.
+    """
+    directory = name.split('/', 1)[0]
+    model = REFERENCED_DIRECTORIES.get(directory)
+    if model is not None:
+        return await model.objects.filter(file=name).aexists()
+    return directory in DERIVED_DIRECTORIES
+
+
+def stat_media_file(name):
+    """
+    The local path and os.stat result of a stored file. Raises Http404 unless it is a regular file.
+    """
+    try:
+        path = default_storage.path(name)
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("Media file not found.")
+    if not S_ISREG(stat.st_mode):
+        raise Http404("Media file not found.")
+    return path, stat
+
+
+def content_type(name):
+    guessed, encoding = mimetypes.guess_type(name)
+    return guessed if guessed and not encoding else 'application/octet-stream'
+
+
+def parse_range(header, size):
+    """
+    Parse a Range header against a file size.
+
+    Returns a ByteRange, None when the header is absent or not a single byte
+    range (the whole file is then sent), or False when the range cannot be
+    satisfied.
+    """
+    match = _RANGE_RE.match(header.replace(' ', '')) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Suffix range: the last N bytes
+        length = int(last)
+        if length == 0 or size == 0:
+            return False
+        return ByteRange(max(0, size - length), size - 1)
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        return False
+    return ByteRange(start, end)
+
+
+def iter_range(file_obj, byte_range, block_size=RANGE_BLOCK_SIZE):
+    """
+    Yield the bytes of a range of an open file, a block at a time, and close it.
+    """
+    try:
+        file_obj.seek(byte_range.start)
+        remaining = byte_range.end - byte_range.start + 1
+        while remaining > 0:
+            block = file_obj.read(min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        file_obj.close()
+
+
+async def aiter_range(path, byte_range, block_size=RANGE_BLOCK_SIZE):
+    """
+    iter_range for async views: the file is opened and read on worker threads.
+    """
+    file_obj = await asyncio.to_thread(open, path, 'rb')
+    try:
+        await asyncio.to_thread(file_obj.seek, byte_range.start)
+        remaining = byte_range.end - byte_range.start + 1
+        while remaining > 0:
+            block = await asyncio.to_thread(file_obj.read, min(block_size, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+    finally:
+        file_obj.close()
+
+
+def accel_response(name, path):
+    """
+    An empty response telling the front proxy to send the file, or None when
+    MEDIA_ACCEL is not set.
+    """
+    accel = getattr(settings, 'MEDIA_ACCEL', None)
+    if not accel:
+        return None
+    response = HttpResponse(content_type=content_type(name))
+    if accel == 'nginx':
+        prefix = getattr(settings, 'MEDIA_ACCEL_PREFIX', '/protected-media/')
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + name
+    elif accel == 'sendfile':
+        response['X-Sendfile'] = path
+    else:
+        raise ValueError(f"Unsupported MEDIA_ACCEL: {accel}")
+    return response
+
+
+def file_validators(stat):
+    """
+    The ETag and Last-Modified timestamp of a stored file, from its os.stat result.
+    """
+    return '"%x-%x"' % (int(stat.st_mtime), stat.st_size), int(stat.st_mtime)
+
+
+def file_response(request, name, path, stat, read_range=None):
+    """
+    Send a stored file without a proxy, answering conditional and Range requests.
+
+    The body of a byte range is read by `read_range(path, byte_range)`, iter_range
+    by default; without `read_range` whole files go through FileResponse, which
+    the WSGI server can send with sendfile(), otherwise they are read by it too.
+    """
+    etag, last_modified = file_validators(stat)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        return response
+
+    byte_range = None
+    if_range = request.headers.get('If-Range')
+    if not if_range or if_range in (etag, http_date(last_modified)):
+        byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+
+    if byte_range is False:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    elif byte_range is not None:
+        body = read_range(path, byte_range) if read_range else iter_range(open(path, 'rb'), byte_range)
+        response = StreamingHttpResponse(body, status=status.HTTP_206_PARTIAL_CONTENT, content_type=content_type(name))
+        response['Content-Range'] = f'bytes {byte_range.start}-{byte_range.end}/{stat.st_size}'
+        response['Content-Length'] = byte_range.end - byte_range.start + 1
+    elif read_range:
+        response = StreamingHttpResponse(
+            read_range(path, ByteRange(0, stat.st_size - 1)), content_type=content_type(name)
+        )
+        response['Content-Length'] = stat.st_size
+    else:
+        response = FileResponse(open(path, 'rb'), content_type=content_type(name))
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
@@ -0,0 +1,228 @@
+"""
+Garbage collection of stored files that no row references.
+
+Files can be left behind by failed uploads, or by older versions of the API:
+rotations used to write a new file every time, and deleting a PDF used to
+leave the page images of its conversions. The upload directories of the
+Image and PDF file fields are walked with os.scandir and the names are checked
+against the `file` columns a batch at a time, so memory use is bounded by the
+batch size whatever the number of files.
+
+The caches of derived files are collected too. A derivative is named after the
+image it was made for (see imaging.derivative_name) and is kept while that
+image lists it in its `derivatives`; each batch is checked with one primary key
+lookup. Derivatives named in an older layout, without the image id, are always
+kept. A transformed file or a tile pyramid (a directory of TILE_CACHE_DIR) is
+kept while an image has its content key. Both caches are sharded like the
+uploads; entries left in the flat layout of older versions are never read
+again and are collected.
+
+A file younger than the grace period is never collected: an upload writes its
+file before it inserts its row.
+"""
+import os
+import posixpath
+import re
+import shutil
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .deletion import _used_keys
+from .imaging import derivative_owner
+from .models import FileDeletion, Image, PDF
+from .storage import is_sharded
+
+# Models whose file columns reference stored files
+FILE_MODELS = (Image, PDF)
+# Storage directories of the derived-file caches
+DERIVATIVES_DIRECTORY = 'derivatives'
+TRANSFORMED_DIRECTORY = 'transformed'
+# Name of a shard directory (see storage.sharded_path)
+SHARD_RE = re.compile(r'[0-9a-f]{2}')
+
+# `kind` is FileDeletion.KIND_FILE for a storage name, KIND_TILES for the path of a tile pyramid in TILE_CACHE_DIR
+StoredFile = namedtuple('StoredFile', ['name', 'size', 'modified', 'kind'], defaults=[FileDeletion.KIND_FILE])
+CollectionReport = namedtuple('CollectionReport', ['scanned', 'orphaned', 'orphaned_bytes', 'deleted'])
+
+
+def upload_directories():
+    """
+    Storage directories the file fields upload into, e.g. ('images', 'pdfs').
+    """
+    directories = []
+    for model in FILE_MODELS:
+        directory = model._meta.get_field('file').upload_to.directory
+        if directory not in directories:
+            directories.append(directory)
+    return directories
+
+
+def walk_storage(directory):
+    """
+    Yield a StoredFile for every file below a storage directory, depth first.
+    Only the entries of the directory being read are held in memory. Needs a
+    storage with local paths, such as the default FileSystemStorage.
+    """
+    root = default_storage.path('')
+    pending = [default_storage.path(directory)]
+    while pending:
+        path = pending.pop()
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    stat = entry.stat(follow_symlinks=False)
+                    name = os.path.relpath(entry.path, root).replace(os.sep, '/')
+                    yield StoredFile(name, stat.st_size, stat.st_mtime)
+
+
+def _pyramid_file(path, name):
+    """
+    A StoredFile for the tile pyramid at `path`, with the total size and latest modification of its files.
+    """
+    size, modified = 0, os.stat(path).st_mtime
+    for directory, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                stat = os.lstat(os.path.join(directory, filename))
+            except FileNotFoundError:
+                continue
+            size += stat.st_size
+            modified = max(modified, stat.st_mtime)
+    return StoredFile(name, size, modified, FileDeletion.KIND_TILES)
+
+
+def _subdirectories(path):
+    try:
+        with os.scandir(path) as entries:
+            return [entry for entry in entries if entry.is_dir(follow_symlinks=False)]
+    except FileNotFoundError:
+        return []
+
+
+def walk_tile_cache():
+    """
+    Yield a StoredFile for every tile pyramid of TILE_CACHE_DIR, named by its
+    path below it: 'ab/cd/<content key>', or '<content key>' in the flat layout.
+    """
+    for entry in _subdirectories(settings.TILE_CACHE_DIR):
+        if not SHARD_RE.fullmatch(entry.name):
+            yield _pyramid_file(entry.path, entry.name)
+            continue
+        for shard in _subdirectories(entry.path):
+            for pyramid in _subdirectories(shard.path):
+                yield _pyramid_file(pyramid.path, f'{entry.name}/{shard.name}/{pyramid.name}')
+
+
+def _referenced_derivatives(names):
+    """
+    The names among `names` that the image they were made for still lists in its
+    `derivatives`, plus the names that do not tell which image that is.
+    """
+    owners = {name: derivative_owner(name) for name in names}
+    referenced = {name for name, owner in owners.items() if owner is None}
+    image_ids = {owner for owner in owners.values() if owner is not None}
+    if image_ids:
+        for entries in Image.objects.filter(id__in=image_ids).values_list('derivatives', flat=True):
+            referenced.update(entry['file'] for entry in (entries or {}).values())
+    return referenced
+
+
+def _transformed_key(name):
+    """
+    The content key of a transformed file, e.g. 'transformed/ab/cd/<key>.png' -> '<key>',
+    or None for a file in the flat layout.
+    """
+    if not is_sharded(name, TRANSFORMED_DIRECTORY):
+        return None
+    return posixpath.splitext(posixpath.basename(name))[0]
+
+
+def _pyramid_key(name):
+    """
+    The content key of a tile pyramid, e.g. 'ab/cd/<key>' -> '<key>', or None for a pyramid in the flat layout.
+    """
+    return name.rsplit('/', 1)[1] if '/' in name else None
+
+
+def _unused_keys(batch, key):
+    """
+    The StoredFiles of a batch of cache entries whose content key, `key(name)`, no image has.
+    """
+    keys = {stored.name: key(stored.name) for stored in batch}
+    used = _used_keys({value.split('-')[0] for value in keys.values() if value})
+    return [stored for stored in batch if keys[stored.name] not in used]
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def find_orphans(batch_size=None, grace_seconds=None):
+    """
+    Walk the upload directories and the derived-file caches and yield, for each
+    batch of files, the pair (number of files scanned, StoredFiles that no row
+    references).
+    """
+    if batch_size is None:
+        batch_size = getattr(settings, 'MEDIA_GC_BATCH_SIZE', 1000)
+    if grace_seconds is None:
+        grace_seconds = getattr(settings, 'MEDIA_GC_GRACE_SECONDS', 3600)
+    cutoff = time.time() - grace_seconds
+
+    for directory in upload_directories():
+        for batch in _batches(walk_storage(directory), batch_size):
+            names = [stored.name for stored in batch]
+            referenced = set()
+            for model in FILE_MODELS:
+                referenced.update(model.objects.filter(file__in=names).values_list('file', flat=True))
+            orphans = [stored for stored in batch if stored.name not in referenced and stored.modified < cutoff]
+            yield len(batch), orphans
+
+    for batch in _batches(walk_storage(DERIVATIVES_DIRECTORY), batch_size):
+        referenced = _referenced_derivatives([stored.name for stored in batch])
+        orphans = [stored for stored in batch if stored.name not in referenced and stored.modified < cutoff]
+        yield len(batch), orphans
+
+    for batch in _batches(walk_storage(TRANSFORMED_DIRECTORY), batch_size):
+        orphans = [stored for stored in _unused_keys(batch, _transformed_key) if stored.modified < cutoff]
+        yield len(batch), orphans
+
+    for batch in _batches(walk_tile_cache(), batch_size):
+        orphans = [stored for stored in _unused_keys(batch, _pyramid_key) if stored.modified < cutoff]
+        yield len(batch), orphans
+
+
+def collect_garbage(dry_run=False, batch_size=None, grace_seconds=None):
+    """
+    Delete the stored files that no row references, unless `dry_run`.
+    Returns a CollectionReport.
+    """
+    scanned = orphaned = orphaned_bytes = deleted = 0
+    for batch_scanned, orphans in find_orphans(batch_size, grace_seconds):
+        scanned += batch_scanned
+        for stored in orphans:
+            orphaned += 1
+            orphaned_bytes += stored.size
+            if not dry_run:
+                if stored.kind == FileDeletion.KIND_TILES:
+                    shutil.rmtree(os.path.join(settings.TILE_CACHE_DIR, *stored.name.split('/')), ignore_errors=True)
+                else:
+                    default_storage.delete(stored.name)
+                deleted += 1
+    return CollectionReport(scanned, orphaned, orphaned_bytes, deleted)
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0002_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversionJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='pending', max_length=10)),
+                ('pages_done', models.IntegerField(default=0)),
+                ('pages_total', models.IntegerField(blank=True, null=True)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('images', models.ManyToManyField(blank=True, related_name='+', to='Document.image')),
+                ('pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='conversion_jobs', to='Document.pdf')),
+            ],
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0003_conversion_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversionjob',
+            name='render_options',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
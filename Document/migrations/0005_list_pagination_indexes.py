@@ -0,0 +1,21 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0004_conversion_job_render_options'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['uploaded_at', 'id'], name='image_uploaded_at_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pdf',
+            index=models.Index(fields=['uploaded_at', 'id'], name='pdf_uploaded_at_id_idx'),
+        ),
+    ]
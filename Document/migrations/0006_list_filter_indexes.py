@@ -0,0 +1,37 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0005_list_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['width', 'id'], name='image_width_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['height', 'id'], name='image_height_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['channels', 'id'], name='image_channels_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pdf',
+            index=models.Index(fields=['num_pages', 'id'], name='pdf_num_pages_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pdf',
+            index=models.Index(fields=['page_width', 'id'], name='pdf_page_width_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='pdf',
+            index=models.Index(fields=['page_height', 'id'], name='pdf_page_height_id_idx'),
+        ),
+    ]
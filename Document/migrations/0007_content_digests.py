@@ -0,0 +1,33 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0006_list_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='pdf',
+            name='sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=models.ImageField(db_index=True, upload_to='images/'),
+        ),
+        migrations.AlterField(
+            model_name='pdf',
+            name='file',
+            field=models.FileField(db_index=True, upload_to='pdfs/'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0007_content_digests'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RenderedPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pdf_sha256', models.CharField(max_length=64)),
+                ('render_key', models.CharField(max_length=100)),
+                ('page_number', models.IntegerField()),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Document.image')),
+                ('pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rendered_pages', to='Document.pdf')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pdf_sha256', 'render_key', 'page_number'), name='unique_rendered_page')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.4 on 2026-10-18 15:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0009_image_derivatives'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='transforms',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
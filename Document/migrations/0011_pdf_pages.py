@@ -0,0 +1,31 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0010_image_transforms'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PDFPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.IntegerField()),
+                ('width', models.FloatField()),
+                ('height', models.FloatField()),
+                ('mediabox', models.JSONField(default=list)),
+                ('rotation', models.IntegerField(default=0)),
+                ('has_text', models.BooleanField(default=False)),
+                ('has_images', models.BooleanField(default=False)),
+                ('pdf', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='Document.pdf')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('pdf', 'page_number'), name='unique_pdf_page')],
+            },
+        ),
+    ]
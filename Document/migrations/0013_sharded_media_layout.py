@@ -0,0 +1,24 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:16
+
+import Document.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0012_file_deletion_queue'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='file',
+            field=models.ImageField(db_index=True, upload_to=Document.storage.ShardedUploadTo('images')),
+        ),
+        migrations.AlterField(
+            model_name='pdf',
+            name='file',
+            field=models.FileField(db_index=True, upload_to=Document.storage.ShardedUploadTo('pdfs')),
+        ),
+    ]
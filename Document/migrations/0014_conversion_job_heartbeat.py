@@ -0,0 +1,36 @@
+# Generated by Django 5.1.4 on 2026-10-18 16:41
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def start_heartbeats(apps, schema_editor):
+    # Jobs already running get a heartbeat now, so they are reclaimed if their worker is gone
+    ConversionJob = apps.get_model('Document', 'ConversionJob')
+    ConversionJob.objects.filter(status='running').update(heartbeat_at=timezone.now())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0013_sharded_media_layout'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conversionjob',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='conversionjob',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='conversionjob',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(start_heartbeats, migrations.RunPython.noop),
+    ]
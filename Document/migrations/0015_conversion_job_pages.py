@@ -0,0 +1,47 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_job_images(apps, schema_editor):
+    # Pages were rendered and inserted in page order, so image ids follow the page numbers
+    ConversionJob = apps.get_model('Document', 'ConversionJob')
+    ConversionJobPage = apps.get_model('Document', 'ConversionJobPage')
+    links = ConversionJob.images.through.objects.order_by('conversionjob_id', 'image_id')
+    pages = []
+    page_numbers = {}
+    for job_id, image_id in links.values_list('conversionjob_id', 'image_id').iterator():
+        page_numbers[job_id] = page_numbers.get(job_id, 0) + 1
+        pages.append(ConversionJobPage(job_id=job_id, image_id=image_id, page_number=page_numbers[job_id]))
+    ConversionJobPage.objects.bulk_create(pages, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Document', '0014_conversion_job_heartbeat'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConversionJobPage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('page_number', models.IntegerField()),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='Document.image')),
+                ('job', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pages', to='Document.conversionjob')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('job', 'page_number'), name='unique_job_page')],
+            },
+        ),
+        migrations.RunPython(copy_job_images, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='conversionjob',
+            name='images',
+        ),
+        migrations.AddField(
+            model_name='conversionjob',
+            name='images',
+            field=models.ManyToManyField(blank=True, related_name='+', through='Document.ConversionJobPage', to='Document.image'),
+        ),
+    ]
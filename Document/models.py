@@ -1,21 +1,192 @@
+import uuid
+
 from django.db import models
 
+from .storage import ShardedUploadTo
+
 class Image(models.Model):
-    file = models.ImageField(upload_to='images/')  # Saves to 'media/images/'
+    file = models.ImageField(upload_to=ShardedUploadTo('images'), db_index=True)  # Saves to 'media/images/ab/cd/'
+    sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # Digest of the file content
     width = models.IntegerField(blank=True, null=True)
     height = models.IntegerField(blank=True, null=True)
     channels = models.IntegerField(blank=True, null=True)
+    derivatives = models.JSONField(default=dict, blank=True)  # Downscaled copies: {size: {file, width, height}}
+    transforms = models.JSONField(default=list, blank=True)  # Ordered operations applied on top of the file, see transforms.py
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination, filtering and ordering on the list endpoint
+            models.Index(fields=['uploaded_at', 'id'], name='image_uploaded_at_id_idx'),
+            models.Index(fields=['width', 'id'], name='image_width_id_idx'),
+            models.Index(fields=['height', 'id'], name='image_height_id_idx'),
+            models.Index(fields=['channels', 'id'], name='image_channels_id_idx'),
+        ]
+
     def __str__(self):
         return self.file.name
 
 class PDF(models.Model):
-    file = models.FileField(upload_to='pdfs/')  # Saves to 'media/pdfs/'
+    file = models.FileField(upload_to=ShardedUploadTo('pdfs'), db_index=True)  # Saves to 'media/pdfs/ab/cd/'
+    sha256 = models.CharField(max_length=64, blank=True, null=True, db_index=True)  # Digest of the file content
     num_pages = models.IntegerField(blank=True, null=True)
     page_width = models.FloatField(blank=True, null=True)
     page_height = models.FloatField(blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination, filtering and ordering on the list endpoint
+            models.Index(fields=['uploaded_at', 'id'], name='pdf_uploaded_at_id_idx'),
+            models.Index(fields=['num_pages', 'id'], name='pdf_num_pages_id_idx'),
+            models.Index(fields=['page_width', 'id'], name='pdf_page_width_id_idx'),
+            models.Index(fields=['page_height', 'id'], name='pdf_page_height_id_idx'),
+        ]
+
+    def __str__(self):
+        return self.file.name
+
+class PDFPage(models.Model):
+    """
+    Geometry and content flags of one page of a PDF, read from the page tree at upload.
+    """
+    pdf = models.ForeignKey(PDF, on_delete=models.CASCADE, related_name='pages')
+    page_number = models.IntegerField()  # 1-based
+    width = models.FloatField()  # Mediabox size in points, before rotation
+    height = models.FloatField()
+    mediabox = models.JSONField(default=list)  # [x0, y0, x1, y1]
+    rotation = models.IntegerField(default=0)  # Clockwise display rotation: 0, 90, 180 or 270
+    has_text = models.BooleanField(default=False)  # The page resources declare a font
+    has_images = models.BooleanField(default=False)  # The page resources reference an image
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pdf', 'page_number'], name='unique_pdf_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.pdf_id} page {self.page_number}"
+
+class UploadSession(models.Model):
+    STATUS_OPEN = 'open'
+    STATUS_COMMITTED = 'committed'
+    STATUS_CHOICES = [
+        (STATUS_OPEN, 'Open'),
+        (STATUS_COMMITTED, 'Committed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    file_type = models.CharField(max_length=10)  # 'image' or 'pdf'
+    total_size = models.BigIntegerField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_OPEN)
+    image = models.ForeignKey(Image, blank=True, null=True, on_delete=models.SET_NULL, related_name='+')
+    pdf = models.ForeignKey(PDF, blank=True, null=True, on_delete=models.SET_NULL, related_name='+')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return str(self.id)
+
+class UploadChunk(models.Model):
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.IntegerField()
+    offset = models.BigIntegerField()
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['session', 'index'], name='unique_chunk_index'),
+        ]
+
+    def __str__(self):
+        return f"{self.session_id}:{self.index}"
+
+
+class ConversionJob(models.Model):
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_DONE, 'Done'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    pdf = models.ForeignKey(PDF, on_delete=models.CASCADE, related_name='conversion_jobs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING, db_index=True)
+    pages_done = models.IntegerField(default=0)
+    pages_total = models.IntegerField(blank=True, null=True)
+    images = models.ManyToManyField(Image, blank=True, related_name='+', through='ConversionJobPage')
+    render_options = models.JSONField(default=dict, blank=True)  # Output format of the rendered pages
+    error = models.TextField(blank=True)
+    attempts = models.IntegerField(default=0)  # Number of times a worker claimed the job
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)  # When the last attempt was claimed
+    heartbeat_at = models.DateTimeField(blank=True, null=True)  # Last progress of the running attempt
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    def __str__(self):
+        return f"Conversion of PDF {self.pdf_id} ({self.status})"
+
+
+class ConversionJobPage(models.Model):
+    """
+    An image created by a conversion job, with the page it was rendered from,
+    so the images of a job can be listed in page order.
+    """
+    job = models.ForeignKey(ConversionJob, on_delete=models.CASCADE, related_name='pages')
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name='+')
+    page_number = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['job', 'page_number'], name='unique_job_page'),
+        ]
+
+    def __str__(self):
+        return f"Job {self.job_id} page {self.page_number}"
+
+
+class RenderedPage(models.Model):
+    """
+    Links a PDF to the Image rendered for one of its pages: the render cache.
+    Entries are looked up by the PDF content digest, so byte-identical PDFs share them.
+    """
+    pdf = models.ForeignKey(PDF, on_delete=models.CASCADE, related_name='rendered_pages')
+    image = models.ForeignKey(Image, on_delete=models.CASCADE, related_name='+')
+    pdf_sha256 = models.CharField(max_length=64)
+    render_key = models.CharField(max_length=100)  # Render settings the page was produced with
+    page_number = models.IntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['pdf_sha256', 'render_key', 'page_number'], name='unique_rendered_page'),
+        ]
+
+    def __str__(self):
+        return f"{self.pdf_sha256[:12]} page {self.page_number} ({self.render_key})"
+
+
+class FileDeletion(models.Model):
+    """
+    A stored file, tile pyramid or transformed-file cache entry left behind by a
+    bulk delete. The table is the queue of the background sweeper (see
+    deletion.py), which removes the files and then the rows.
+    """
+    KIND_FILE = 'file'  # A name in the default storage
+    KIND_TILES = 'tiles'  # The content key of a tile pyramid in TILE_CACHE_DIR
+    KIND_TRANSFORMED = 'transformed'  # The content key of a cached transformed file
+    KIND_CHOICES = [
+        (KIND_FILE, 'File'),
+        (KIND_TILES, 'Tiles'),
+        (KIND_TRANSFORMED, 'Transformed file'),
+    ]
+
+    kind = models.CharField(max_length=12, choices=KIND_CHOICES, default=KIND_FILE)
+    name = models.CharField(max_length=255)
+    created_at = models.DateTimeField(auto_now_add=True)
+
     def __str__(self):
-        return self.file.name
\ No newline at end of file
+        return f"{self.kind}:{self.name}"
@@ -0,0 +1,146 @@
+import base64
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (cursor) pagination ordered on (ordering field, id).
+
+    Each page is fetched with a range condition on the last row of the previous
+    page instead of an OFFSET, so the cost of a page does not grow with its depth.
+    The ordering field may be prefixed with '-' for descending order; NULL values
+    sort last in both directions.
+    The response body stays a plain list; the cursor of the next page is sent in
+    a Link header (rel="next") and in X-Next-Cursor.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def __init__(self, ordering='uploaded_at'):
+        self.ordering = ordering
+        self.field_name = ordering.lstrip('-')
+        self.descending = ordering.startswith('-')
+        self.page_size = getattr(settings, 'LIST_PAGE_SIZE', 100)
+        self.max_page_size = getattr(settings, 'LIST_MAX_PAGE_SIZE', 1000)
+        self.next_cursor = None
+        self.request = None
+
+    def get_page_size(self, request):
+        value = request.query_params.get(self.page_size_query_param)
+        if value is None:
+            return self.page_size
+        try:
+            page_size = int(value)
+        except ValueError:
+            page_size = 0
+        if page_size <= 0:
+            raise ValueError("Page size must be a positive integer")
+        return min(page_size, self.max_page_size)
+
+    def encode_cursor(self, instance):
+        value = getattr(instance, self.field_name)
+        if hasattr(value, 'isoformat'):
+            value = value.isoformat()
+        position = json.dumps([self.ordering, value, instance.pk])
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    def decode_cursor(self, cursor, model):
+        try:
+            ordering, value, pk = json.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+            if ordering != self.ordering:
+                raise ValueError
+            if value is not None:
+                value = model._meta.get_field(self.field_name).to_python(value)
+            return value, int(pk)
+        except (ValueError, TypeError, UnicodeDecodeError, ValidationError):
+            raise ValueError("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        segments, page_size = self.page_segments(queryset, request)
+        rows = []
+        for segment in segments:
+            rows.extend(segment[:page_size + 1 - len(rows)])
+            if len(rows) > page_size:
+                break
+        return self.page_rows(rows, page_size)
+
+    async def apaginate_queryset(self, queryset, request):
+        """
+        paginate_queryset for async views, fetching the page with the async ORM.
+        """
+        segments, page_size = self.page_segments(queryset, request)
+        rows = []
+        for segment in segments:
+            rows.extend([row async for row in segment[:page_size + 1 - len(rows)]])
+            if len(rows) > page_size:
+                break
+        return self.page_rows(rows, page_size)
+
+    def page_segments(self, queryset, request):
+        """
+        The querysets holding the rows that follow the cursor of the request, to
+        be read in turn, and the page size.
+
+        Rows with a value come first, then, for a nullable field, the NULL rows
+        ordered by id. Each segment is a single range on the (field, id) index,
+        `field >= value AND (field > value OR id > pk)`, so the database seeks to
+        the cursor instead of walking the index from its start; ORing the NULL
+        rows into the same query would defeat the seek.
+        """
+        self.request = request
+        page_size = self.get_page_size(request)
+        field = self.field_name
+        nullable = queryset.model._meta.get_field(field).null
+        beyond = 'lt' if self.descending else 'gt'
+        prefix = '-' if self.descending else ''
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            value, pk = self.decode_cursor(cursor, queryset.model)
+
+        segments = []
+        if not cursor:
+            values = queryset.filter(**{f'{field}__isnull': False}) if nullable else queryset
+            segments.append(values.order_by(f'{prefix}{field}', f'{prefix}pk'))
+        elif value is not None:
+            after = Q(**{f'{field}__{beyond}e': value}) & (
+                Q(**{f'{field}__{beyond}': value}) | Q(**{f'pk__{beyond}': pk})
+            )
+            segments.append(queryset.filter(after).order_by(f'{prefix}{field}', f'{prefix}pk'))
+        if nullable:
+            nulls = queryset.filter(**{f'{field}__isnull': True})
+            if cursor and value is None:
+                nulls = nulls.filter(**{f'pk__{beyond}': pk})
+            segments.append(nulls.order_by(f'{prefix}pk'))
+        return segments, page_size
+
+    def page_rows(self, rows, page_size):
+        """
+        Trim the extra row fetched to know whether there is a next page.
+        """
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            self.next_cursor = self.encode_cursor(rows[-1])
+        return rows
+
+    def get_next_link(self):
+        if self.next_cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, self.next_cursor)
+
+    def get_paginated_headers(self):
+        headers = {}
+        if self.next_cursor is not None:
+            headers['Link'] = f'<{self.get_next_link()}>; rel="next"'
+            headers['X-Next-Cursor'] = self.next_cursor
+        return headers
+
+    def get_paginated_response(self, data):
+        return Response(data, headers=self.get_paginated_headers())
@@ -0,0 +1,108 @@
+"""
+Page rendering functions that run inside worker processes.
+
+This module must not import Django models: it is imported by freshly spawned
+processes that never run django.setup().
+"""
+import io
+import math
+
+import fitz  # PyMuPDF
+from PIL import Image as PILImage
+
+
+def open_document(source):
+    """
+    Open a PDF from a filesystem path or from its bytes.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source, filetype="pdf")
+
+
+# Output formats accepted for rendered pages, mapped to the PIL format name
+OUTPUT_FORMATS = {
+    'png': 'PNG',
+    'jpeg': 'JPEG',
+    'webp': 'WEBP',
+}
+
+# File extension of each output format
+OUTPUT_EXTENSIONS = {
+    'png': '.png',
+    'jpeg': '.jpg',
+    'webp': '.webp',
+}
+
+# MIME type of each output format
+OUTPUT_CONTENT_TYPES = {
+    'png': 'image/png',
+    'jpeg': 'image/jpeg',
+    'webp': 'image/webp',
+}
+
+
+def encode_pixmap(pix, image_format='png', quality=None, compress_level=None):
+    """
+    Encode a pixmap once into the requested format and return the bytes.
+
+    A plain PNG is written by MuPDF itself. Other formats, and PNG with an
+    explicit compression level, wrap the pixmap samples in a PIL image without
+    copying them and encode that.
+    """
+    if image_format == 'png' and compress_level is None:
+        return pix.tobytes('png')
+
+    mode = 'RGBA' if pix.alpha else {1: 'L', 3: 'RGB', 4: 'CMYK'}[pix.n]
+    pil_image = PILImage.frombuffer(mode, (pix.width, pix.height), pix.samples_mv, 'raw', mode, pix.stride, 1)
+
+    save_options = {}
+    if image_format == 'png':
+        save_options['compress_level'] = compress_level
+    elif quality is not None:
+        save_options['quality'] = quality
+    if image_format == 'webp' and compress_level is not None:
+        # WebP's "method" is its speed/size trade-off, 0 (fast) to 6 (small)
+        save_options['method'] = min(compress_level, 6)
+
+    buffer = io.BytesIO()
+    pil_image.save(buffer, format=OUTPUT_FORMATS[image_format], **save_options)
+    return buffer.getvalue()
+
+
+def render_page(page, image_format='png', quality=None, compress_level=None, scale=1.0):
+    """
+    Render one page and return (encoded_bytes, width, height, channels).
+    `scale` is the zoom factor over 72 DPI. The metadata comes straight from the
+    pixmap, the image is encoded only once.
+    """
+    if scale == 1.0:
+        pix = page.get_pixmap()
+    else:
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale))
+    data = encode_pixmap(pix, image_format, quality, compress_level)
+    return data, pix.width, pix.height, pix.n
+
+
+def render_page_range(source, start, stop, options=None):
+    """
+    Open the document and render pages [start, stop). Runs in a worker process.
+    `options` are the keyword arguments of render_page.
+    """
+    options = options or {}
+    pdf_document = open_document(source)
+    try:
+        return [render_page(pdf_document[page_num], **options) for page_num in range(start, stop)]
+    finally:
+        pdf_document.close()
+
+
+def page_slices(page_count, workers, slices_per_worker=4):
+    """
+    Split the pages into contiguous (start, stop) ranges.
+
+    Each worker gets several smaller slices rather than one big one, so a worker
+    that draws a run of heavy pages does not hold up the others.
+    """
+    slice_size = max(1, math.ceil(page_count / (workers * slices_per_worker)))
+    return [(start, min(start + slice_size, page_count)) for start in range(0, page_count, slice_size)]
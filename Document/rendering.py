@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+
+from .models import Image, RenderedPage
+from .uploads import file_sha256, read_pages, store_pages
+from .render_worker import (
+    OUTPUT_CONTENT_TYPES, OUTPUT_EXTENSIONS, OUTPUT_FORMATS, open_document, page_slices, render_page, render_page_range,
+)
+
+# Allowed zoom factors over 72 DPI for rendered pages
+MIN_RENDER_SCALE = 0.1
+MAX_RENDER_SCALE = 8.0
+
+_process_pools = {}
+_process_pools_lock = threading.Lock()
+
+
+def _get_process_pool(workers):
+    """
+    Return a process pool with the given number of workers, creating it on first use.
+
+    Workers are spawned rather than forked so they never inherit database
+    connections or the locks of other threads in this process.
+    """
+    with _process_pools_lock:
+        pool = _process_pools.get(workers)
+        if pool is None:
+            pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+            _process_pools[workers] = pool
+        return pool
+
+
+def parse_render_options(data, format_param='format'):
+    """
+    Read the output format options of a conversion request.
+
+    Accepts 'format' (png, jpeg or webp; read from `format_param`, since GET
+    endpoints cannot use DRF's reserved ?format=), 'quality' (1-100, JPEG/WebP),
+    'compression' (0-9, PNG zlib level / WebP effort) and the resolution as either
+    'scale' (zoom over 72 DPI) or 'dpi'. Returns the keyword arguments of
+    render_worker.render_page. Raises ValueError for invalid values.
+    """
+    image_format = str(data.get(format_param) or 'png').lower()
+    if image_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Invalid image format. Supported formats: {', '.join(OUTPUT_FORMATS)}")
+
+    quality = data.get('quality')
+    if quality is not None:
+        try:
+            quality = int(quality)
+        except (TypeError, ValueError):
+            quality = None
+        if quality is None or not 1 <= quality <= 100:
+            raise ValueError("Quality must be an integer between 1 and 100")
+
+    compress_level = data.get('compression')
+    if compress_level is not None:
+        try:
+            compress_level = int(compress_level)
+        except (TypeError, ValueError):
+            compress_level = None
+        if compress_level is None or not 0 <= compress_level <= 9:
+            raise ValueError("Compression level must be an integer between 0 and 9")
+
+    scale = 1.0
+    if data.get('dpi') is not None:
+        try:
+            scale = float(data.get('dpi')) / 72
+        except (TypeError, ValueError):
+            scale = 0
+        if not MIN_RENDER_SCALE <= scale <= MAX_RENDER_SCALE:
+            raise ValueError(f"DPI must be a number between {MIN_RENDER_SCALE * 72:g} and {MAX_RENDER_SCALE * 72:g}")
+    elif data.get('scale') is not None:
+        try:
+            scale = float(data.get('scale'))
+        except (TypeError, ValueError):
+            scale = 0
+        if not MIN_RENDER_SCALE <= scale <= MAX_RENDER_SCALE:
+            raise ValueError(f"Scale must be a number between {MIN_RENDER_SCALE:g} and {MAX_RENDER_SCALE:g}")
+
+    return {'image_format': image_format, 'quality': quality, 'compress_level': compress_level, 'scale': scale}
+
+
+def render_cache_key(options):
+    """
+    Normalised form of the render settings, part of the render cache key.
+    """
+    key = '{image_format}:q={quality}:c={compress_level}'.format(
+        image_format=options.get('image_format', 'png'),
+        quality=options.get('quality') or '',
+        compress_level='' if options.get('compress_level') is None else options['compress_level'],
+    )
+    scale = options.get('scale', 1.0)
+    if scale != 1.0:
+        key += f':s={scale:g}'
+    return key
+
+
+def content_sha256(instance):
+    """
+    Return the content digest of a PDF or image, computing and saving it for rows
+    stored before digests were recorded.
+    """
+    if not instance.sha256:
+        instance.sha256 = file_sha256(instance.file)
+        type(instance).objects.filter(pk=instance.pk).update(sha256=instance.sha256)
+    return instance.sha256
+
+
+def ensure_page_table(pdf):
+    """
+    Record the page table of a PDF stored before page tables were recorded.
+    """
+    if pdf.pages.exists():
+        return
+    store_pages(pdf, read_page_table(pdf), ignore_conflicts=True)
+
+
+def read_page_table(pdf):
+    """
+    Read the page table of a stored PDF with PyMuPDF.
+    """
+    pdf_document = open_document(_pdf_source(pdf))
+    try:
+        return read_pages(pdf_document)
+    finally:
+        pdf_document.close()
+
+
+async def aensure_page_table(pdf):
+    """
+    ensure_page_table for async views. The PDF is read on a worker thread, so
+    the event loop keeps serving other requests meanwhile.
+    """
+    if await pdf.pages.aexists():
+        return
+    pages = await asyncio.to_thread(read_page_table, pdf)
+    await sync_to_async(store_pages)(pdf, pages, ignore_conflicts=True)
+
+
+def cached_pages(pdf_sha256, render_key, num_pages=None):
+    """
+    Return the cached page images for a PDF content digest and render settings,
+    in page order, or None when the cache does not hold every page.
+    """
+    links = list(
+        RenderedPage.objects.filter(pdf_sha256=pdf_sha256, render_key=render_key)
+        .select_related('image')
+        .order_by('page_number')
+    )
+    if not links or [link.page_number for link in links] != list(range(1, len(links) + 1)):
+        return None
+    if num_pages is not None and len(links) != num_pages:
+        return None
+    return [link.image for link in links]
+
+
+def page_etag(pdf_sha256, page_number, options):
+    """
+    Strong ETag of a single rendered page. It only depends on the PDF content,
+    the page and the render settings, so it is known without rendering.
+    """
+    key = f"{pdf_sha256}:{page_number}:{render_cache_key(options)}"
+    return '"%s"' % hashlib.sha256(key.encode()).hexdigest()
+
+
+def render_single_page(pdf, page_number, options):
+    """
+    Render one page (1-based) of a PDF without storing it.
+
+    Only the requested page is loaded, so the cost does not depend on the number
+    of pages. Returns (encoded_bytes, content_type). Raises IndexError when the
+    page does not exist.
+    """
+    pdf_document = open_document(_pdf_source(pdf))
+    try:
+        if not 1 <= page_number <= len(pdf_document):
+            raise IndexError(page_number)
+        data, width, height, channels = render_page(pdf_document[page_number - 1], **options)
+    finally:
+        pdf_document.close()
+    return data, OUTPUT_CONTENT_TYPES[options.get('image_format', 'png')]
+
+
+def _pdf_source(pdf):
+    """
+    Return what the render workers open the PDF from: the file path when the
+    storage has one, otherwise the file content.
+    """
+    try:
+        return pdf.file.path
+    except NotImplementedError:
+        pdf.file.seek(0)
+        return pdf.file.read()
+
+
+def _render_sequential(pdf_document, page_nums, options):
+    for page_num in page_nums:
+        yield render_page(pdf_document[page_num], **options)
+
+
+def _render_parallel(source, page_nums, workers, options):
+    """
+    Render slices of the given pages on the process pool, yielding pages in page order.
+    """
+    # Runs of consecutive pages, each cut into slices
+    runs = []
+    for page_num in page_nums:
+        if runs and runs[-1][1] == page_num:
+            runs[-1][1] += 1
+        else:
+            runs.append([page_num, page_num + 1])
+    slices = [(start + first, start + last) for start, stop in runs for first, last in page_slices(stop - start, workers)]
+    starts, stops = zip(*slices)
+    pool = _get_process_pool(workers)
+    for rendered_slice in pool.map(render_page_range, [source] * len(slices), starts, stops, [options] * len(slices)):
+        yield from rendered_slice
+
+
+def convert_pdf(pdf, progress=None, workers=None, options=None):
+    """
+    Render every page of a PDF and create an Image row for each page.
+
+    `options` are the output format options from parse_render_options, PNG by default.
+    Each page is encoded once, straight from the pixmap, and the encoded bytes are
+    handed to the storage as they are.
+
+    With more than one worker (`workers`, defaulting to settings.RENDER_WORKERS)
+    the pages are rendered on a process pool, each worker opening the document
+    from the stored file.
+    `progress`, when given, is called as progress(pages_done, pages_total) once
+    before the first page and after every stored page.
+
+    The page files are written first and the Image rows are then inserted with a
+    single bulk insert in one transaction. If anything fails, the files written so
+    far are deleted and no rows are created.
+
+    Pages are cached per (PDF content digest, page number, render settings): when
+    the same PDF was already converted with the same settings, the existing page
+    images are returned without rendering anything. When only some pages are
+    cached, e.g. after one of the page images was deleted, only the missing pages
+    are rendered.
+    Returns the list of Image instances in page order.
+    """
+    if workers is None:
+        workers = getattr(settings, 'RENDER_WORKERS', 1)
+    options = options or {}
+    extension = OUTPUT_EXTENSIONS[options.get('image_format', 'png')]
+
+    pdf_sha256 = content_sha256(pdf)
+    render_key = render_cache_key(options)
+    images = cached_pages(pdf_sha256, render_key, pdf.num_pages)
+    if images is not None:
+        if progress:
+            progress(len(images), len(images))
+        return images
+
+    source = _pdf_source(pdf)
+
+    # Open the PDF using PyMuPDF
+    pdf_document = open_document(source)
+    page_count = len(pdf_document)
+
+    # Pages left from an incomplete conversion are kept, the others are rendered
+    cached = {
+        link.page_number: link.image
+        for link in RenderedPage.objects.filter(
+            pdf_sha256=pdf_sha256, render_key=render_key, page_number__lte=page_count
+        ).select_related('image')
+    }
+    missing = [page_num for page_num in range(page_count) if page_num + 1 not in cached]
+
+    if progress:
+        progress(len(cached), page_count)
+
+    if workers > 1 and len(missing) > 1:
+        pdf_document.close()
+        rendered_pages = _render_parallel(source, missing, workers, options)
+    else:
+        rendered_pages = _render_sequential(pdf_document, missing, options)
+
+    field = Image._meta.get_field('file')
+    stored_names = []
+    images = []
+
+    try:
+        # Store the encoded page files first...
+        for page_num, (image_data, width, height, channels) in zip(missing, rendered_pages):
+            # Unique names spread the pages over the shard directories (see storage.sharded_path)
+            filename = field.generate_filename(None, f'{uuid.uuid4()}_page_{page_num+1}{extension}')
+            name = field.storage.save(filename, ContentFile(image_data), max_length=field.max_length)
+            stored_names.append(name)
+            images.append(Image(file=name, width=width, height=height, channels=channels))
+
+            if progress:
+                progress(len(cached) + len(images), page_count)
+
+        # ...then insert all the rows at once, so a long document costs one commit
+        with transaction.atomic():
+            Image.objects.bulk_create(images)
+            RenderedPage.objects.bulk_create(
+                [
+                    RenderedPage(pdf=pdf, image=image, pdf_sha256=pdf_sha256, render_key=render_key, page_number=page_num + 1)
+                    for page_num, image in zip(missing, images)
+                ],
+                ignore_conflicts=True,
+            )
+
+    except BaseException:
+        # Leave neither rows nor orphaned files behind
+        for name in stored_names:
+            field.storage.delete(name)
+        raise
+
+    cached.update((page_num + 1, image) for page_num, image in zip(missing, images))
+    return [cached[page_number] for page_number in range(1, page_count + 1)]
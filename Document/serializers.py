@@ -1,25 +1,35 @@
+from django.core.files.storage import default_storage
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Image, PDF
+from .models import ConversionJob, Image, PDF, PDFPage, UploadChunk, UploadSession
 
 class ImageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Image
-        fields = ['id', 'file', 'width', 'height', 'channels', 'uploaded_at']
-        read_only_fields = ['width', 'height', 'channels', 'uploaded_at']
+        fields = ['id', 'file', 'sha256', 'width', 'height', 'channels', 'transforms', 'derivatives', 'uploaded_at']
+        read_only_fields = ['sha256', 'width', 'height', 'channels', 'transforms', 'derivatives', 'uploaded_at']
 
     def to_representation(self, instance):
         """
-        Customize the representation of the image file URL.
+        Customize the representation of the image file URL and of the derivative URLs.
+        A transformed image links to its transformed file, encoded on request.
         """
         representation = super().to_representation(instance)
-        representation['file'] = instance.file.url  # Return the full URL of the image file
+        if instance.transforms:
+            representation['file'] = reverse('image-file', args=[instance.id])
+        else:
+            representation['file'] = instance.file.url  # Return the full URL of the image file
+        representation['derivatives'] = {
+            size: default_storage.url(entry['file'])
+            for size, entry in (instance.derivatives or {}).items()
+        }
         return representation
 
 class PDFSerializer(serializers.ModelSerializer):
     class Meta:
         model = PDF
-        fields = ['id', 'file', 'num_pages', 'page_width', 'page_height', 'uploaded_at']
-        read_only_fields = ['num_pages', 'page_width', 'page_height', 'uploaded_at']
+        fields = ['id', 'file', 'sha256', 'num_pages', 'page_width', 'page_height', 'uploaded_at']
+        read_only_fields = ['sha256', 'num_pages', 'page_width', 'page_height', 'uploaded_at']
 
     def to_representation(self, instance):
         """
@@ -27,4 +37,47 @@ class PDFSerializer(serializers.ModelSerializer):
         """
         representation = super().to_representation(instance)
         representation['file'] = instance.file.url  # Return the full URL of the PDF file
-        return representation
\ No newline at end of file
+        return representation
+
+class PDFPageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PDFPage
+        fields = ['page_number', 'width', 'height', 'mediabox', 'rotation', 'has_text', 'has_images']
+        read_only_fields = fields
+
+class UploadChunkSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = UploadChunk
+        fields = ['index', 'offset', 'size', 'sha256']
+
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    chunks = UploadChunkSerializer(many=True, read_only=True)
+    received = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'file_type', 'total_size', 'status', 'received', 'chunks', 'image', 'pdf', 'created_at']
+        read_only_fields = fields
+
+    def get_received(self, instance):
+        """
+        Total number of bytes received so far, used by clients to resume.
+        """
+        return sum(chunk.size for chunk in instance.chunks.all())
+
+
+class ConversionJobSerializer(serializers.ModelSerializer):
+    images = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ConversionJob
+        fields = ['id', 'pdf', 'status', 'pages_done', 'pages_total', 'error', 'images', 'created_at', 'started_at', 'finished_at']
+        read_only_fields = fields
+
+    def get_images(self, instance):
+        """
+        The images created by the job, in page order.
+        """
+        pages = instance.pages.select_related('image').order_by('page_number')
+        return ImageSerializer([page.image for page in pages], many=True).data
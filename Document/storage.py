@@ -0,0 +1,138 @@
+import hashlib
+import os
+import posixpath
+import re
+import shutil
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils.deconstruct import deconstructible
+
+
+def sharded_path(directory, filename):
+    """
+    Place a file two directory levels below `directory`, named after the first
+    four hex digits of the hash of its name: images/ab/cd/<filename>.
+    Spreading files over 65536 directories keeps every directory small.
+    """
+    digest = hashlib.sha256(filename.encode()).hexdigest()
+    return posixpath.join(directory, digest[:2], digest[2:4], filename)
+
+
+def is_sharded(name, directory):
+    """
+    Whether a stored name already follows the sharded layout of `directory`.
+    """
+    return re.fullmatch(rf'{re.escape(directory)}/[0-9a-f]{{2}}/[0-9a-f]{{2}}/[^/]+', name) is not None
+
+
+@deconstructible
+class ShardedUploadTo:
+    """
+    `upload_to` of the file fields: files go to a sharded subdirectory of `directory`.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def __call__(self, instance, filename):
+        return sharded_path(self.directory, posixpath.basename(filename))
+
+    def __eq__(self, other):
+        return isinstance(other, ShardedUploadTo) and other.directory == self.directory
+
+
+def _link_or_copy(old_name, new_name):
+    """
+    Make a stored file also available under a new name, without removing the old
+    one. A hard link is used when the storage is on a local filesystem.
+    Returns the new name, which differs from `new_name` if that was taken by another file.
+    """
+    old_path = default_storage.path(old_name)
+    new_path = default_storage.path(new_name)
+    if os.path.exists(new_path):
+        if os.path.samefile(old_path, new_path):
+            return new_name  # Linked by an interrupted earlier run
+        new_name = default_storage.get_available_name(new_name)
+        new_path = default_storage.path(new_name)
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    try:
+        os.link(old_path, new_path)
+    except OSError:
+        shutil.copy2(old_path, new_path)
+    return new_name
+
+
+def shard_stored_files(model, batch_size=500):
+    """
+    Move the files of a model that are still in the flat layout to the sharded
+    layout, a batch of rows at a time, while the application keeps running.
+
+    Each file is first linked under its sharded name, then every row pointing
+    at the old name is updated, in one transaction per batch, and the old name
+    is removed once no row references it any more. Identical uploads share a
+    file, so all their rows move together. Yields (files moved, rows updated)
+    after each batch.
+    """
+    directory = model._meta.get_field('file').upload_to.directory
+    last_id = 0
+    while True:
+        rows = list(model.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'file')[:batch_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        moves = {}
+        for _, name in rows:
+            if name and name not in moves and not is_sharded(name, directory) and default_storage.exists(name):
+                moves[name] = _link_or_copy(name, sharded_path(directory, posixpath.basename(name)))
+
+        updated = 0
+        with transaction.atomic():
+            for old_name, new_name in moves.items():
+                updated += model.objects.filter(file=old_name).update(file=new_name)
+
+        for old_name in moves:
+            # A row created from the old name while the batch ran keeps the file
+            if not model.objects.filter(file=old_name).exists():
+                default_storage.delete(old_name)
+        yield len(moves), updated
+
+
+def shard_derivative_files(model, batch_size=500):
+    """
+    Move the derivative files of images to the sharded layout, like
+    shard_stored_files. Derivatives belong to a single image, so each old file
+    is removed as soon as its image points at the new one.
+    Yields (files moved, rows updated) after each batch.
+    """
+    last_id = 0
+    while True:
+        rows = list(
+            model.objects.filter(id__gt=last_id).order_by('id').values_list('id', 'derivatives')[:batch_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+
+        changed = {}
+        old_names = []
+        for image_id, derivatives in rows:
+            updated = {}
+            for size, entry in (derivatives or {}).items():
+                name = entry['file']
+                if not is_sharded(name, 'derivatives') and default_storage.exists(name):
+                    new_name = _link_or_copy(name, sharded_path('derivatives', posixpath.basename(name)))
+                    entry = dict(entry, file=new_name)
+                    old_names.append(name)
+                updated[size] = entry
+            if updated != derivatives:
+                changed[image_id] = updated
+
+        with transaction.atomic():
+            for image_id, derivatives in changed.items():
+                model.objects.filter(id=image_id).update(derivatives=derivatives)
+
+        for name in old_names:
+            default_storage.delete(name)
+        yield len(old_names), len(changed)
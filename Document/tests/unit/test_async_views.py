@@ -0,0 +1,193 @@
+import shutil
+import tempfile
+import fitz
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import AsyncClient, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from ...models import Image, PDF
+
+
+class AsyncListDetailTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and create some images and PDFs.
+        """
+        self.client = APIClient()
+        for index in range(5):
+            Image.objects.create(file=f'images/scan_{index}.png', width=100 * (index + 1), height=600, channels=3)
+        self.pdf = PDF.objects.create(file='pdfs/report.pdf', num_pages=10, page_width=8.5, page_height=11.0)
+
+    def assertSameResponse(self, url):
+        """
+        Check that the async variant of an endpoint answers like the synchronous one.
+        """
+        sync_response = self.client.get(f'/api/{url}')
+        async_response = self.client.get(f'/api/async/{url}')
+        self.assertEqual(async_response.status_code, sync_response.status_code)
+        self.assertEqual(async_response.json(), sync_response.json())
+        self.assertEqual(async_response.get('X-Next-Cursor'), sync_response.get('X-Next-Cursor'))
+        return async_response
+
+    def test_image_list(self):
+        """
+        Test that the async image list returns the same pages, filters and cursors.
+        """
+        response = self.assertSameResponse('images/?page_size=2&ordering=-width')
+
+        # Verify the next page follows the cursor
+        self.assertIn('/api/async/images/', response['Link'])
+        self.assertSameResponse(f"images/?page_size=2&ordering=-width&cursor={response['X-Next-Cursor']}")
+        self.assertSameResponse('images/?width__gte=300')
+
+    def test_pdf_list(self):
+        """
+        Test that the async PDF list returns the same body as the synchronous one.
+        """
+        self.assertSameResponse('pdfs/')
+
+    def test_list_errors(self):
+        """
+        Test that invalid parameters return 400 like the synchronous views.
+        """
+        # Verify the responses
+        self.assertEqual(self.assertSameResponse('images/?page_size=0').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.assertSameResponse('pdfs/?cursor=bogus').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_details(self):
+        """
+        Test the async detail endpoints, including missing rows.
+        """
+        image = Image.objects.first()
+        self.assertSameResponse(f'images/{image.id}/')
+        self.assertSameResponse(f'pdfs/{self.pdf.id}/')
+
+        # Verify missing rows return 404
+        self.assertEqual(self.assertSameResponse('images/9999/').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.assertSameResponse('pdfs/9999/').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_method_not_allowed(self):
+        """
+        Test that the async endpoints only accept GET and HEAD.
+        """
+        response = self.client.post('/api/async/images/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+class AsyncPageTableTests(TestCase):
+    def setUp(self):
+        """
+        Upload a three page PDF into an empty media directory.
+        """
+        media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+
+        self.client = APIClient()
+        document = fitz.open()
+        for width in (100, 200, 300):
+            document.new_page(width=width, height=400)
+        response = self.client.post('/api/upload/?type=pdf', document.tobytes(), content_type='application/octet-stream')
+        self.pdf = PDF.objects.get(id=response.data['id'])
+
+    def test_page_table(self):
+        """
+        Test that the page table windows match the synchronous endpoint.
+        """
+        url = f'pdfs/{self.pdf.id}/?include=pages&pages_size=2'
+        pages = self.client.get(f'/api/async/{url}').json()['pages']
+        sync_pages = self.client.get(f'/api/{url}').json()['pages']
+
+        # Verify the window
+        self.assertEqual(pages['results'], sync_pages['results'])
+        self.assertEqual([row['width'] for row in pages['results']], [100, 200])
+        self.assertEqual(pages['count'], 3)
+        self.assertIn('/api/async/pdfs/', pages['next'])
+        self.assertIn('pages_after=2', pages['next'])
+
+    def test_page_table_backfill(self):
+        """
+        Test that a missing page table is read from the file and recorded.
+        """
+        self.pdf.pages.all().delete()
+
+        response = self.client.get(f'/api/async/pdfs/{self.pdf.id}/?include=pages')
+
+        # Verify the table was recorded again
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['pages']['count'], 3)
+        self.assertEqual(self.pdf.pages.count(), 3)
+
+
+class AsyncMediaTests(TestCase):
+    def setUp(self):
+        """
+        Store a file referenced by a PDF in an empty media directory.
+        """
+        media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+
+        self.content = bytes(range(256)) * 1000
+        self.name = default_storage.save('pdfs/ab/cd/report.pdf', ContentFile(self.content))
+        PDF.objects.create(file=self.name, num_pages=1)
+        self.unreferenced = default_storage.save('images/ab/cd/deleted.png', ContentFile(b'png'))
+        self.url = f'/api/async/media/{self.name}'
+
+    async def read(self, response):
+        return b''.join([chunk async for chunk in response.streaming_content])
+
+    async def test_full_file(self):
+        """
+        Test that a whole file is streamed with its length and validators.
+        """
+        response = await AsyncClient().get(self.url)
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(await self.read(response), self.content)
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn('ETag', response)
+
+    async def test_byte_range_and_conditional_get(self):
+        """
+        Test byte ranges and 304 responses.
+        """
+        client = AsyncClient()
+        response = await client.get(self.url, headers={'Range': 'bytes=70000-'})
+
+        # Verify the partial response
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(await self.read(response), self.content[70000:])
+        self.assertEqual(response['Content-Range'], f'bytes 70000-{len(self.content) - 1}/{len(self.content)}')
+
+        # Verify a matching ETag returns 304
+        response = await client.get(self.url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_access_check(self):
+        """
+        Test that unreferenced uploads and traversals are not served.
+        """
+        client = AsyncClient()
+        for url in (f'/api/async/media/{self.unreferenced}', '/api/async/media/derivatives/../../settings.py'):
+            # Verify the response
+            self.assertEqual((await client.get(url)).status_code, status.HTTP_404_NOT_FOUND, url)
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    async def test_x_accel_redirect(self):
+        """
+        Test that the transfer is handed to nginx when MEDIA_ACCEL is set.
+        """
+        response = await AsyncClient().get(self.url)
+
+        # Verify the response
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
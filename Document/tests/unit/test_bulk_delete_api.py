@@ -0,0 +1,167 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from ...deletion import sweep_deleted_files
+from ...jobs import _run_task
+from ...models import FileDeletion, Image, PDF, RenderedPage
+
+
+class BulkDeleteTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client.
+        """
+        self.client = APIClient()
+
+    def create_image(self, content=None, **fields):
+        name = default_storage.save('images/bulk.png', ContentFile(content or b'image'))
+        return Image.objects.create(file=name, width=10, height=10, channels=3, **fields)
+
+    def create_pdf(self, content=b'%PDF-1.4 bulk', sha256=None):
+        name = default_storage.save('pdfs/bulk.pdf', ContentFile(content))
+        return PDF.objects.create(file=name, num_pages=1, sha256=sha256)
+
+    def test_bulk_delete_images_by_ids(self):
+        """
+        Test that the listed images are deleted at once and their files queued.
+        """
+        images = [self.create_image() for _ in range(3)]
+
+        response = self.client.post('/api/images/delete/', {'ids': [images[0].id, images[2].id]}, format='json')
+
+        # Verify the rows are gone and the files are queued, not yet removed
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"deleted": 2})
+        self.assertEqual(list(Image.objects.values_list('id', flat=True)), [images[1].id])
+        queued = set(FileDeletion.objects.filter(kind=FileDeletion.KIND_FILE).values_list('name', flat=True))
+        self.assertEqual(queued, {images[0].file.name, images[2].file.name})
+        self.assertTrue(default_storage.exists(images[0].file.name))
+
+        # Verify the sweeper removes them and empties the queue
+        self.assertEqual(sweep_deleted_files(), 2)
+        self.assertFalse(default_storage.exists(images[0].file.name))
+        self.assertFalse(default_storage.exists(images[2].file.name))
+        self.assertTrue(default_storage.exists(images[1].file.name))
+        self.assertEqual(FileDeletion.objects.count(), 0)
+
+    def test_bulk_delete_images_by_filter(self):
+        """
+        Test that images can be selected with the filters of the list endpoint.
+        """
+        old, new = self.create_image(), self.create_image()
+        Image.objects.filter(id=old.id).update(uploaded_at=timezone.now() - timedelta(days=30))
+        before = (timezone.now() - timedelta(days=1)).isoformat()
+
+        response = self.client.post('/api/images/delete/', {'filters': {'uploaded_at__lt': before}}, format='json')
+
+        # Verify only the old image was deleted
+        self.assertEqual(response.data, {"deleted": 1})
+        self.assertEqual(list(Image.objects.values_list('id', flat=True)), [new.id])
+
+    @patch('Document.jobs._get_executor')
+    def test_bulk_delete_schedules_sweep(self, mock_get_executor):
+        """
+        Test that the sweeper is started on the worker pool once the rows are deleted.
+        """
+        image = self.create_image()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/images/delete/', {'ids': [image.id]}, format='json')
+
+        # Verify the submitted task
+        mock_get_executor.return_value.submit.assert_called_once_with(_run_task, sweep_deleted_files)
+
+    def test_bulk_delete_query_count_is_constant(self):
+        """
+        Test that the number of queries does not grow with the number of images.
+        """
+        def count_queries(image_count):
+            ids = [self.create_image().id for _ in range(image_count)]
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post('/api/images/delete/', {'ids': ids}, format='json')
+            return len(queries)
+
+        self.assertEqual(count_queries(3), count_queries(40))
+
+    def test_bulk_delete_keeps_shared_files(self):
+        """
+        Test that a file still used by a remaining image, or reused since it was queued, is kept.
+        """
+        image = self.create_image(sha256='a' * 64)
+        Image.objects.create(file=image.file.name, sha256=image.sha256, width=10, height=10, channels=3)
+        single = self.create_image(derivatives={'128': {'file': 'derivatives/bulk_128.jpg'}})
+
+        self.client.post('/api/images/delete/', {'ids': [image.id, single.id]}, format='json')
+
+        # Verify the shared file and its tiles are not queued, the derivative is
+        names = set(FileDeletion.objects.values_list('name', flat=True))
+        self.assertNotIn(image.file.name, names)
+        self.assertNotIn('a' * 64, names)
+        self.assertIn('derivatives/bulk_128.jpg', names)
+
+        # A new row pointing at a queued file keeps it alive
+        Image.objects.create(file=single.file.name, width=10, height=10, channels=3)
+        sweep_deleted_files()
+        self.assertTrue(default_storage.exists(single.file.name))
+
+    def test_bulk_delete_transformed_caches_queued(self):
+        """
+        Test that the tiles and the transformed file of a transformed image are queued.
+        """
+        transforms = [{'op': 'rotate', 'angle': 90}]
+        image = self.create_image(sha256='b' * 64, transforms=transforms)
+        default_storage.save(f'transformed/{"b" * 64}-x.png', ContentFile(b'x'))
+
+        self.client.post('/api/images/delete/', {'ids': [image.id]}, format='json')
+
+        # Verify the queued cache entries
+        kinds = set(FileDeletion.objects.exclude(kind=FileDeletion.KIND_FILE).values_list('kind', flat=True))
+        self.assertEqual(kinds, {FileDeletion.KIND_TILES, FileDeletion.KIND_TRANSFORMED})
+
+    def test_bulk_delete_pdfs(self):
+        """
+        Test that deleting PDFs deletes their rendered pages, unless a PDF with the same content remains.
+        """
+        orphan = self.create_pdf(b'%PDF-1.4 one', sha256='c' * 64)
+        shared = self.create_pdf(b'%PDF-1.4 two', sha256='d' * 64)
+        successor = PDF.objects.create(file=shared.file.name, num_pages=1, sha256=shared.sha256)
+        orphan_page, shared_page = self.create_image(), self.create_image()
+        RenderedPage.objects.create(pdf=orphan, image=orphan_page, pdf_sha256=orphan.sha256, render_key='png', page_number=1)
+        RenderedPage.objects.create(pdf=shared, image=shared_page, pdf_sha256=shared.sha256, render_key='png', page_number=1)
+
+        response = self.client.post('/api/pdfs/delete/', {'ids': [orphan.id, shared.id]}, format='json')
+
+        # Verify the rows
+        self.assertEqual(response.data, {"deleted": 2})
+        self.assertEqual(list(PDF.objects.values_list('id', flat=True)), [successor.id])
+        self.assertEqual(list(Image.objects.values_list('id', flat=True)), [shared_page.id])
+        self.assertEqual(RenderedPage.objects.get().pdf_id, successor.id)
+
+        # Verify the queued files: the orphaned PDF and its page, not the shared file
+        names = set(FileDeletion.objects.filter(kind=FileDeletion.KIND_FILE).values_list('name', flat=True))
+        self.assertEqual(names, {orphan.file.name, orphan_page.file.name})
+
+    def test_bulk_delete_invalid_requests(self):
+        """
+        Test that a request without a valid selection returns a 400 error and deletes nothing.
+        """
+        self.create_image()
+        cases = [
+            ({}, "Either ids or filters is required"),
+            ({'ids': 'all'}, "ids must be a list of integers"),
+            ({'filters': {}}, "filters must be a non-empty object"),
+            ({'filters': {'uploaded_before': '2024-01-01'}}, "Unsupported filter: uploaded_before"),
+            ({'filters': {'width__gt': 'wide'}}, "Invalid value for width__gt: wide"),
+        ]
+        for data, error in cases:
+            response = self.client.post('/api/images/delete/', data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {"error": error})
+        self.assertEqual(Image.objects.count(), 1)
@@ -0,0 +1,198 @@
+import shutil
+import tempfile
+import threading
+from io import BytesIO
+from unittest import skipUnless
+import fitz
+from asgiref.sync import async_to_sync
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image as PILImage
+from rest_framework.test import APIClient
+from rest_framework import status
+from ...db import ReadReplicaRouter, read_from_replica, reads_from_replica
+from ...jobs import run_job, shutdown_executor
+from ...models import ConversionJob, Image, PDF
+
+
+class DefaultAliasRouter(ReadReplicaRouter):
+    # The test databases have no replica, use 'default' in its place
+    replica = 'default'
+
+
+class DatabaseSettingsTests(TestCase):
+    @skipUnless(connection.vendor == 'sqlite', "SQLite only")
+    def test_sqlite_pragmas(self):
+        """
+        Test that SQLite connections are opened in WAL mode with a busy timeout and synchronous=NORMAL.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+            cursor.execute("PRAGMA busy_timeout")
+            busy_timeout = cursor.fetchone()[0]
+            cursor.execute("PRAGMA synchronous")
+            synchronous = cursor.fetchone()[0]
+
+        # Verify the settings
+        self.assertEqual(journal_mode, 'wal')
+        self.assertEqual(busy_timeout, 5000)
+        self.assertEqual(synchronous, 1)  # NORMAL
+
+    def test_router_reads(self):
+        """
+        Test that only reads made under read_from_replica go to the replica.
+        """
+        router = DefaultAliasRouter()
+
+        # Verify the routing
+        self.assertIsNone(router.db_for_read(Image))
+        with read_from_replica():
+            self.assertEqual(router.db_for_read(Image), 'default')
+            self.assertIsNone(router.db_for_write(Image))
+        self.assertIsNone(router.db_for_read(Image))
+
+    def test_router_without_replica(self):
+        """
+        Test that reads stay on 'default' when no replica is configured.
+        """
+        with read_from_replica():
+            # Verify the routing
+            self.assertIsNone(ReadReplicaRouter().db_for_read(Image))
+
+    def test_router_never_migrates_replica(self):
+        """
+        Test that the replica, a mirror of 'default', is never migrated.
+        """
+        router = ReadReplicaRouter()
+
+        # Verify the routing
+        self.assertFalse(router.allow_migrate('replica', 'Document'))
+        self.assertIsNone(router.allow_migrate('default', 'Document'))
+
+    def test_reads_from_replica_decorator(self):
+        """
+        Test that decorated sync and async views run under read_from_replica.
+        """
+        router = DefaultAliasRouter()
+
+        @reads_from_replica
+        def sync_view():
+            return router.db_for_read(Image)
+
+        @reads_from_replica
+        async def async_view():
+            return router.db_for_read(Image)
+
+        # Verify the routing inside and after the views
+        self.assertEqual(sync_view(), 'default')
+        self.assertEqual(async_to_sync(async_view)(), 'default')
+        self.assertIsNone(router.db_for_read(Image))
+
+    def test_list_and_detail_views_use_replica(self):
+        """
+        Test that the list and detail endpoints read through the replica router.
+        """
+        image = Image.objects.create(file='images/scan.png', width=10, height=10, channels=3)
+        seen = []
+
+        class RecordingRouter(DefaultAliasRouter):
+            def db_for_read(self, model, **hints):
+                seen.append(super().db_for_read(model, **hints))
+                return None
+
+        client = APIClient()
+        with override_settings(DATABASE_ROUTERS=[RecordingRouter()]):
+            for url in ('/api/images/', f'/api/images/{image.id}/', '/api/async/images/', f'/api/async/images/{image.id}/'):
+                seen.clear()
+                self.assertEqual(client.get(url).status_code, status.HTTP_200_OK)
+
+                # Verify the reads were routed to the replica
+                self.assertTrue(seen, url)
+                self.assertEqual(set(seen), {'default'}, url)
+
+
+@override_settings(IMAGE_DERIVATIVE_SIZES=[])
+class DatabaseConcurrencyTests(TransactionTestCase):
+    """
+    Parallel writers against the configured database backend: run the suite
+    with POSTGRES_DB set to exercise PostgreSQL instead of SQLite.
+    """
+    THREADS = 8
+    UPLOADS_PER_THREAD = 5
+
+    def setUp(self):
+        """
+        Use an empty media directory.
+        """
+        media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        # Background tasks started by the test finish before the media directory goes
+        self.addCleanup(shutdown_executor)
+
+    def run_in_threads(self, target):
+        """
+        Start target(index) on THREADS threads at once and return the exceptions they raised.
+        """
+        barrier = threading.Barrier(self.THREADS)
+        errors = []
+
+        def run(index):
+            try:
+                barrier.wait()
+                target(index)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return errors
+
+    def test_parallel_uploads(self):
+        """
+        Test that images uploaded from many threads at once are all stored.
+        """
+        def upload(index):
+            client = APIClient()
+            for number in range(self.UPLOADS_PER_THREAD):
+                image_file = BytesIO()
+                PILImage.new('RGB', (20, 20), (index, number, 0)).save(image_file, 'PNG')
+                response = client.post('/api/upload/?type=image', image_file.getvalue(), content_type='application/octet-stream')
+                assert response.status_code == status.HTTP_201_CREATED, response.data
+
+        errors = self.run_in_threads(upload)
+
+        # Verify every upload was stored
+        self.assertEqual(errors, [])
+        self.assertEqual(Image.objects.count(), self.THREADS * self.UPLOADS_PER_THREAD)
+
+    def test_parallel_conversions(self):
+        """
+        Test that conversions run at once all record their page images.
+        """
+        client = APIClient()
+        jobs = []
+        for index in range(self.THREADS):
+            document = fitz.open()
+            for page in range(3):
+                document.new_page(width=100, height=100).insert_text((10, 50), f"{index}-{page}")
+            response = client.post('/api/upload/?type=pdf', document.tobytes(), content_type='application/octet-stream')
+            jobs.append(ConversionJob.objects.create(pdf=PDF.objects.get(id=response.data['id'])))
+
+        errors = self.run_in_threads(lambda index: run_job(jobs[index].id))
+
+        # Verify every job finished with its pages
+        self.assertEqual(errors, [])
+        for job in jobs:
+            job.refresh_from_db()
+            self.assertEqual(job.status, ConversionJob.STATUS_DONE, job.error)
+            self.assertEqual(job.images.count(), 3)
+        self.assertEqual(Image.objects.count(), self.THREADS * 3)
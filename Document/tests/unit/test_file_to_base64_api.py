@@ -0,0 +1,100 @@
+import base64
+import json
+from io import BytesIO
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image as PILImage
+from ...uploads import base64_chunks, base64_length
+
+
+class FileToBase64Tests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and a test image.
+        """
+        self.client = APIClient()
+        image_file = BytesIO()
+        PILImage.effect_noise((120, 80), 40).save(image_file, 'PNG')
+        self.image_bytes = image_file.getvalue()
+
+    def post(self, content, name='test.png', stream=None):
+        url = '/api/file_to_base64/' if stream is None else f'/api/file_to_base64/?stream={stream}'
+        return self.client.post(url, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+
+    def test_file_to_base64_success(self):
+        """
+        Test that the encoded file is returned in a JSON response.
+        """
+        response = self.post(self.image_bytes)
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(base64.b64decode(response.data['base64']), self.image_bytes)
+
+    def test_file_to_base64_stream_json(self):
+        """
+        Test that ?stream=json streams the same JSON envelope.
+        """
+        response = self.post(self.image_bytes, stream='json')
+        body = b''.join(response.streaming_content)
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(int(response['Content-Length']), len(body))
+        self.assertEqual(base64.b64decode(json.loads(body)['base64']), self.image_bytes)
+
+    def test_file_to_base64_stream_text(self):
+        """
+        Test that ?stream=text streams the bare encoding of a PDF.
+        """
+        content = b'%PDF-1.4 ' + bytes(range(256)) * 10
+        response = self.post(content, name='test.pdf', stream='text')
+        body = b''.join(response.streaming_content)
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertEqual(body, base64.b64encode(content))
+
+    def test_base64_chunks_are_aligned(self):
+        """
+        Test that blocks of any size join into the encoding of the whole file.
+        """
+        for chunk_size in (1, 3, 4, 1000, 65536):
+            for size in (0, 1, 2, 3, 1001, 4096):
+                content = bytes(range(256)) * 20
+                chunks = list(base64_chunks(BytesIO(content[:size]), chunk_size))
+
+                # Verify the chunks end on whole quanta and join correctly
+                self.assertTrue(all(b'=' not in chunk for chunk in chunks[:-1]))
+                self.assertEqual(b''.join(chunks), base64.b64encode(content[:size]))
+                self.assertEqual(base64_length(size), len(base64.b64encode(content[:size])))
+
+    def test_file_to_base64_invalid_image(self):
+        """
+        Test that a file that is not an image is rejected from its header.
+        """
+        response = self.post(b'not an image', stream='json')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Invalid image file", response.data['error'])
+
+    def test_file_to_base64_invalid_parameters(self):
+        """
+        Test that an unsupported file type or stream mode returns a 400 error.
+        """
+        response = self.post(self.image_bytes, name='test.exe')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Unsupported file type"})
+
+        response = self.post(self.image_bytes, stream='xml')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid stream mode. Supported modes: json, text"})
+
+        response = self.client.post('/api/file_to_base64/', {}, format='multipart')
+        self.assertEqual(response.data, {"error": "No file provided"})
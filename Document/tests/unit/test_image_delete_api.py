@@ -1,9 +1,13 @@
+import hashlib
 from unittest.mock import patch
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from ...models import Image
+from ...deletion import sweep_deleted_files
+from ...models import FileDeletion, Image
 
 class ImageDeleteTests(TestCase):
     def setUp(self):
@@ -62,4 +66,27 @@ class ImageDeleteTests(TestCase):
 
         # Verify the response status code and error message
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
-        self.assertEqual(response.data, {"error": "An error occurred: Database error"})
\ No newline at end of file
+        self.assertEqual(response.data, {"error": "An error occurred: Database error"})
+
+    def test_image_delete_shared_file(self):
+        """
+        Test that a file shared by two images is only removed with its last reference.
+        """
+        content = b'shared image content'
+        first = Image.objects.create(
+            file=SimpleUploadedFile('shared.png', content, content_type='image/png'),
+            sha256=hashlib.sha256(content).hexdigest()
+        )
+        second = Image.objects.create(file=first.file.name, sha256=first.sha256)
+
+        # Deleting the first reference keeps the file
+        response = self.client.delete(f'/api/images/delete/{first.id}')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(default_storage.exists(second.file.name))
+
+        # Deleting the last reference queues it for the sweeper, which removes it
+        response = self.client.delete(f'/api/images/delete/{second.id}')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(FileDeletion.objects.filter(name=second.file.name).exists())
+        sweep_deleted_files()
+        self.assertFalse(default_storage.exists(second.file.name))
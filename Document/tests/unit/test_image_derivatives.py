@@ -0,0 +1,186 @@
+import base64
+from io import BytesIO
+from unittest.mock import patch
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from PIL import Image as PILImage
+from ...imaging import _generate_derivatives_by_id, derivative_owner, downscale, generate_derivatives
+from ...models import Image
+from ...serializers import ImageSerializer
+
+
+def make_image(size, image_format='JPEG', mode='RGB'):
+    image_file = BytesIO()
+    PILImage.new(mode, size, 'red').save(image_file, image_format)
+    return image_file.getvalue()
+
+
+@override_settings(MEDIA_URL='/media/', IMAGE_DERIVATIVE_SIZES=[128, 512, 2048])
+class ImageDerivativeTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client.
+        """
+        self.client = APIClient()
+
+    def test_generate_derivatives_large_jpeg(self):
+        """
+        Test that every configured size is generated for a large image, keeping the aspect ratio.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('large.jpg', make_image((3000, 1500)), content_type='image/jpeg'),
+            width=3000,
+            height=1500,
+            channels=3
+        )
+
+        derivatives = generate_derivatives(image)
+
+        # Verify the sizes and the stored files
+        self.assertEqual(sorted(derivatives, key=int), ['128', '512', '2048'])
+        self.assertEqual((derivatives['2048']['width'], derivatives['2048']['height']), (2048, 1024))
+        self.assertEqual((derivatives['128']['width'], derivatives['128']['height']), (128, 64))
+        with default_storage.open(derivatives['512']['file']) as derivative_file:
+            self.assertEqual(PILImage.open(derivative_file).size, (512, 256))
+        self.assertEqual(Image.objects.get(id=image.id).derivatives, derivatives)
+        self.assertTrue(all(derivative_owner(entry['file']) == image.id for entry in derivatives.values()))
+
+    def test_generate_derivatives_small_image(self):
+        """
+        Test that sizes larger than the image are skipped and transparency is kept.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('small.png', make_image((300, 200), 'PNG', 'RGBA'), content_type='image/png'),
+            width=300,
+            height=200,
+            channels=4
+        )
+
+        derivatives = generate_derivatives(image)
+
+        # Verify only the thumbnail exists and it is a PNG
+        self.assertEqual(list(derivatives), ['128'])
+        self.assertTrue(derivatives['128']['file'].endswith('.png'))
+
+    def test_generate_derivatives_applies_transforms(self):
+        """
+        Test that the derivatives of a rotated image are rotated.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('wide.jpg', make_image((1000, 500)), content_type='image/jpeg'),
+            width=500,
+            height=1000,
+            channels=3,
+            transforms=[{'op': 'rotate', 'angle': 90}]
+        )
+
+        derivatives = generate_derivatives(image)
+
+        # Verify the derivatives are upright
+        self.assertEqual((derivatives['512']['width'], derivatives['512']['height']), (256, 512))
+
+    def generate_while(self, image, change):
+        """
+        Run generate_derivatives on `image`, calling `change` after the source is
+        decoded, before any file is written. Returns the result and the names of the files written.
+        """
+        written = []
+        save = default_storage.save
+
+        def recording_save(name, content, *args, **kwargs):
+            written.append(save(name, content, *args, **kwargs))
+            return written[-1]
+
+        def changing_downscale(pil_image, size):
+            if not written:
+                change()
+            return downscale(pil_image, size)
+
+        with patch('Document.imaging.default_storage.save', side_effect=recording_save), \
+                patch('Document.imaging.downscale', side_effect=changing_downscale):
+            derivatives = generate_derivatives(image)
+        return derivatives, written
+
+    def test_generate_derivatives_for_deleted_image(self):
+        """
+        Test that derivatives built for an image deleted meanwhile are not kept.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('large.jpg', make_image((1000, 1000)), content_type='image/jpeg'),
+            width=1000,
+            height=1000,
+            channels=3
+        )
+
+        derivatives, written = self.generate_while(image, Image.objects.filter(pk=image.pk).delete)
+
+        # Verify nothing is recorded and the written files are gone
+        self.assertEqual(derivatives, {})
+        self.assertTrue(written)
+        for name in written:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_generate_derivatives_for_changed_image(self):
+        """
+        Test that derivatives built from outdated transforms do not replace those of the current row.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('large.jpg', make_image((1000, 1000)), content_type='image/jpeg'),
+            width=1000,
+            height=1000,
+            channels=3
+        )
+        current = generate_derivatives(Image.objects.get(pk=image.pk))
+        transforms = [{'op': 'rotate', 'angle': 90}]
+
+        derivatives, written = self.generate_while(
+            image, lambda: Image.objects.filter(pk=image.pk).update(transforms=transforms)
+        )
+
+        # Verify the current row and its files are untouched and the written files are gone
+        self.assertEqual(derivatives, current)
+        self.assertEqual(Image.objects.get(pk=image.pk).derivatives, current)
+        for entry in current.values():
+            self.assertTrue(default_storage.exists(entry['file']))
+        self.assertTrue(written)
+        for name in written:
+            self.assertFalse(default_storage.exists(name))
+
+    def test_serializer_exposes_derivative_urls(self):
+        """
+        Test that the ImageSerializer returns the URL of each derivative.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('large.jpg', make_image((1000, 1000)), content_type='image/jpeg'),
+            width=1000,
+            height=1000,
+            channels=3
+        )
+        generate_derivatives(image)
+
+        data = ImageSerializer(image).data
+
+        # Verify the URLs
+        self.assertEqual(sorted(data['derivatives']), ['128', '512'])
+        self.assertTrue(data['derivatives']['128'].startswith('/media/derivatives/'))
+
+    @patch('Document.jobs._get_executor')
+    def test_upload_schedules_derivatives(self, mock_get_executor):
+        """
+        Test that an upload queues derivative generation instead of doing it in the request.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/upload/',
+                {'file': base64.b64encode(make_image((800, 600))).decode('utf-8'), 'type': 'image'},
+                format='json'
+            )
+
+        # Verify nothing was generated yet and a task was submitted
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['derivatives'], {})
+        submitted = mock_get_executor.return_value.submit.call_args[0]
+        self.assertEqual(submitted[1:], (_generate_derivatives_by_id, response.data['id']))
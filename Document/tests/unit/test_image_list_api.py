@@ -1,7 +1,11 @@
-from django.test import TestCase
-from rest_framework.test import APIClient
+from unittest import skipUnless
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 from rest_framework import status
 from ...models import Image
+from ...pagination import KeysetPagination
 from ...serializers import ImageSerializer
 
 class ImageListTests(TestCase):
@@ -71,4 +75,113 @@ class ImageListTests(TestCase):
         # Verify the response status code and error message
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         self.assertIn("An error occurred", response.data["error"])
-  
\ No newline at end of file
+  
+    @override_settings(LIST_PAGE_SIZE=1)
+    def test_image_list_pagination(self):
+        """
+        Test that the image_list endpoint pages through the images with a cursor.
+        """
+        # First page
+        response = self.client.get('/api/images/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([image['id'] for image in response.data], [self.image1.id])
+        self.assertIn('rel="next"', response['Link'])
+
+        # Second and last page
+        response = self.client.get('/api/images/', {'cursor': response['X-Next-Cursor']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([image['id'] for image in response.data], [self.image2.id])
+        self.assertFalse(response.has_header('Link'))
+
+    @override_settings(LIST_MAX_PAGE_SIZE=1)
+    def test_image_list_page_size_is_capped(self):
+        """
+        Test that the requested page size cannot exceed the maximum.
+        """
+        response = self.client.get('/api/images/', {'page_size': 500})
+
+        # Verify only one image is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+
+    def test_image_list_invalid_cursor(self):
+        """
+        Test that an invalid cursor is rejected.
+        """
+        response = self.client.get('/api/images/', {'cursor': 'not-a-cursor'})
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid cursor"})
+
+    def test_image_list_filter_width(self):
+        """
+        Test that the image_list endpoint filters on a width range.
+        """
+        response = self.client.get('/api/images/', {'width__gte': 1000})
+
+        # Verify only the wide image is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([image['id'] for image in response.data], [self.image2.id])
+
+    @override_settings(LIST_PAGE_SIZE=1)
+    def test_image_list_ordering_with_nulls(self):
+        """
+        Test that descending ordering pages through all images, with unknown widths last.
+        """
+        image3 = Image.objects.create(file='images/test_image3.png')
+
+        ids = []
+        params = {'ordering': '-width'}
+        while True:
+            response = self.client.get('/api/images/', params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(image['id'] for image in response.data)
+            if not response.has_header('X-Next-Cursor'):
+                break
+            params['cursor'] = response['X-Next-Cursor']
+
+        # Verify the order
+        self.assertEqual(ids, [self.image2.id, self.image1.id, image3.id])
+
+    def test_image_list_invalid_ordering(self):
+        """
+        Test that ordering on an unsupported field is rejected.
+        """
+        response = self.client.get('/api/images/', {'ordering': 'file'})
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid ordering. Supported fields: uploaded_at, width, height, channels"})
+
+    @skipUnless(connection.vendor == 'sqlite', "Reads SQLite query plans")
+    def test_image_list_pages_seek_the_index(self):
+        """
+        Test that a deep page is fetched with a range seek on the (field, id) index, not an index scan.
+        """
+        Image.objects.bulk_create(
+            Image(file=f'images/scan_{index}.png', width=index % 50 if index % 7 else None, height=1, channels=3)
+            for index in range(500)
+        )
+        for ordering in ('width', '-width', 'uploaded_at', '-uploaded_at'):
+            paginator = KeysetPagination(ordering)
+            paginator.paginate_queryset(Image.objects.all(), Request(APIRequestFactory().get('/', {'page_size': 400})))
+            request = Request(APIRequestFactory().get('/', {'cursor': paginator.next_cursor}))
+            segments, _ = paginator.page_segments(Image.objects.all(), request)
+
+            # Verify every segment is an index search
+            for segment in segments:
+                plan = segment[:101].explain()
+                self.assertIn('SEARCH', plan, ordering)
+                self.assertNotIn('SCAN', plan, ordering)
+                self.assertNotIn('TEMP B-TREE', plan, ordering)
+
+    def test_image_list_nulls_only_for_nullable_fields(self):
+        """
+        Test that the NULL rows are only queried when the ordering field is nullable.
+        """
+        request = Request(APIRequestFactory().get('/'))
+
+        # Verify the number of segments
+        self.assertEqual(len(KeysetPagination('uploaded_at').page_segments(Image.objects.all(), request)[0]), 1)
+        self.assertEqual(len(KeysetPagination('width').page_segments(Image.objects.all(), request)[0]), 2)
@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image as PILImage
+from ...deletion import sweep_deleted_files
+from ...models import Image
+from ...tiles import pyramid_root
+
+
+def make_image(size, image_format, mode='RGB'):
+    """
+    Return an image whose left half is red and right half is blue.
+    """
+    pil_image = PILImage.new(mode, size, 'red')
+    pil_image.paste('blue', (size[0] // 2, 0, size[0], size[1]))
+    image_file = BytesIO()
+    pil_image.save(image_file, image_format)
+    return image_file.getvalue()
+
+
+class ImageTileTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client, a temporary tile cache and a 600x300 PNG image.
+        """
+        self.client = APIClient()
+        self.tile_cache_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(TILE_CACHE_DIR=self.tile_cache_dir, TILE_SIZE=256)
+        self.settings_override.enable()
+
+        self.image = Image.objects.create(
+            file=SimpleUploadedFile('wide.png', make_image((600, 300), 'PNG'), content_type='image/png'),
+            width=600,
+            height=300,
+            channels=3
+        )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.tile_cache_dir, ignore_errors=True)
+
+    def level_dir(self, image, level):
+        image.refresh_from_db()
+        return os.path.join(pyramid_root(image.sha256), '256', str(level))
+
+    def test_image_tiles_description(self):
+        """
+        Test that the pyramid description lists the levels without building anything.
+        """
+        response = self.client.get(f'/api/images/{self.image.id}/tiles/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['levels'], 11)
+        self.assertEqual(response.data['tile_size'], 256)
+        self.assertEqual(response.data['content_type'], 'image/jpeg')
+        self.assertEqual(os.listdir(self.tile_cache_dir), [])
+
+    def test_full_resolution_tile(self):
+        """
+        Test that a tile of the full-resolution level is cut from the image.
+        """
+        response = self.client.get(f'/api/images/{self.image.id}/tiles/10/2/1')
+
+        # Verify the edge tile holds the bottom right corner of the image
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        tile = PILImage.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tile.size, (88, 44))
+        red, green, blue = tile.getpixel((40, 20))
+        self.assertGreater(blue, 200)
+        self.assertLess(red, 50)
+
+    def test_low_level_built_from_upper_tiles(self):
+        """
+        Test that a lower level of a PNG is built from the tiles of the levels above it.
+        """
+        response = self.client.get(f'/api/images/{self.image.id}/tiles/8/0/0')
+
+        # Verify the tile is the image downscaled by 4
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tile = PILImage.open(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(tile.size, (150, 75))
+        self.assertGreater(tile.getpixel((10, 10))[0], 200)
+        self.assertGreater(tile.getpixel((140, 10))[2], 200)
+
+        # Verify the full-resolution level was cut once and reused
+        self.assertEqual(sorted(os.listdir(self.level_dir(self.image, 10))), ['0_0.jpg', '0_1.jpg', '1_0.jpg', '1_1.jpg', '2_0.jpg', '2_1.jpg', 'complete'])
+        self.assertTrue(os.path.exists(os.path.join(self.level_dir(self.image, 9), 'complete')))
+
+    def test_jpeg_low_level_skips_full_resolution(self):
+        """
+        Test that a low level of a JPEG is decoded at reduced size without building the levels above.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('large.jpg', make_image((2048, 1024), 'JPEG'), content_type='image/jpeg'),
+            width=2048,
+            height=1024,
+            channels=3
+        )
+
+        response = self.client.get(f'/api/images/{image.id}/tiles/8/0/0')
+
+        # Verify the tile and that no other level was built
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(PILImage.open(BytesIO(b''.join(response.streaming_content))).size, (256, 128))
+        self.assertEqual(os.listdir(os.path.dirname(self.level_dir(image, 8))), ['8'])
+
+    def test_transparent_image_tiles_are_png(self):
+        """
+        Test that images with an alpha channel get PNG tiles.
+        """
+        image = Image.objects.create(
+            file=SimpleUploadedFile('alpha.png', make_image((300, 300), 'PNG', 'RGBA'), content_type='image/png'),
+            width=300,
+            height=300,
+            channels=4
+        )
+
+        response = self.client.get(f'/api/images/{image.id}/tiles/9/1/1')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(PILImage.open(BytesIO(b''.join(response.streaming_content))).mode, 'RGBA')
+
+    def test_tile_not_modified(self):
+        """
+        Test that a conditional request with a matching ETag gets a 304.
+        """
+        etag = self.client.get(f'/api/images/{self.image.id}/tiles/10/0/0')['ETag']
+
+        response = self.client.get(f'/api/images/{self.image.id}/tiles/10/0/0', HTTP_IF_NONE_MATCH=etag)
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+    def test_tile_out_of_range(self):
+        """
+        Test that a level or tile outside the pyramid returns a 404.
+        """
+        # Verify the responses
+        self.assertEqual(self.client.get(f'/api/images/{self.image.id}/tiles/11/0/0').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get(f'/api/images/{self.image.id}/tiles/10/3/0').status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/images/9999/tiles/0/0/0').status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_image_removes_tiles(self):
+        """
+        Test that deleting an image removes its tile pyramid.
+        """
+        self.client.get(f'/api/images/{self.image.id}/tiles/10/0/0')
+        self.image.refresh_from_db()
+
+        response = self.client.delete(f'/api/images/delete/{self.image.id}')
+        sweep_deleted_files()
+
+        # Verify the tiles are gone
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(os.path.exists(pyramid_root(self.image.sha256)))
@@ -0,0 +1,206 @@
+from datetime import timedelta
+from unittest.mock import patch
+import fitz
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.core.files.uploadedfile import SimpleUploadedFile
+from ...jobs import resume_jobs, run_job, run_pending_jobs
+from ...models import ConversionJob, ConversionJobPage, PDF, Image, RenderedPage
+
+PDF_CONTENT = b"%PDF-1.4\n1 0 obj\n<</Type/Catalog/Pages 2 0 R>>\nendobj\n2 0 obj\n<</Type/Pages/Kids[3 0 R]/Count 1>>\nendobj\n3 0 obj\n<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>\nendobj\nxref\n0 4\n0000000000 65535 f\n0000000010 00000 n\n0000000053 00000 n\n0000000102 00000 n\ntrailer\n<</Size 4/Root 1 0 R>>\nstartxref\n149\n%%EOF"
+
+
+class ConversionJobTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and create a test PDF.
+        """
+        self.client = APIClient()
+        self.pdf = PDF.objects.create(
+            file=SimpleUploadedFile('test.pdf', PDF_CONTENT, content_type='application/pdf'),
+            num_pages=1,
+            page_width=612,
+            page_height=792
+        )
+
+    @patch('Document.jobs._get_executor')
+    def test_async_conversion_returns_job(self, mock_get_executor):
+        """
+        Test that an async conversion returns a pending job and submits it to the worker pool on commit.
+        """
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': self.pdf.id, 'async': True}, format='json')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], ConversionJob.STATUS_PENDING)
+        self.assertEqual(response.data['pages_total'], 1)
+        mock_get_executor.return_value.submit.assert_called_once_with(run_job, response.data['id'])
+
+        # Nothing has been rendered yet
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_job_detail_after_run(self):
+        """
+        Test that the job endpoint reports progress and the created images once the job has run.
+        """
+        job = ConversionJob.objects.create(pdf=self.pdf)
+
+        self.assertEqual(run_pending_jobs(), 1)
+
+        response = self.client.get(f'/api/jobs/{job.id}/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], ConversionJob.STATUS_DONE)
+        self.assertEqual(response.data['pages_done'], 1)
+        self.assertEqual(response.data['pages_total'], 1)
+        self.assertEqual(len(response.data['images']), 1)
+        self.assertEqual(response.data['images'][0]['id'], Image.objects.get().id)
+
+    def test_job_runs_only_once(self):
+        """
+        Test that a job which is already claimed by a live worker is not run again.
+        """
+        job = ConversionJob.objects.create(pdf=self.pdf, status=ConversionJob.STATUS_RUNNING, heartbeat_at=timezone.now())
+
+        run_job(job.id)
+
+        # Verify nothing was rendered
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_job_records_start(self):
+        """
+        Test that running a job records when it started and counts the attempt.
+        """
+        job = ConversionJob.objects.create(pdf=self.pdf)
+
+        run_job(job.id)
+
+        job.refresh_from_db()
+        response = self.client.get(f'/api/jobs/{job.id}/')
+
+        # Verify the job
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.started_at)
+        self.assertIsNotNone(job.heartbeat_at)
+        self.assertIsNotNone(response.data['started_at'])
+
+    def test_stale_job_is_reclaimed(self):
+        """
+        Test that a running job whose worker died, i.e. whose heartbeat is stale, is run again.
+        """
+        crashed_at = timezone.now() - timedelta(hours=1)
+        job = ConversionJob.objects.create(
+            pdf=self.pdf, status=ConversionJob.STATUS_RUNNING, started_at=crashed_at, heartbeat_at=crashed_at, attempts=1
+        )
+
+        self.assertEqual(run_pending_jobs(), 1)
+
+        # Verify the job was finished by the second attempt
+        job.refresh_from_db()
+        self.assertEqual(job.status, ConversionJob.STATUS_DONE)
+        self.assertEqual(job.attempts, 2)
+        self.assertGreater(job.started_at, crashed_at)
+        self.assertEqual(job.images.count(), 1)
+
+    def test_live_job_is_not_reclaimed(self):
+        """
+        Test that pending job runs leave a running job with a recent heartbeat alone.
+        """
+        ConversionJob.objects.create(pdf=self.pdf, status=ConversionJob.STATUS_RUNNING, heartbeat_at=timezone.now())
+
+        # Verify nothing was run
+        self.assertEqual(run_pending_jobs(), 0)
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_job_gives_up_after_max_attempts(self):
+        """
+        Test that a job which keeps crashing its worker is marked as failed instead of run again.
+        """
+        crashed_at = timezone.now() - timedelta(hours=1)
+        job = ConversionJob.objects.create(
+            pdf=self.pdf, status=ConversionJob.STATUS_RUNNING, heartbeat_at=crashed_at, attempts=3
+        )
+
+        with self.settings(CONVERSION_JOB_MAX_ATTEMPTS=3):
+            run_job(job.id)
+
+        # Verify the job failed without rendering
+        job.refresh_from_db()
+        self.assertEqual(job.status, ConversionJob.STATUS_FAILED)
+        self.assertEqual(job.error, "Gave up after 3 interrupted attempts")
+        self.assertIsNotNone(job.finished_at)
+        self.assertEqual(Image.objects.count(), 0)
+
+    @patch('Document.jobs._get_executor')
+    def test_resume_jobs_after_restart(self, mock_get_executor):
+        """
+        Test that restarting the process hands the pending and stale jobs, but not the live ones, to the worker pool.
+        """
+        pending = ConversionJob.objects.create(pdf=self.pdf)
+        stale = ConversionJob.objects.create(
+            pdf=self.pdf, status=ConversionJob.STATUS_RUNNING, heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+        ConversionJob.objects.create(pdf=self.pdf, status=ConversionJob.STATUS_RUNNING, heartbeat_at=timezone.now())
+        ConversionJob.objects.create(pdf=self.pdf, status=ConversionJob.STATUS_DONE)
+        restarted_at = timezone.now()
+        ConversionJob.objects.create(pdf=self.pdf)  # Submitted by enqueue_conversion after the restart
+
+        # Verify the submitted jobs
+        self.assertEqual(resume_jobs(created_before=restarted_at), 2)
+        submitted = [call.args for call in mock_get_executor.return_value.submit.call_args_list]
+        self.assertEqual(submitted, [(run_job, pending.id), (run_job, stale.id)])
+
+    @patch('fitz.open')
+    def test_job_failure_is_recorded(self, mock_fitz_open):
+        """
+        Test that a conversion error marks the job as failed with the error message.
+        """
+        mock_fitz_open.side_effect = Exception("PDF processing error")
+        job = ConversionJob.objects.create(pdf=self.pdf)
+
+        run_job(job.id)
+
+        response = self.client.get(f'/api/jobs/{job.id}/')
+
+        # Verify the response
+        self.assertEqual(response.data['status'], ConversionJob.STATUS_FAILED)
+        self.assertEqual(response.data['error'], "PDF processing error")
+        self.assertEqual(response.data['images'], [])
+
+    def test_job_images_in_page_order(self):
+        """
+        Test that the job endpoint lists the created images by page number, whatever their ids.
+        """
+        document = fitz.open()
+        for page in range(3):
+            document.new_page(width=100, height=100)
+        pdf = PDF.objects.create(
+            file=SimpleUploadedFile('pages.pdf', document.tobytes(), content_type='application/pdf'), num_pages=3
+        )
+        job = ConversionJob.objects.create(pdf=pdf)
+        run_job(job.id)
+        by_page = dict(RenderedPage.objects.filter(pdf=pdf).values_list('page_number', 'image_id'))
+
+        # Record the pages again, the last page first
+        ConversionJobPage.objects.filter(job=job).delete()
+        for page_number in (3, 1, 2):
+            ConversionJobPage.objects.create(job=job, image_id=by_page[page_number], page_number=page_number)
+
+        response = self.client.get(f'/api/jobs/{job.id}/')
+
+        # Verify the images are listed in page order
+        self.assertEqual([image['id'] for image in response.data['images']], [by_page[1], by_page[2], by_page[3]])
+
+    def test_job_not_found(self):
+        """
+        Test that the job endpoint returns a 404 for an unknown job.
+        """
+        response = self.client.get('/api/jobs/999/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, {"error": "Job not found."})
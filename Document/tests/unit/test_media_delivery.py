@@ -0,0 +1,201 @@
+import shutil
+import tempfile
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from ...models import Image, PDF
+
+
+class MediaDeliveryTests(TestCase):
+    def setUp(self):
+        """
+        Use an empty media directory holding a referenced PDF, an unreferenced image and a derivative.
+        """
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+
+        self.client = APIClient()
+        self.content = bytes(range(256)) * 40
+        self.name = default_storage.save('pdfs/ab/cd/report.pdf', ContentFile(self.content))
+        self.pdf = PDF.objects.create(file=self.name, num_pages=1)
+        self.url = f'/media/{self.name}'
+
+    def get(self, url=None, **headers):
+        return self.client.get(url or self.url, headers=headers)
+
+    def test_full_file(self):
+        """
+        Test that a referenced file is sent whole with its validators.
+        """
+        response = self.get()
+
+        # Verify the response
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['Content-Length'], str(len(self.content)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+    def test_byte_range(self):
+        """
+        Test that a single byte range is sent with 206 Partial Content.
+        """
+        response = self.get(Range='bytes=100-1123')
+
+        # Verify the partial response
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[100:1124])
+        self.assertEqual(response['Content-Range'], f'bytes 100-1123/{len(self.content)}')
+        self.assertEqual(response['Content-Length'], '1024')
+
+    def test_open_and_suffix_ranges(self):
+        """
+        Test ranges without an end and ranges counting from the end of the file.
+        """
+        size = len(self.content)
+
+        # Verify an open range runs to the end of the file
+        response = self.get(Range=f'bytes={size - 10}-')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-10:])
+
+        # Verify a suffix range returns the last bytes
+        response = self.get(Range='bytes=-500')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-500:])
+        self.assertEqual(response['Content-Range'], f'bytes {size - 500}-{size - 1}/{size}')
+
+        # Verify an end past the file is clamped
+        response = self.get(Range=f'bytes=0-{size * 2}')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Length'], str(size))
+
+    def test_unsatisfiable_range(self):
+        """
+        Test that a range starting past the end of the file returns 416.
+        """
+        response = self.get(Range=f'bytes={len(self.content)}-')
+
+        # Verify the response
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_multiple_ranges_send_whole_file(self):
+        """
+        Test that a request for several ranges gets the whole file.
+        """
+        response = self.get(Range='bytes=0-9,20-29')
+
+        # Verify the whole file is sent
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_conditional_get(self):
+        """
+        Test that a matching If-None-Match or If-Modified-Since returns 304.
+        """
+        first = self.get()
+
+        # Verify the ETag and the modification date are honoured
+        self.assertEqual(self.get(If_None_Match=first['ETag']).status_code, 304)
+        self.assertEqual(self.get(If_Modified_Since=first['Last-Modified']).status_code, 304)
+        self.assertEqual(self.get(If_None_Match='"other"').status_code, 200)
+
+    def test_if_range(self):
+        """
+        Test that a range is only honoured while If-Range still matches the file.
+        """
+        etag = self.get()['ETag']
+
+        # Verify a matching validator keeps the range
+        self.assertEqual(self.get(Range='bytes=0-9', If_Range=etag).status_code, 206)
+
+        # Verify a stale validator sends the whole file
+        response = self.get(Range='bytes=0-9', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+
+    def test_unreferenced_upload(self):
+        """
+        Test that an uploaded file no row references is not served.
+        """
+        name = default_storage.save('images/ab/cd/deleted.png', ContentFile(b'png'))
+
+        # Verify the file is hidden, and served again once an image references it
+        self.assertEqual(self.get(f'/media/{name}').status_code, 404)
+        Image.objects.create(file=name, width=1, height=1, channels=3)
+        self.assertEqual(self.get(f'/media/{name}').status_code, 200)
+
+    def test_derived_and_unknown_files(self):
+        """
+        Test that derived files are served and files outside the managed directories are not.
+        """
+        derivative = default_storage.save('derivatives/ab/cd/scan_128.jpg', ContentFile(b'jpeg'))
+        other = default_storage.save('private/notes.txt', ContentFile(b'secret'))
+
+        # Verify the responses
+        self.assertEqual(self.get(f'/media/{derivative}').status_code, 200)
+        self.assertEqual(self.get(f'/media/{other}').status_code, 404)
+        self.assertEqual(self.get('/media/derivatives/ab/cd/missing.jpg').status_code, 404)
+        self.assertEqual(self.get('/media/derivatives/ab').status_code, 404)
+
+    def test_path_traversal(self):
+        """
+        Test that names leaving the media directory are rejected.
+        """
+        for url in ('/media/derivatives/../../settings.py', '/media/derivatives/..%2F..%2Fsettings.py',
+                    '/media//etc/passwd', '/media/derivatives\\..\\x'):
+            # Verify the response
+            self.assertEqual(self.get(url).status_code, 404, url)
+
+    def test_method_not_allowed(self):
+        """
+        Test that only GET and HEAD are accepted.
+        """
+        response = self.client.post(self.url)
+
+        # Verify the response
+        self.assertEqual(response.status_code, 405)
+        self.assertEqual(self.client.head(self.url).status_code, 200)
+
+    @override_settings(MEDIA_ACCEL='nginx', MEDIA_ACCEL_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        """
+        Test that nginx is told to send the file with X-Accel-Redirect.
+        """
+        response = self.get()
+
+        # Verify the response carries no body
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_ACCEL='sendfile')
+    def test_x_sendfile(self):
+        """
+        Test that the proxy is told to send the file with X-Sendfile.
+        """
+        response = self.get()
+
+        # Verify the response carries the absolute path
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.name))
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_ACCEL='nginx')
+    def test_offload_checks_access(self):
+        """
+        Test that a file is not handed to the proxy when it may not be served.
+        """
+        PDF.objects.all().delete()
+
+        # Verify the response
+        response = self.get()
+        self.assertEqual(response.status_code, 404)
+        self.assertNotIn('X-Accel-Redirect', response)
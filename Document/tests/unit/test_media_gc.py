@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+import time
+from io import StringIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from ...media_gc import collect_garbage, find_orphans
+from ...models import Image, PDF
+from ...tiles import pyramid_root
+from ...transforms import content_key, transformed_name
+
+
+class MediaGarbageCollectionTests(TestCase):
+    def setUp(self):
+        """
+        Use an empty media directory holding referenced and unreferenced files.
+        """
+        self.media_root = tempfile.mkdtemp()
+        self.tile_cache = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root, TILE_CACHE_DIR=self.tile_cache)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.addCleanup(shutil.rmtree, self.tile_cache, ignore_errors=True)
+
+        self.image = Image.objects.create(file=self.save('images/kept.png', b'kept'), width=1, height=1, channels=3)
+        self.pdf = PDF.objects.create(file=self.save('pdfs/kept.pdf', b'%PDF-kept'), num_pages=1)
+        self.orphans = [
+            self.save('images/rotated_old.png', b'12345'),
+            self.save('images/ab/cd/nested.png', b'123'),
+            self.save('pdfs/failed.pdf', b'%PDF-1'),
+        ]
+
+    def save(self, name, content, age=7200):
+        """
+        Store a file and make it look `age` seconds old.
+        """
+        name = default_storage.save(name, ContentFile(content))
+        modified = time.time() - age
+        os.utime(default_storage.path(name), (modified, modified))
+        return name
+
+    def test_collect_garbage(self):
+        """
+        Test that only the unreferenced files of the upload directories are deleted.
+        """
+        report = collect_garbage()
+
+        # Verify the report
+        self.assertEqual(report.scanned, 5)
+        self.assertEqual(report.orphaned, 3)
+        self.assertEqual(report.orphaned_bytes, 5 + 3 + 6)
+        self.assertEqual(report.deleted, 3)
+
+        # Verify the files
+        for name in self.orphans:
+            self.assertFalse(default_storage.exists(name))
+        self.assertTrue(default_storage.exists(self.image.file.name))
+        self.assertTrue(default_storage.exists(self.pdf.file.name))
+
+    def test_collect_garbage_dry_run(self):
+        """
+        Test that a dry run reports the unreferenced files without deleting them.
+        """
+        report = collect_garbage(dry_run=True)
+
+        # Verify the report and that the files are still there
+        self.assertEqual((report.orphaned, report.deleted), (3, 0))
+        for name in self.orphans:
+            self.assertTrue(default_storage.exists(name))
+
+    def test_recent_files_are_kept(self):
+        """
+        Test that a file younger than the grace period is not collected.
+        """
+        recent = self.save('images/uploading.png', b'new', age=10)
+
+        report = collect_garbage(grace_seconds=60)
+
+        # Verify the recent file was kept
+        self.assertEqual(report.deleted, 3)
+        self.assertTrue(default_storage.exists(recent))
+
+    def test_orphans_found_in_batches(self):
+        """
+        Test that files are checked a bounded batch at a time, with one query per model and batch.
+        """
+        self.orphans.append(self.save('derivatives/ab/cd/999999_orphan_128.jpg', b'derivative'))
+
+        # Two queries per batch of uploads, one per batch of derivatives
+        with self.assertNumQueries(2 * 3 + 1):
+            batches = list(find_orphans(batch_size=2))
+
+        # Verify the batches and the orphans found
+        self.assertTrue(all(scanned <= 2 for scanned, _ in batches))
+        self.assertEqual(sorted(stored.name for _, orphans in batches for stored in orphans), sorted(self.orphans))
+
+    def test_collect_derived_files(self):
+        """
+        Test that derivatives, transformed files and tile pyramids are deleted once no image uses them.
+        """
+        transforms = [{'op': 'rotate', 'angle': 90}]
+        image = Image.objects.create(
+            file=self.image.file.name, width=1, height=1, channels=3, sha256='a' * 64, transforms=transforms
+        )
+        kept_derivative = self.save(f'derivatives/ab/cd/{image.id}_kept_128.jpg', b'kept')
+        replaced_derivative = self.save(f'derivatives/ab/cd/{image.id}_replaced_128.jpg', b'replaced')
+        orphan_derivative = self.save('derivatives/ab/cd/999999_orphan_128.jpg', b'orphan')
+        legacy_derivative = self.save('derivatives/ab/cd/legacy_128.jpg', b'legacy')
+        Image.objects.filter(id=image.id).update(derivatives={'128': {'file': kept_derivative}})
+        kept_key = content_key(image)
+        orphan_key = 'b' * 64
+        kept_transformed = self.save(transformed_name(kept_key, '.png'), b'kept')
+        orphan_transformed = self.save(transformed_name(f'{orphan_key}-0123456789abcdef', '.png'), b'orphan')
+        flat_transformed = self.save(f'transformed/{kept_key}.jpg', b'flat')
+        flat_pyramid = os.path.join(self.tile_cache, kept_key)
+        for pyramid in (pyramid_root(kept_key), pyramid_root(orphan_key), flat_pyramid):
+            tile = os.path.join(pyramid, '256', '0', '0_0.png')
+            os.makedirs(os.path.dirname(tile))
+            with open(tile, 'wb') as tile_file:
+                tile_file.write(b'tile')
+            os.utime(tile, (time.time() - 7200, time.time() - 7200))
+            os.utime(pyramid, (time.time() - 7200, time.time() - 7200))
+
+        report = collect_garbage()
+
+        # Verify the report: the uploads, plus two derivatives, two transformed files and two pyramids
+        self.assertEqual(report.deleted, 3 + 6)
+
+        # Verify the files, derivatives without an image id being kept and flat cache entries collected
+        self.assertTrue(default_storage.exists(kept_derivative))
+        self.assertFalse(default_storage.exists(replaced_derivative))
+        self.assertFalse(default_storage.exists(orphan_derivative))
+        self.assertTrue(default_storage.exists(legacy_derivative))
+        self.assertTrue(default_storage.exists(kept_transformed))
+        self.assertFalse(default_storage.exists(orphan_transformed))
+        self.assertFalse(default_storage.exists(flat_transformed))
+        self.assertTrue(os.path.isdir(pyramid_root(kept_key)))
+        self.assertFalse(os.path.exists(pyramid_root(orphan_key)))
+        self.assertFalse(os.path.exists(flat_pyramid))
+
+    def test_collect_media_garbage_command(self):
+        """
+        Test that the command reports the unreferenced files.
+        """
+        out = StringIO()
+        call_command('collect_media_garbage', '--dry-run', stdout=out)
+
+        # Verify the output
+        self.assertEqual(out.getvalue().strip(), "Scanned 5 file(s), 3 unreferenced (14\xa0bytes), 0 deleted")
@@ -0,0 +1,113 @@
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from PIL import Image as PILImage
+from ...models import Image, PDF
+from ...storage import is_sharded, shard_derivative_files, shard_stored_files, sharded_path
+
+
+class MediaShardingTests(TestCase):
+    def setUp(self):
+        """
+        Use an empty media directory.
+        """
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.client = APIClient()
+
+    def read(self, name):
+        with default_storage.open(name) as stored:
+            return stored.read()
+
+    def test_sharded_path(self):
+        """
+        Test that names are spread over two levels of hash-prefix directories.
+        """
+        path = sharded_path('images', 'abc.png')
+
+        # Verify the layout
+        self.assertRegex(path, r'^images/[0-9a-f]{2}/[0-9a-f]{2}/abc\.png$')
+        self.assertEqual(path, sharded_path('images', 'abc.png'))
+        self.assertTrue(is_sharded(path, 'images'))
+        self.assertFalse(is_sharded('images/abc.png', 'images'))
+
+    def test_upload_is_sharded(self):
+        """
+        Test that an uploaded file is stored in the sharded layout.
+        """
+        image_file = BytesIO()
+        PILImage.new('RGB', (8, 8)).save(image_file, 'PNG')
+
+        response = self.client.post('/api/upload/?type=image', image_file.getvalue(), content_type='application/octet-stream')
+
+        # Verify the stored name
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(is_sharded(Image.objects.get().file.name, 'images'))
+
+    def test_shard_stored_files(self):
+        """
+        Test that flat files move to the sharded layout with every row pointing at them.
+        """
+        shared = default_storage.save('images/shared.png', ContentFile(b'shared'))
+        single = default_storage.save('pdfs/single.pdf', ContentFile(b'%PDF-single'))
+        first = Image.objects.create(file=shared, width=1, height=1, channels=3)
+        second = Image.objects.create(file=shared, width=1, height=1, channels=3)
+        pdf = PDF.objects.create(file=single, num_pages=1)
+
+        # Verify the batches
+        self.assertEqual(list(shard_stored_files(Image, batch_size=1)), [(1, 2), (0, 0)])
+        self.assertEqual(list(shard_stored_files(PDF)), [(1, 1)])
+
+        # Verify the rows and the files
+        first.refresh_from_db()
+        second.refresh_from_db()
+        pdf.refresh_from_db()
+        self.assertEqual(first.file.name, sharded_path('images', 'shared.png'))
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertEqual(pdf.file.name, sharded_path('pdfs', 'single.pdf'))
+        self.assertEqual(self.read(first.file.name), b'shared')
+        self.assertFalse(default_storage.exists(shared))
+        self.assertFalse(default_storage.exists(single))
+
+        # Verify that running again moves nothing
+        self.assertEqual(list(shard_stored_files(Image)), [(0, 0)])
+
+    def test_shard_derivative_files(self):
+        """
+        Test that flat derivative files move to the sharded layout.
+        """
+        name = default_storage.save('derivatives/thumb_128.jpg', ContentFile(b'thumb'))
+        image = Image.objects.create(
+            file='images/x.png', width=1, height=1, channels=3,
+            derivatives={'128': {'file': name, 'width': 1, 'height': 1}}
+        )
+
+        self.assertEqual(list(shard_derivative_files(Image)), [(1, 1)])
+
+        # Verify the row and the file
+        image.refresh_from_db()
+        self.assertEqual(image.derivatives['128']['file'], sharded_path('derivatives', 'thumb_128.jpg'))
+        self.assertEqual(self.read(image.derivatives['128']['file']), b'thumb')
+        self.assertFalse(default_storage.exists(name))
+
+    def test_shard_media_files_command(self):
+        """
+        Test that the command reports what it moved.
+        """
+        Image.objects.create(file=default_storage.save('images/a.png', ContentFile(b'a')), width=1, height=1, channels=3)
+        out = StringIO()
+
+        call_command('shard_media_files', stdout=out)
+
+        # Verify the output
+        self.assertIn("Moved 1 image file(s), updated 1 row(s)", out.getvalue())
+        self.assertIn("Moved 0 PDF file(s), updated 0 row(s)", out.getvalue())
@@ -23,7 +23,7 @@ class ImageModelTests(TestCase):
         )
 
         # Verify the image was saved correctly
-        self.assertTrue(image.file.name.startswith('images/test_image'))
+        self.assertRegex(image.file.name, r'^images/[0-9a-f]{2}/[0-9a-f]{2}/test_image')
         self.assertTrue(image.file.name.endswith('.jpg'))
         self.assertEqual(image.width, 800)
         self.assertEqual(image.height, 600)
@@ -40,7 +40,7 @@ class ImageModelTests(TestCase):
             content_type='image/jpeg'
         )
         image = Image.objects.create(file=mock_image)
-        self.assertTrue(str(image).startswith('images/test_image'))
+        self.assertRegex(str(image), r'^images/[0-9a-f]{2}/[0-9a-f]{2}/test_image')
         self.assertTrue(str(image).endswith('.jpg'))
 
 
@@ -65,7 +65,7 @@ class PDFModelTests(TestCase):
         )
 
         # Verify the PDF was saved correctly
-        self.assertTrue(pdf.file.name.startswith('pdfs/test_pdf'))
+        self.assertRegex(pdf.file.name, r'^pdfs/[0-9a-f]{2}/[0-9a-f]{2}/test_pdf')
         self.assertTrue(pdf.file.name.endswith('.pdf'))
         self.assertEqual(pdf.num_pages, 10)
         self.assertEqual(pdf.page_width, 595.0)
@@ -82,5 +82,5 @@ class PDFModelTests(TestCase):
             content_type='application/pdf'
         )
         pdf = PDF.objects.create(file=mock_pdf)
-        self.assertTrue(str(pdf).startswith('pdfs/test_pdf'))
+        self.assertRegex(str(pdf), r'^pdfs/[0-9a-f]{2}/[0-9a-f]{2}/test_pdf')
         self.assertTrue(str(pdf).endswith('.pdf'))
\ No newline at end of file
@@ -1,9 +1,14 @@
+import hashlib
 from unittest.mock import patch
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
 from django.shortcuts import get_object_or_404
-from ...models import PDF  # Adjust the import based on your project structure
+from ...deletion import sweep_deleted_files
+from ...models import FileDeletion, Image, PDF, RenderedPage  # Adjust the import based on your project structure
 
 class PDFDeleteTests(TestCase):
     def setUp(self):
@@ -63,4 +68,56 @@ class PDFDeleteTests(TestCase):
 
         # Verify the response status code and error message
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
-        self.assertEqual(response.data, {"error": "An error occurred: Database error"})
\ No newline at end of file
+        self.assertEqual(response.data, {"error": "An error occurred: Database error"})
+    def test_pdf_delete_shared_file(self):
+        """
+        Test that a file shared by two PDFs is only removed with its last reference.
+        """
+        content = b'%PDF-1.4 shared pdf content'
+        first = PDF.objects.create(
+            file=SimpleUploadedFile('shared.pdf', content, content_type='application/pdf'),
+            sha256=hashlib.sha256(content).hexdigest()
+        )
+        second = PDF.objects.create(file=first.file.name, sha256=first.sha256)
+
+        # Deleting the first reference keeps the file
+        response = self.client.delete(f'/api/pdfs/delete/{first.id}')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(default_storage.exists(second.file.name))
+
+        # Deleting the last reference queues it for the sweeper, which removes it
+        response = self.client.delete(f'/api/pdfs/delete/{second.id}')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertTrue(FileDeletion.objects.filter(name=second.file.name).exists())
+        sweep_deleted_files()
+        self.assertFalse(default_storage.exists(second.file.name))
+
+    def test_pdf_delete_invalidates_render_cache(self):
+        """
+        Test that deleting a PDF removes the page images rendered from it, with their derivatives.
+        """
+        pdf_content = b"%PDF-1.4\n1 0 obj\n<</Type/Catalog/Pages 2 0 R>>\nendobj\n2 0 obj\n<</Type/Pages/Kids[3 0 R]/Count 1>>\nendobj\n3 0 obj\n<</Type/Page/Parent 2 0 R/MediaBox[0 0 612 792]>>\nendobj\nxref\n0 4\n0000000000 65535 f\n0000000010 00000 n\n0000000053 00000 n\n0000000102 00000 n\ntrailer\n<</Size 4/Root 1 0 R>>\nstartxref\n149\n%%EOF"
+        pdf = PDF.objects.create(
+            file=SimpleUploadedFile('test.pdf', pdf_content, content_type='application/pdf'),
+            num_pages=1
+        )
+        response = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': pdf.id}, format='json')
+        page = Image.objects.get(id=response.data[0]['id'])
+        derivative_file = default_storage.save('derivatives/page_128.jpg', ContentFile(b'derivative'))
+        Image.objects.filter(id=page.id).update(derivatives={'128': {'file': derivative_file}})
+
+        response = self.client.delete(f'/api/pdfs/delete/{pdf.id}')
+
+        # Verify the cache entries and page images are gone, and their files queued for the sweeper
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(RenderedPage.objects.count(), 0)
+        self.assertEqual(Image.objects.count(), 0)
+        queued = set(FileDeletion.objects.values_list('kind', 'name'))
+        self.assertIn((FileDeletion.KIND_FILE, page.file.name), queued)
+        self.assertIn((FileDeletion.KIND_FILE, derivative_file), queued)
+
+        sweep_deleted_files()
+
+        # Verify the files are gone
+        self.assertFalse(default_storage.exists(page.file.name))
+        self.assertFalse(default_storage.exists(derivative_file))
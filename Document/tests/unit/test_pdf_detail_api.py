@@ -1,8 +1,11 @@
+from io import BytesIO
 from unittest.mock import patch
+import fitz
 from django.shortcuts import get_object_or_404
 from django.test import TestCase
 from rest_framework.test import APIClient
 from rest_framework import status
+from PIL import Image as PILImage
 
 from Document.serializers import PDFSerializer
 from ...models import PDF
@@ -70,3 +73,109 @@ class PDFDetailTests(TestCase):
         # Verify the response status code and error message
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         self.assertIn("An internal error occurred", response.data["error"])
+
+
+class PDFPageTableTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and upload a PDF with pages of different sizes and contents.
+        """
+        self.client = APIClient()
+
+        document = fitz.open()
+        text_page = document.new_page(width=200, height=300)
+        text_page.insert_text((20, 40), "Hello")
+        document.new_page(width=400, height=300).set_rotation(90)
+        image_bytes = BytesIO()
+        PILImage.new('RGB', (10, 10), 'red').save(image_bytes, 'PNG')
+        document.new_page(width=100, height=100).insert_image(fitz.Rect(0, 0, 50, 50), stream=image_bytes.getvalue())
+        self.pdf_bytes = document.tobytes()
+
+        response = self.client.post('/api/upload/?type=pdf', self.pdf_bytes, content_type='application/octet-stream')
+        self.pdf = PDF.objects.get(id=response.data['id'])
+
+    def test_page_table_recorded_at_upload(self):
+        """
+        Test that every page is recorded with its own size, rotation and content flags.
+        """
+        rows = list(self.pdf.pages.order_by('page_number').values_list(
+            'page_number', 'width', 'height', 'rotation', 'has_text', 'has_images'
+        ))
+
+        # Verify the page rows and the first page metadata
+        self.assertEqual(rows, [
+            (1, 200.0, 300.0, 0, True, False),
+            (2, 400.0, 300.0, 90, False, False),
+            (3, 100.0, 100.0, 0, False, True),
+        ])
+        self.assertEqual((self.pdf.num_pages, self.pdf.page_width, self.pdf.page_height), (3, 200.0, 300.0))
+
+    def test_pdf_detail_without_pages(self):
+        """
+        Test that the page table is only included on request.
+        """
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('pages', response.data)
+
+    def test_pdf_detail_with_pages(self):
+        """
+        Test that ?include=pages lists the pages, a window at a time.
+        """
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/', {'include': 'pages', 'pages_size': 2})
+
+        # Verify the first window
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        pages = response.data['pages']
+        self.assertEqual(pages['count'], 3)
+        self.assertEqual([page['page_number'] for page in pages['results']], [1, 2])
+        self.assertEqual(pages['results'][0]['mediabox'], [0.0, 0.0, 200.0, 300.0])
+        self.assertIn('pages_after=2', pages['next'])
+
+        # Verify the last window
+        response = self.client.get(pages['next'])
+        pages = response.data['pages']
+        self.assertEqual([page['page_number'] for page in pages['results']], [3])
+        self.assertIsNone(pages['next'])
+
+    def test_duplicate_upload_copies_page_table(self):
+        """
+        Test that a duplicate upload copies the page table without parsing the file.
+        """
+        with patch('Document.uploads.open_document') as mock_open_document:
+            response = self.client.post('/api/upload/?type=pdf', self.pdf_bytes, content_type='application/octet-stream')
+        mock_open_document.assert_not_called()
+
+        # Verify the copied rows
+        duplicate = PDF.objects.get(id=response.data['id'])
+        self.assertEqual(
+            list(duplicate.pages.order_by('page_number').values_list('page_number', 'width', 'rotation')),
+            [(1, 200.0, 0), (2, 400.0, 90), (3, 100.0, 0)]
+        )
+
+    def test_page_table_backfilled(self):
+        """
+        Test that a PDF stored without a page table gets one on its first request.
+        """
+        self.pdf.pages.all().delete()
+
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/', {'include': 'pages'})
+
+        # Verify the response and the stored rows
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['pages']['results']), 3)
+        self.assertEqual(self.pdf.pages.count(), 3)
+
+    def test_pdf_detail_invalid_page_window(self):
+        """
+        Test that invalid window parameters return a 400 error.
+        """
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/', {'include': 'pages', 'pages_size': 0})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Page size must be a positive integer"})
+
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/', {'include': 'pages', 'pages_after': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "pages_after must be a non-negative integer"})
@@ -1,4 +1,6 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from datetime import timedelta
+from django.utils import timezone
 from rest_framework.test import APIClient
 from rest_framework import status
 from ...models import PDF
@@ -71,3 +73,67 @@ class PDFListTests(TestCase):
         # Verify the response status code and error message
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
         self.assertIn("An error occurred", response.data["error"])
+
+    @override_settings(LIST_PAGE_SIZE=1)
+    def test_pdf_list_pagination(self):
+        """
+        Test that the pdf_list endpoint pages through the PDFs with a cursor.
+        """
+        # First page
+        response = self.client.get('/api/pdfs/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        first_id = response.data[0]['id']
+
+        # Second and last page
+        response = self.client.get('/api/pdfs/', {'cursor': response['X-Next-Cursor']})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertGreater(response.data[0]['id'], first_id)
+        self.assertFalse(response.has_header('Link'))
+
+    def test_pdf_list_invalid_page_size(self):
+        """
+        Test that a non-numeric page size is rejected.
+        """
+        response = self.client.get('/api/pdfs/', {'page_size': 'all'})
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Page size must be a positive integer"})
+
+    def test_pdf_list_filter_num_pages_and_uploaded_at(self):
+        """
+        Test that the pdf_list endpoint combines range filters.
+        """
+        one_hour_ago = (timezone.now() - timedelta(hours=1)).isoformat()
+
+        response = self.client.get('/api/pdfs/', {'num_pages__gt': 12, 'uploaded_at__gte': one_hour_ago})
+
+        # Verify only the longer PDF is returned
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([pdf['id'] for pdf in response.data], [self.pdf2.id])
+
+        # Nothing was uploaded in the future
+        response = self.client.get('/api/pdfs/', {'uploaded_at__gt': (timezone.now() + timedelta(hours=1)).isoformat()})
+        self.assertEqual(response.data, [])
+
+    def test_pdf_list_ordering(self):
+        """
+        Test that the pdf_list endpoint orders on page height.
+        """
+        response = self.client.get('/api/pdfs/', {'ordering': '-page_height'})
+
+        # Verify the order
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([pdf['id'] for pdf in response.data], [self.pdf2.id, self.pdf1.id])
+
+    def test_pdf_list_invalid_filter_value(self):
+        """
+        Test that a filter value which cannot be parsed is rejected.
+        """
+        response = self.client.get('/api/pdfs/', {'num_pages__gte': 'many'})
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid value for num_pages__gte: many"})
@@ -0,0 +1,98 @@
+from io import BytesIO
+from unittest.mock import patch
+import fitz
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image as PILImage
+from ...models import PDF
+
+
+class PDFPageTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and create a test PDF with pages of different sizes.
+        """
+        self.client = APIClient()
+
+        document = fitz.open()
+        for page_num in range(3):
+            document.new_page(width=100 + page_num * 50, height=200)
+        self.pdf = PDF.objects.create(
+            file=SimpleUploadedFile('pages.pdf', document.tobytes(), content_type='application/pdf'),
+            num_pages=3
+        )
+
+    def test_pdf_page_success(self):
+        """
+        Test that a single page is rendered with cache headers.
+        """
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/pages/2/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('max-age=', response['Cache-Control'])
+        self.assertEqual(PILImage.open(BytesIO(response.content)).size, (150, 200))
+
+    def test_pdf_page_dpi_and_format(self):
+        """
+        Test that the page is rendered at the requested DPI and format.
+        """
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/pages/1/', {'dpi': 144, 'output': 'jpeg'})
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(PILImage.open(BytesIO(response.content)).size, (200, 400))
+
+    def test_pdf_page_not_modified(self):
+        """
+        Test that a conditional request with a matching ETag gets a 304 without rendering.
+        """
+        etag = self.client.get(f'/api/pdfs/{self.pdf.id}/pages/1/')['ETag']
+
+        with patch('fitz.open') as mock_fitz_open:
+            response = self.client.get(f'/api/pdfs/{self.pdf.id}/pages/1/', HTTP_IF_NONE_MATCH=etag)
+        mock_fitz_open.assert_not_called()
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+
+        # Other render settings have another ETag
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/pages/1/', {'scale': 2}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_pdf_page_out_of_range(self):
+        """
+        Test that a page past the end of the PDF returns a 404.
+        """
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/pages/4/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, {"error": "Page not found."})
+
+    def test_pdf_page_invalid_scale(self):
+        """
+        Test that an out-of-range scale is rejected.
+        """
+        response = self.client.get(f'/api/pdfs/{self.pdf.id}/pages/1/', {'scale': 50})
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Scale must be a number between 0.1 and 8"})
+
+    def test_pdf_page_pdf_not_found(self):
+        """
+        Test that an unknown PDF returns a 404.
+        """
+        response = self.client.get('/api/pdfs/999/pages/1/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, {"error": "PDF not found."})
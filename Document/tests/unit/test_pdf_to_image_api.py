@@ -1,10 +1,14 @@
 from unittest.mock import patch
-from django.test import TestCase
+import fitz
+from django.test import TestCase, override_settings
 from rest_framework.test import APIClient
 from rest_framework import status
 from io import BytesIO
+from PIL import Image as PILImage
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from ...models import PDF, Image  # Adjust the import based on your project structure
+from ...render_worker import render_page
+from ...models import PDF, Image, RenderedPage  # Adjust the import based on your project structure
 from ...serializers import ImageSerializer  # Adjust the import based on your project structure
 
 class ConvertPDFToImageTests(TestCase):
@@ -98,4 +102,176 @@ class ConvertPDFToImageTests(TestCase):
 
         # Verify the response status code and error message
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
-        self.assertEqual(response.data, {"error": "An error occurred: PDF processing error"})
\ No newline at end of file
+        self.assertEqual(response.data, {"error": "An error occurred: PDF processing error"})
+    @override_settings(RENDER_WORKERS=2)
+    def test_convert_pdf_to_image_parallel(self):
+        """
+        Test that pages rendered on the process pool come back in page order.
+        """
+        # Create a PDF whose pages all have different sizes
+        document = fitz.open()
+        for page_num in range(5):
+            document.new_page(width=100 + page_num * 10, height=200)
+        pdf = PDF.objects.create(
+            file=SimpleUploadedFile('sizes.pdf', document.tobytes(), content_type='application/pdf'),
+            num_pages=5
+        )
+
+        response = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': pdf.id}, format='json')
+
+        # Verify the pages are returned and stored in page order
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([image['width'] for image in response.data], [100, 110, 120, 130, 140])
+        self.assertEqual(
+            list(Image.objects.order_by('id').values_list('width', flat=True)),
+            [100, 110, 120, 130, 140]
+        )
+
+    def test_convert_pdf_to_image_jpeg(self):
+        """
+        Test that pages can be rendered as JPEG with a chosen quality.
+        """
+        data = {
+            'pdf_id': self.pdf.id,
+            'format': 'jpeg',
+            'quality': 70
+        }
+
+        response = self.client.post('/api/convert_pdf_to_image/', data, format='json')
+
+        # Verify the response and the stored file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data[0]['file'].endswith('.jpg'))
+        self.assertEqual(response.data[0]['width'], 612)
+        self.assertEqual(response.data[0]['height'], 792)
+        self.assertEqual(response.data[0]['channels'], 3)
+        image = Image.objects.get(id=response.data[0]['id'])
+        self.assertEqual(PILImage.open(image.file).format, 'JPEG')
+
+    def test_convert_pdf_to_image_webp_compression(self):
+        """
+        Test that pages can be rendered as WebP with a compression level.
+        """
+        data = {
+            'pdf_id': self.pdf.id,
+            'format': 'webp',
+            'compression': 4
+        }
+
+        response = self.client.post('/api/convert_pdf_to_image/', data, format='json')
+
+        # Verify the response and the stored file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data[0]['file'].endswith('.webp'))
+        image = Image.objects.get(id=response.data[0]['id'])
+        self.assertEqual(PILImage.open(image.file).format, 'WEBP')
+
+    def test_convert_pdf_to_image_invalid_format(self):
+        """
+        Test that an unsupported output format is rejected.
+        """
+        data = {
+            'pdf_id': self.pdf.id,
+            'format': 'gif'
+        }
+
+        response = self.client.post('/api/convert_pdf_to_image/', data, format='json')
+
+        # Verify the response status code and error message
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid image format. Supported formats: png, jpeg, webp"})
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_convert_pdf_to_image_failure_leaves_nothing(self):
+        """
+        Test that a failure part-way through stores neither rows nor page files.
+        """
+        document = fitz.open()
+        for page_num in range(3):
+            document.new_page(width=100, height=100)
+        pdf = PDF.objects.create(
+            file=SimpleUploadedFile('three.pdf', document.tobytes(), content_type='application/pdf'),
+            num_pages=3
+        )
+        files_before = set(default_storage.listdir('images')[1]) if default_storage.exists('images') else set()
+
+        # Fail while rendering the last page
+        rendered = []
+        def render_then_fail(page, **options):
+            if len(rendered) == 2:
+                raise Exception("Render failed")
+            rendered.append(page.number)
+            return render_page(page, **options)
+
+        with patch('Document.rendering.render_page', side_effect=render_then_fail):
+            response = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': pdf.id}, format='json')
+
+        # Verify the error and that the first two pages were cleaned up
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(rendered, [0, 1])
+        self.assertEqual(Image.objects.count(), 0)
+        files_after = set(default_storage.listdir('images')[1]) if default_storage.exists('images') else set()
+        self.assertEqual(files_after, files_before)
+
+    def test_convert_pdf_to_image_uses_render_cache(self):
+        """
+        Test that converting the same PDF again returns the cached pages without rendering.
+        """
+        first = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': self.pdf.id}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+
+        # A second conversion must not open the document
+        with patch('fitz.open') as mock_fitz_open:
+            second = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': self.pdf.id}, format='json')
+        mock_fitz_open.assert_not_called()
+
+        # Verify the same images are returned and nothing new was stored
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(Image.objects.count(), 1)
+        self.assertEqual(RenderedPage.objects.get().image_id, first.data[0]['id'])
+
+    def test_convert_pdf_to_image_renders_missing_pages(self):
+        """
+        Test that an incomplete cache entry keeps its pages and only the missing ones are rendered.
+        """
+        document = fitz.open()
+        for page_num in range(5):
+            document.new_page(width=100 + page_num * 10, height=200)
+        pdf = PDF.objects.create(
+            file=SimpleUploadedFile('sizes.pdf', document.tobytes(), content_type='application/pdf'),
+            num_pages=5
+        )
+
+        for workers in (1, 2):
+            with self.subTest(workers=workers), override_settings(RENDER_WORKERS=workers):
+                first = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': pdf.id}, format='json')
+                kept = [first.data[0]['id'], first.data[2]['id'], first.data[4]['id']]
+                Image.objects.filter(id__in=[first.data[1]['id'], first.data[3]['id']]).delete()
+
+                with patch('Document.rendering.render_page', wraps=render_page) as mock_render_page:
+                    second = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': pdf.id}, format='json')
+
+                # Verify the kept pages are reused, in page order, and nothing is left unreferenced
+                self.assertEqual(second.status_code, status.HTTP_200_OK)
+                self.assertEqual([image['width'] for image in second.data], [100, 110, 120, 130, 140])
+                self.assertEqual([second.data[index]['id'] for index in (0, 2, 4)], kept)
+                if workers == 1:
+                    self.assertEqual(mock_render_page.call_count, 2)
+                self.assertEqual(RenderedPage.objects.filter(pdf=pdf).count(), 5)
+                self.assertEqual(Image.objects.count(), 5)
+
+                Image.objects.all().delete()
+
+    def test_convert_pdf_to_image_cache_is_per_settings(self):
+        """
+        Test that other render settings are not served from the cache.
+        """
+        self.client.post('/api/convert_pdf_to_image/', {'pdf_id': self.pdf.id}, format='json')
+
+        response = self.client.post('/api/convert_pdf_to_image/', {'pdf_id': self.pdf.id, 'format': 'jpeg'}, format='json')
+
+        # Verify a new page image was rendered
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data[0]['file'].endswith('.jpg'))
+        self.assertEqual(Image.objects.count(), 2)
@@ -0,0 +1,161 @@
+from io import BytesIO
+from unittest.mock import patch
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from django.core.files.uploadedfile import SimpleUploadedFile
+from PIL import Image as PILImage
+from PIL import ImageChops
+from PIL.JpegImagePlugin import JpegImageFile
+from ...models import Image
+from ...transforms import apply_transforms, parse_operations
+
+
+class ProcessImageTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and create a 400x300 test image with a noisy pattern.
+        """
+        self.client = APIClient()
+        self.pil_image = PILImage.effect_noise((400, 300), 60).convert('RGB')
+        image_file = BytesIO()
+        self.pil_image.save(image_file, 'PNG')
+        self.image = Image.objects.create(
+            file=SimpleUploadedFile('test_image.png', image_file.getvalue(), content_type='image/png'),
+            width=400,
+            height=300,
+            channels=3
+        )
+
+    def process(self, operations, image=None):
+        image = image or self.image
+        return self.client.post(f'/api/images/{image.id}/process/', {'operations': operations}, format='json')
+
+    def get_file(self, image=None):
+        """
+        Fetch and decode the transformed file of an image.
+        """
+        response = self.client.get(f'/api/images/{(image or self.image).id}/file/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, PILImage.open(BytesIO(b''.join(response.streaming_content)))
+
+    def test_process_image_success(self):
+        """
+        Test that a resize, a crop and a format change produce one WebP file of the expected size.
+        """
+        response = self.process([
+            {'op': 'resize', 'width': 200},
+            {'op': 'crop', 'left': 10, 'top': 20, 'right': 110, 'bottom': 70},
+            {'op': 'format', 'format': 'webp', 'quality': 80},
+        ])
+
+        # Verify the metadata
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['width'], response.data['height']), (100, 50))
+
+        # Verify the crop was fused into a single resize of the cropped region
+        self.assertEqual(response.data['transforms'], [
+            {'op': 'resize', 'width': 100, 'height': 50, 'resample': 'lanczos', 'box': [20.0, 40.0, 220.0, 140.0]},
+            {'op': 'format', 'format': 'webp', 'quality': 80},
+        ])
+
+        # Verify the file
+        file_response, result = self.get_file()
+        self.assertEqual(file_response['Content-Type'], 'image/webp')
+        self.assertEqual(result.format, 'WEBP')
+        self.assertEqual(result.size, (100, 50))
+
+    def test_crop_moves_before_rotation(self):
+        """
+        Test that a crop after a right-angle rotation runs first and gives the same pixels.
+        """
+        operations = [
+            {'op': 'rotate', 'angle': 90},
+            {'op': 'crop', 'left': 30, 'top': 50, 'right': 130, 'bottom': 250},
+        ]
+        expected = apply_transforms(self.pil_image, parse_operations(operations, 400, 300))
+
+        response = self.process(operations)
+
+        # Verify the plan and the pixels
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([transform['op'] for transform in response.data['transforms']], ['crop', 'rotate'])
+        file_response, result = self.get_file()
+        self.assertEqual(result.size, (100, 200))
+        self.assertIsNone(ImageChops.difference(result.convert('RGB'), expected).getbbox())
+
+    def test_operations_merge_with_existing_transforms(self):
+        """
+        Test that a processing request builds on the transforms already recorded.
+        """
+        self.client.post('/api/rotate/', {'image_id': self.image.id, 'angle': 90}, format='json')
+
+        response = self.process([{'op': 'rotate', 'angle': 270}, {'op': 'resize', 'width': 40, 'height': 30}])
+
+        # Verify the rotations cancelled out
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transforms'], [{'op': 'resize', 'width': 40, 'height': 30, 'resample': 'lanczos'}])
+
+    def test_jpeg_resize_decodes_at_reduced_size(self):
+        """
+        Test that a JPEG that is shrunk first is decoded at a reduced scale.
+        """
+        image_file = BytesIO()
+        PILImage.new('RGB', (1600, 1200), 'green').save(image_file, 'JPEG')
+        image = Image.objects.create(
+            file=SimpleUploadedFile('photo.jpg', image_file.getvalue(), content_type='image/jpeg'),
+            width=1600,
+            height=1200,
+            channels=3
+        )
+        self.process([{'op': 'resize', 'width': 200}], image)
+
+        with patch.object(JpegImageFile, 'draft', autospec=True, side_effect=JpegImageFile.draft) as mock_draft:
+            file_response, result = self.get_file(image)
+
+        # Verify the draft request and the result
+        mock_draft.assert_called_once()
+        self.assertEqual(mock_draft.call_args[0][2], (200, 150))
+        self.assertEqual((result.format, result.size), ('JPEG', (200, 150)))
+
+    def test_process_image_invalid_plan(self):
+        """
+        Test that an invalid operation is rejected before anything is changed.
+        """
+        response = self.process([
+            {'op': 'resize', 'width': 100},
+            {'op': 'crop', 'left': 0, 'top': 0, 'right': 120, 'bottom': 10},
+        ])
+
+        # Verify the response and that the image is untouched
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Operation 1: The crop box must be a non-empty region of the 100x75 image"})
+        self.image.refresh_from_db()
+        self.assertEqual(self.image.transforms, [])
+
+    def test_process_image_invalid_operations(self):
+        """
+        Test that a missing list, an unknown operation or a bad value returns a 400 error.
+        """
+        self.assertEqual(self.process([]).data, {"error": "Operations must be a non-empty list"})
+        self.assertEqual(
+            self.process([{'op': 'blur'}]).data,
+            {"error": "Operation 0: 'op' must be one of rotate, crop, resize, format"}
+        )
+        self.assertEqual(
+            self.process([{'op': 'format', 'format': 'gif'}]).data,
+            {"error": "Operation 0: 'format' must be one of jpeg, png, webp"}
+        )
+        self.assertEqual(
+            self.process([{'op': 'resize', 'width': 'wide'}]).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_process_image_not_found(self):
+        """
+        Test that processing a missing image returns a 404 error.
+        """
+        response = self.client.post('/api/images/9999/process/', {'operations': [{'op': 'rotate', 'angle': 90}]}, format='json')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, {"error": "Image not found."})
@@ -1,10 +1,15 @@
 from unittest.mock import patch
-from django.test import TestCase
+import subprocess
+from django.test import TestCase, override_settings
+from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
 from io import BytesIO
 from PIL import Image as PILImage
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import default_storage
+from ...storage import is_sharded
+from ...transforms import content_key, render_transformed, transformed_name
 from ...models import Image  # Adjust the import based on your project structure
 from ...serializers import ImageSerializer  # Adjust the import based on your project structure
 
@@ -119,4 +124,179 @@ class RotateImageTests(TestCase):
 
         # Verify the response status code and error message
         self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
-        self.assertEqual(response.data, {"error": "An error occurred: Image processing error"})
\ No newline at end of file
+        self.assertEqual(response.data, {"error": "An error occurred: Image processing error"})
+    def create_image(self, size, image_format, name):
+        """
+        Create an image whose top left quarter is red and the rest blue.
+        """
+        pil_image = PILImage.new('RGB', size, 'blue')
+        pil_image.paste('red', (0, 0, size[0] // 2, size[1] // 2))
+        image_file = BytesIO()
+        pil_image.save(image_file, image_format)
+        return Image.objects.create(
+            file=SimpleUploadedFile(name, image_file.getvalue()),
+            width=size[0],
+            height=size[1],
+            channels=3
+        )
+
+    def get_file(self, image):
+        """
+        Fetch the transformed file of an image.
+        """
+        response = self.client.get(f'/api/images/{image.id}/file/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, b''.join(response.streaming_content)
+
+    def test_rotate_records_transform_without_writing(self):
+        """
+        Test that a rotation only updates the metadata and leaves the stored file untouched.
+        """
+        image = self.create_image((120, 60), 'PNG', 'wide.png')
+        with image.file.open('rb'):
+            original = image.file.read()
+
+        response = self.client.post('/api/rotate/', {'image_id': image.id, 'angle': 90}, format='json')
+
+        # Verify the metadata and that the file is unchanged
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['transforms'], [{'op': 'rotate', 'angle': 90}])
+        self.assertEqual((response.data['width'], response.data['height']), (60, 120))
+        self.assertEqual(response.data['file'], reverse('image-file', args=[image.id]))
+        image.refresh_from_db()
+        with image.file.open('rb'):
+            self.assertEqual(image.file.read(), original)
+
+    def test_consecutive_rotations_collapse(self):
+        """
+        Test that consecutive rotations are merged, and that a full turn removes the transform.
+        """
+        for angle in (90, 90, 90):
+            response = self.client.post('/api/rotate/', {'image_id': self.image.id, 'angle': angle}, format='json')
+        self.assertEqual(response.data['transforms'], [{'op': 'rotate', 'angle': 270}])
+
+        response = self.client.post('/api/rotate/', {'image_id': self.image.id, 'angle': 90}, format='json')
+
+        # Verify the image is back to its uploaded file
+        self.assertEqual(response.data['transforms'], [])
+        self.assertTrue(response.data['file'].startswith('/media/images/'))
+
+    def test_arbitrary_rotations_collapse(self):
+        """
+        Test that arbitrary rotations with the same expand setting are resampled once.
+        """
+        image = self.create_image((100, 50), 'PNG', 'wide.png')
+        self.client.post('/api/rotate/', {'image_id': image.id, 'angle': 30, 'expand': True}, format='json')
+        response = self.client.post('/api/rotate/', {'image_id': image.id, 'angle': 15, 'expand': True}, format='json')
+
+        # Verify a single rotation by 45 degrees
+        self.assertEqual(
+            response.data['transforms'], [{'op': 'rotate', 'angle': 45, 'resample': 'bicubic', 'expand': True}]
+        )
+
+    def test_rotate_right_angle_is_exact(self):
+        """
+        Test that the file of an image rotated by 90 degrees has transposed pixels.
+        """
+        image = self.create_image((120, 60), 'PNG', 'wide.png')
+        with image.file.open('rb'):
+            expected = PILImage.open(image.file).transpose(PILImage.Transpose.ROTATE_90)
+            expected.load()
+
+        self.client.post('/api/rotate/', {'image_id': image.id, 'angle': 90}, format='json')
+        response, content = self.get_file(image)
+
+        # Verify the pixels and the format
+        self.assertEqual(response['Content-Type'], 'image/png')
+        rotated = PILImage.open(BytesIO(content))
+        self.assertEqual(rotated.format, 'PNG')
+        self.assertEqual(rotated.tobytes(), expected.tobytes())
+
+    def test_transformed_file_is_cached(self):
+        """
+        Test that the transformed file is encoded on the first request only.
+        """
+        self.client.post('/api/rotate/', {'image_id': self.image.id, 'angle': 180}, format='json')
+
+        with patch('Document.transforms.render_transformed', side_effect=render_transformed) as mock_render:
+            first_response, first = self.get_file(self.image)
+            second_response, second = self.get_file(self.image)
+
+        # Verify a single encode and identical responses
+        mock_render.assert_called_once()
+        self.assertEqual(first, second)
+        self.assertEqual(first_response['ETag'], second_response['ETag'])
+
+        # Verify the cached file is in the sharded layout
+        self.image.refresh_from_db()
+        name = transformed_name(content_key(self.image), '.png')
+        self.assertTrue(is_sharded(name, 'transformed'))
+        self.assertTrue(default_storage.exists(name))
+
+    @override_settings(JPEGTRAN_PATH=None)
+    @patch('Document.transforms.shutil.which', return_value=None)
+    def test_rotate_jpeg_keeps_format_and_tables(self, mock_which):
+        """
+        Test that without jpegtran a JPEG is transposed and re-encoded as JPEG with its own quantization tables.
+        """
+        image = self.create_image((64, 32), 'JPEG', 'photo.jpg')
+        with image.file.open('rb'):
+            quantization = PILImage.open(image.file).quantization
+
+        response = self.client.post('/api/rotate/', {'image_id': image.id, 'angle': 270}, format='json')
+        file_response, content = self.get_file(image)
+
+        # Verify the format, size and tables
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(file_response['Content-Type'], 'image/jpeg')
+        rotated = PILImage.open(BytesIO(content))
+        self.assertEqual(rotated.format, 'JPEG')
+        self.assertEqual(rotated.size, (32, 64))
+        self.assertEqual(rotated.quantization, quantization)
+
+    @override_settings(JPEGTRAN_PATH='/usr/bin/jpegtran')
+    @patch('Document.transforms.subprocess.run')
+    def test_rotate_jpeg_lossless_with_jpegtran(self, mock_run):
+        """
+        Test that jpegtran is used for right-angle JPEG rotations when available.
+        """
+        image = self.create_image((64, 32), 'JPEG', 'photo.jpg')
+        mock_run.return_value = subprocess.CompletedProcess([], 0, stdout=b'rotated jpeg', stderr=b'')
+
+        response = self.client.post('/api/rotate/', {'image_id': image.id, 'angle': 90}, format='json')
+        file_response, content = self.get_file(image)
+
+        # Verify jpegtran rotated clockwise by 270 and its output is served
+        self.assertEqual((response.data['width'], response.data['height']), (32, 64))
+        self.assertEqual(mock_run.call_args[0][0], ['/usr/bin/jpegtran', '-copy', 'all', '-perfect', '-rotate', '270'])
+        self.assertEqual(content, b'rotated jpeg')
+
+    def test_rotate_arbitrary_angle_with_expand(self):
+        """
+        Test that an arbitrary angle with expand keeps the whole image, with the size predicted by the metadata.
+        """
+        image = self.create_image((100, 50), 'PNG', 'wide.png')
+
+        response = self.client.post(
+            '/api/rotate/', {'image_id': image.id, 'angle': 37, 'expand': True, 'resample': 'bilinear'}, format='json'
+        )
+        file_response, content = self.get_file(image)
+
+        # Verify the image grew to hold the rotated corners
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.data['width'], 100)
+        self.assertEqual(PILImage.open(BytesIO(content)).size, (response.data['width'], response.data['height']))
+
+    def test_rotate_invalid_parameters(self):
+        """
+        Test that an unknown resampling filter or a non-numeric angle returns a 400 error.
+        """
+        response = self.client.post(
+            '/api/rotate/', {'image_id': self.image.id, 'angle': 30, 'resample': 'lanczos'}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Invalid resampling filter. Supported filters: nearest, bilinear, bicubic"})
+
+        response = self.client.post('/api/rotate/', {'image_id': self.image.id, 'angle': 'left'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Rotation angle must be a number"})
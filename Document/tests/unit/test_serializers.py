@@ -30,7 +30,7 @@ class ImageSerializerTests(TestCase):
 
         # Verify the serialized data
         self.assertEqual(serializer.data['id'], image.id)
-        self.assertTrue(serializer.data['file'].startswith('/media/images/test_image'))
+        self.assertRegex(serializer.data['file'], r'^/media/images/[0-9a-f]{2}/[0-9a-f]{2}/test_image')
         self.assertTrue(serializer.data['file'].endswith('.jpg'))
         self.assertEqual(serializer.data['width'], 800)
         self.assertEqual(serializer.data['height'], 600)
@@ -77,7 +77,7 @@ class ImageSerializerTests(TestCase):
         serializer = ImageSerializer(image)
 
         # Verify that the 'file' field contains the full URL
-        self.assertTrue(serializer.data['file'].startswith('/media/images/test_image'))
+        self.assertRegex(serializer.data['file'], r'^/media/images/[0-9a-f]{2}/[0-9a-f]{2}/test_image')
         self.assertTrue(serializer.data['file'].endswith('.jpg'))
 
 
@@ -107,7 +107,7 @@ class PDFSerializerTests(TestCase):
 
         # Verify the serialized data
         self.assertEqual(serializer.data['id'], pdf.id)
-        self.assertTrue(serializer.data['file'].startswith('/media/pdfs/test_pdf'))
+        self.assertRegex(serializer.data['file'], r'^/media/pdfs/[0-9a-f]{2}/[0-9a-f]{2}/test_pdf')
         self.assertTrue(serializer.data['file'].endswith('.pdf'))
         self.assertEqual(serializer.data['num_pages'], 10)
         self.assertEqual(serializer.data['page_width'], 595.0)
@@ -154,5 +154,5 @@ class PDFSerializerTests(TestCase):
         serializer = PDFSerializer(pdf)
 
         # Verify that the 'file' field contains the full URL
-        self.assertTrue(serializer.data['file'].startswith('/media/pdfs/test_pdf'))
+        self.assertRegex(serializer.data['file'], r'^/media/pdfs/[0-9a-f]{2}/[0-9a-f]{2}/test_pdf')
         self.assertTrue(serializer.data['file'].endswith('.pdf'))
\ No newline at end of file
@@ -1,10 +1,16 @@
+import hashlib
+from unittest.mock import patch
+from io import BytesIO
 from PyPDF2 import PdfReader
 from django.test import TestCase, override_settings
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from rest_framework import status
 import base64
-from ...models import Image, PDF
+from ...deletion import sweep_deleted_files
+from ...models import FileDeletion, Image, PDF
+from ...uploads import inspect_image, large_image_limit
 from PIL import Image as PILImage, UnidentifiedImageError
 
 
@@ -84,6 +90,24 @@ class UploadFileTests(TestCase):
         self.assertEqual(response.data['page_width'], pdf_reader.pages[0].mediabox.width)  # Page width of the mock PDF
         self.assertEqual(response.data['page_height'], pdf_reader.pages[0].mediabox.height)  # Page height of the mock PDF
 
+    def test_upload_image_as_pdf(self):
+        """
+        Test that an image sent as a PDF is rejected, although PyMuPDF could open it.
+        """
+        image_file = BytesIO()
+        PILImage.new('RGB', (40, 30), 'red').save(image_file, 'PNG')
+
+        response = self.client.post(
+            '/api/upload/',
+            {'file': base64.b64encode(image_file.getvalue()).decode('utf-8'), 'type': 'pdf'},
+            format='json'
+        )
+
+        # Verify the response and that nothing was stored
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Invalid PDF file")
+        self.assertFalse(PDF.objects.exists())
+
     def test_upload_missing_file(self):
         """
         Test uploading without providing a file.
@@ -145,4 +169,216 @@ class UploadFileTests(TestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data['error'], "Invalid file type. Supported types: image, pdf")
 
-    
\ No newline at end of file
+    @override_settings(MAX_IMAGE_PIXELS=100)
+    def test_inspect_image_pixel_limit(self):
+        """
+        Test that an image past MAX_IMAGE_PIXELS is rejected and that Pillow's own limit is only raised inside large_image_limit.
+        """
+        default_limit = PILImage.MAX_IMAGE_PIXELS
+        small, large = BytesIO(), BytesIO()
+        PILImage.new('RGB', (10, 10)).save(small, 'PNG')
+        PILImage.new('RGB', (10, 11)).save(large, 'PNG')
+
+        # Verify the upload check
+        self.assertEqual(inspect_image(small), (10, 10, 3))
+        with self.assertRaises(PILImage.DecompressionBombError):
+            inspect_image(large)
+
+        # Verify the process-wide limit is raised in the block only
+        with self.settings(MAX_IMAGE_PIXELS=default_limit * 4):
+            with large_image_limit():
+                with large_image_limit():
+                    self.assertEqual(PILImage.MAX_IMAGE_PIXELS, default_limit * 4)
+                self.assertEqual(PILImage.MAX_IMAGE_PIXELS, default_limit * 4)
+        self.assertEqual(PILImage.MAX_IMAGE_PIXELS, default_limit)
+
+    
+
+@override_settings(MEDIA_URL='/media/')
+class UploadStreamingTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and the raw bytes of a test image and PDF.
+        """
+        self.client = APIClient()
+
+        image_file = BytesIO()
+        PILImage.new('RGB', (120, 80)).save(image_file, 'PNG')
+        self.image_bytes = image_file.getvalue()
+        self.pdf_bytes = base64.b64decode(y)
+
+    def test_upload_raw_image(self):
+        """
+        Test uploading an image as a raw application/octet-stream body.
+        """
+        response = self.client.post(
+            '/api/upload/?type=image',
+            self.image_bytes,
+            content_type='application/octet-stream'
+        )
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['file'].startswith('/media/images/'))
+        self.assertEqual(response.data['width'], 120)
+        self.assertEqual(response.data['height'], 80)
+        self.assertEqual(response.data['channels'], 3)
+
+    def test_upload_raw_pdf(self):
+        """
+        Test uploading a PDF as a raw application/octet-stream body.
+        """
+        response = self.client.post(
+            '/api/upload/?type=pdf',
+            self.pdf_bytes,
+            content_type='application/octet-stream'
+        )
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['file'].endswith('.pdf'))
+        pdf_reader = PdfReader(BytesIO(self.pdf_bytes))
+        self.assertEqual(response.data['num_pages'], len(pdf_reader.pages))
+
+    def test_upload_raw_missing_type(self):
+        """
+        Test that a raw upload without the type query parameter is rejected.
+        """
+        response = self.client.post(
+            '/api/upload/',
+            self.image_bytes,
+            content_type='application/octet-stream'
+        )
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "File type is required (image or pdf)")
+
+    def test_upload_raw_invalid_pdf(self):
+        """
+        Test that a raw PDF upload is rejected from its first bytes.
+        """
+        response = self.client.post(
+            '/api/upload/?type=pdf',
+            self.image_bytes,
+            content_type='application/octet-stream'
+        )
+
+        # Verify the response and that nothing was stored
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Invalid PDF file")
+        self.assertEqual(PDF.objects.count(), 0)
+
+    def test_upload_multipart_image(self):
+        """
+        Test uploading an image as multipart/form-data.
+        """
+        mock_image = SimpleUploadedFile('scan.png', self.image_bytes, content_type='image/png')
+
+        response = self.client.post(
+            '/api/upload/',
+            {'file': mock_image, 'type': 'image'},
+            format='multipart'
+        )
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(response.data['file'].startswith('/media/images/'))
+        self.assertEqual(response.data['width'], 120)
+        self.assertEqual(Image.objects.count(), 1)
+
+
+@override_settings(MEDIA_URL='/media/')
+class UploadDeduplicationTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and the raw bytes of a test image.
+        """
+        self.client = APIClient()
+
+        image_file = BytesIO()
+        PILImage.new('RGB', (32, 16)).save(image_file, 'PNG')
+        self.image_bytes = image_file.getvalue()
+        self.sha256 = hashlib.sha256(self.image_bytes).hexdigest()
+
+    def test_identical_upload_reuses_blob(self):
+        """
+        Test that uploading the same bytes twice stores one blob and copies the metadata.
+        """
+        first = self.client.post(
+            '/api/upload/',
+            {'file': base64.b64encode(self.image_bytes).decode('utf-8'), 'type': 'image'},
+            format='json'
+        )
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(first.data['sha256'], self.sha256)
+
+        # The duplicate must not be parsed again
+        with patch('Document.uploads.inspect_image') as mock_inspect_image:
+            second = self.client.post(
+                '/api/upload/',
+                {'file': SimpleUploadedFile('copy.png', self.image_bytes, content_type='image/png'), 'type': 'image'},
+                format='multipart'
+            )
+        mock_inspect_image.assert_not_called()
+
+        # Verify the second row shares the file and metadata of the first
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertNotEqual(second.data['id'], first.data['id'])
+        self.assertEqual(second.data['file'], first.data['file'])
+        self.assertEqual(second.data['sha256'], self.sha256)
+        self.assertEqual((second.data['width'], second.data['height']), (32, 16))
+
+    def upload_racing_delete(self, sweep):
+        """
+        Upload the image twice, the first row being deleted between the duplicate
+        lookup of the second upload and its insert. Runs the sweeper in between if `sweep`.
+        """
+        payload = {'file': base64.b64encode(self.image_bytes).decode('utf-8'), 'type': 'image'}
+        first = Image.objects.get(id=self.client.post('/api/upload/', payload, format='json').data['id'])
+        self.client.delete(f'/api/images/delete/{first.id}')
+        if sweep:
+            sweep_deleted_files()
+
+        with patch('Document.uploads.find_duplicate', return_value=first):
+            second = self.client.post('/api/upload/', payload, format='json')
+        sweep_deleted_files()
+        return first, Image.objects.get(id=second.data['id'])
+
+    def test_identical_upload_cancels_queued_deletion(self):
+        """
+        Test that reusing a blob queued for deletion takes it off the queue, so the sweeper keeps it.
+        """
+        first, second = self.upload_racing_delete(sweep=False)
+
+        # Verify the blob was reused and kept
+        self.assertEqual(second.file.name, first.file.name)
+        self.assertFalse(FileDeletion.objects.exists())
+        self.assertTrue(default_storage.exists(second.file.name))
+
+    def test_identical_upload_after_blob_swept(self):
+        """
+        Test that an upload whose duplicate lost its blob to the sweeper stores its own copy.
+        """
+        first, second = self.upload_racing_delete(sweep=True)
+
+        # Verify a new blob was stored
+        self.assertNotEqual(second.file.name, first.file.name)
+        self.assertTrue(default_storage.exists(second.file.name))
+        self.assertEqual((second.width, second.height), (32, 16))
+
+    def test_multipart_upload_is_hashed_while_streamed(self):
+        """
+        Test that the multipart digest comes from the upload handler.
+        """
+        with patch('Document.uploads.file_sha256') as mock_file_sha256:
+            response = self.client.post(
+                '/api/upload/',
+                {'file': SimpleUploadedFile('scan.png', self.image_bytes, content_type='image/png'), 'type': 'image'},
+                format='multipart'
+            )
+
+        # Verify the digest without a second pass over the file
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['sha256'], self.sha256)
+        mock_file_sha256.assert_not_called()
@@ -0,0 +1,150 @@
+from io import BytesIO
+from unittest.mock import patch
+import fitz
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+from PIL import Image as PILImage
+from ...deletion import sweep_deleted_files
+from ...models import FileDeletion, Image, PDF, PDFPage
+from ...uploads import _save_batch_file
+
+
+class UploadBatchTests(TestCase):
+    def setUp(self):
+        """
+        Set up the test client and the bytes of a few test images and a test PDF.
+        """
+        self.client = APIClient()
+
+        self.images = []
+        for size in ((40, 30), (20, 10), (64, 64)):
+            image_file = BytesIO()
+            PILImage.new('RGB', size, 'blue').save(image_file, 'PNG')
+            self.images.append(image_file.getvalue())
+
+        document = fitz.open()
+        document.new_page(width=200, height=300)
+        document.new_page(width=300, height=200)
+        self.pdf_bytes = document.tobytes()
+
+    def stored_files(self):
+        return {
+            f'{directory}/{name}'
+            for directory in ('images', 'pdfs') if default_storage.exists(directory)
+            for name in default_storage.listdir(directory)[1]
+        }
+
+    def post(self, *contents):
+        files = [SimpleUploadedFile(f'file_{index}', content) for index, content in enumerate(contents)]
+        return self.client.post('/api/upload/batch/', {'files': files}, format='multipart')
+
+    def test_upload_batch_success(self):
+        """
+        Test that images and PDFs are stored in one request, with a result per file.
+        """
+        response = self.post(self.images[0], self.pdf_bytes, self.images[1])
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        results = response.data['results']
+        self.assertEqual([result['type'] for result in results], ['image', 'pdf', 'image'])
+        self.assertEqual([result['name'] for result in results], ['file_0', 'file_1', 'file_2'])
+        self.assertEqual((results[0]['data']['width'], results[2]['data']['width']), (40, 20))
+        self.assertEqual(results[1]['data']['num_pages'], 2)
+
+        # Verify the rows and the files
+        self.assertEqual(Image.objects.count(), 2)
+        self.assertEqual(PDFPage.objects.filter(pdf_id=results[1]['data']['id']).count(), 2)
+        for image in Image.objects.all():
+            self.assertTrue(default_storage.exists(image.file.name))
+
+    def test_upload_batch_rows_inserted_in_bulk(self):
+        """
+        Test that the rows of a batch are inserted with one query per table.
+        """
+        contents = self.images + [self.pdf_bytes]
+
+        # Look-ups of stored digests, then one insert per table inside one transaction
+        with self.assertNumQueries(2 + 2 + 3):
+            response = self.post(*contents)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_upload_batch_partial_failure(self):
+        """
+        Test that invalid files are reported without rejecting the valid ones.
+        """
+        response = self.post(self.images[0], b'not an image', b'%PDF-1.4 broken')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 400, 400])
+        self.assertEqual(results[1]['error'], "Invalid image file")
+        self.assertEqual(results[2]['error'], "Invalid PDF file")
+        self.assertEqual((Image.objects.count(), PDF.objects.count()), (1, 0))
+
+    def test_upload_batch_deduplicates(self):
+        """
+        Test that identical files, in the batch or already stored, share one blob.
+        """
+        first = self.post(self.images[0]).data['results'][0]['data']
+
+        with patch('Document.uploads._save_batch_file', wraps=_save_batch_file) as mock_save:
+            response = self.post(self.images[0], self.images[1], self.images[1])
+
+        # Verify that only the new content was written
+        self.assertEqual(mock_save.call_count, 1)
+        files = [result['data']['file'] for result in response.data['results']]
+        self.assertEqual(files[0], first['file'])
+        self.assertEqual(files[1], files[2])
+        self.assertEqual(Image.objects.count(), 4)
+
+    def test_upload_batch_reuses_queued_blob(self):
+        """
+        Test that a batch reusing a blob queued for deletion keeps it, and stores a copy once it is swept.
+        """
+        first = Image.objects.get(id=self.post(self.images[0]).data['results'][0]['data']['id'])
+        FileDeletion.objects.create(name=first.file.name)
+
+        response = self.post(self.images[0])
+
+        # Verify the blob was reused and taken off the queue
+        self.assertEqual(Image.objects.get(id=response.data['results'][0]['data']['id']).file.name, first.file.name)
+        self.assertEqual(sweep_deleted_files(), 0)
+        self.assertTrue(default_storage.exists(first.file.name))
+
+        default_storage.delete(first.file.name)
+
+        response = self.post(self.images[0])
+
+        # Verify a missing blob is stored again
+        name = Image.objects.get(id=response.data['results'][0]['data']['id']).file.name
+        self.assertNotEqual(name, first.file.name)
+        self.assertTrue(default_storage.exists(name))
+
+    def test_upload_batch_failure_removes_files(self):
+        """
+        Test that no file is left behind when the rows cannot be inserted.
+        """
+        stored_before = self.stored_files()
+        with patch('Document.models.PDFPage.objects.bulk_create', side_effect=Exception("Database error")):
+            response = self.post(self.images[0], self.pdf_bytes)
+
+        # Verify the response and that nothing was kept
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+        self.assertEqual(response.data, {"error": "An error occurred: Database error"})
+        self.assertEqual((Image.objects.count(), PDF.objects.count()), (0, 0))
+        self.assertEqual(self.stored_files(), stored_before)
+
+    def test_upload_batch_no_files(self):
+        """
+        Test that a request without files returns a 400 error.
+        """
+        response = self.client.post('/api/upload/batch/', {}, format='multipart')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "No files provided"})
@@ -0,0 +1,154 @@
+import hashlib
+import shutil
+import tempfile
+from io import BytesIO
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+from PIL import Image as PILImage
+from ...models import Image, UploadSession
+
+SESSION_DIR = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_URL='/media/', UPLOAD_SESSION_DIR=SESSION_DIR)
+class UploadSessionTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SESSION_DIR, ignore_errors=True)
+
+    def setUp(self):
+        """
+        Set up the test client and the bytes of a test image split in three chunks.
+        """
+        self.client = APIClient()
+
+        image_file = BytesIO()
+        PILImage.new('RGB', (64, 48)).save(image_file, 'PNG')
+        self.image_bytes = image_file.getvalue()
+        third = len(self.image_bytes) // 3 + 1
+        self.chunks = [self.image_bytes[i:i + third] for i in range(0, len(self.image_bytes), third)]
+
+    def _create_session(self):
+        response = self.client.post('/api/uploads/', {'type': 'image', 'size': len(self.image_bytes)}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def _put_chunk(self, session_id, index, checksum=None):
+        offset = sum(len(chunk) for chunk in self.chunks[:index])
+        headers = {'HTTP_X_CHUNK_OFFSET': str(offset)}
+        if checksum is not None:
+            headers['HTTP_X_CHUNK_SHA256'] = checksum
+        return self.client.put(
+            f'/api/uploads/{session_id}/chunks/{index}/',
+            self.chunks[index],
+            content_type='application/octet-stream',
+            **headers
+        )
+
+    def test_upload_session_out_of_order_and_commit(self):
+        """
+        Test that chunks sent out of order are assembled and committed into an Image.
+        """
+        session_id = self._create_session()
+
+        # Send the chunks in reverse order
+        for index in reversed(range(len(self.chunks))):
+            response = self._put_chunk(session_id, index, hashlib.sha256(self.chunks[index]).hexdigest())
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self.client.get(f'/api/uploads/{session_id}/')
+        self.assertEqual(response.data['received'], len(self.image_bytes))
+
+        # Commit the session
+        response = self.client.post(f'/api/uploads/{session_id}/commit/')
+
+        # Verify the created image
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['width'], 64)
+        self.assertEqual(response.data['height'], 48)
+        image = Image.objects.get(id=response.data['id'])
+        self.assertEqual(image.file.read(), self.image_bytes)
+        self.assertEqual(UploadSession.objects.get(id=session_id).status, UploadSession.STATUS_COMMITTED)
+
+        # Committing again returns the same image
+        response = self.client.post(f'/api/uploads/{session_id}/commit/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['id'], image.id)
+
+    def test_upload_session_checksum_mismatch(self):
+        """
+        Test that a chunk whose checksum does not match is rejected.
+        """
+        session_id = self._create_session()
+
+        response = self._put_chunk(session_id, 0, '0' * 64)
+
+        # Verify the response and that the chunk was not recorded
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Chunk checksum mismatch")
+        self.assertEqual(UploadSession.objects.get(id=session_id).chunks.count(), 0)
+
+    def test_upload_session_failed_retry_keeps_chunk(self):
+        """
+        Test that a corrupt retry of an accepted chunk leaves the accepted bytes in place.
+        """
+        session_id = self._create_session()
+        checksums = [hashlib.sha256(chunk).hexdigest() for chunk in self.chunks]
+        for index in range(len(self.chunks)):
+            self.assertEqual(self._put_chunk(session_id, index, checksums[index]).status_code, status.HTTP_200_OK)
+
+        # Retry the first chunk with corrupt bytes and the original checksum
+        good_chunk = self.chunks[0]
+        self.chunks[0] = bytes(len(good_chunk))
+        response = self._put_chunk(session_id, 0, checksums[0])
+        self.chunks[0] = good_chunk
+
+        # Verify the retry is rejected and the session still commits the original file
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], "Chunk checksum mismatch")
+        response = self.client.post(f'/api/uploads/{session_id}/commit/')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Image.objects.get(id=response.data['id']).file.read(), self.image_bytes)
+
+    def test_upload_session_commit_incomplete(self):
+        """
+        Test that a session with a missing chunk cannot be committed.
+        """
+        session_id = self._create_session()
+        self._put_chunk(session_id, 0)
+        self._put_chunk(session_id, 2)
+
+        response = self.client.post(f'/api/uploads/{session_id}/commit/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['error'], f"Missing data at offset {len(self.chunks[0])}")
+        self.assertEqual(Image.objects.count(), 0)
+
+    def test_upload_session_missing_offset(self):
+        """
+        Test that a chunk sent without an offset is rejected.
+        """
+        session_id = self._create_session()
+
+        response = self.client.put(
+            f'/api/uploads/{session_id}/chunks/0/',
+            self.chunks[0],
+            content_type='application/octet-stream'
+        )
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {"error": "Chunk offset is required"})
+
+    def test_upload_session_not_found(self):
+        """
+        Test that an unknown session returns a 404.
+        """
+        response = self.client.get('/api/uploads/00000000-0000-0000-0000-000000000000/')
+
+        # Verify the response
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data, {"error": "Upload session not found."})
@@ -70,4 +70,85 @@ class URLTests(TestCase):
         Test that the 'convert-pdf-to-image' URL resolves to the correct view.
         """
         url = reverse('convert-pdf-to-image')
-        self.assertEqual(resolve(url).view_name, 'convert-pdf-to-image')
\ No newline at end of file
+        self.assertEqual(resolve(url).view_name, 'convert-pdf-to-image')
+
+    def test_upload_session_urls(self):
+        """
+        Test that the resumable upload session URLs resolve to the correct views.
+        """
+        session_id = '00000000-0000-0000-0000-000000000000'
+        url = reverse('upload-session-create')
+        self.assertEqual(resolve(url).view_name, 'upload-session-create')
+        url = reverse('upload-session-detail', args=[session_id])
+        self.assertEqual(resolve(url).view_name, 'upload-session-detail')
+        url = reverse('upload-session-chunk', args=[session_id, 0])
+        self.assertEqual(resolve(url).view_name, 'upload-session-chunk')
+        url = reverse('upload-session-commit', args=[session_id])
+        self.assertEqual(resolve(url).view_name, 'upload-session-commit')
+
+    def test_job_detail_url(self):
+        """
+        Test that the 'job-detail' URL resolves to the correct view.
+        """
+        url = reverse('job-detail', args=[1])  # Use a sample ID
+        self.assertEqual(resolve(url).view_name, 'job-detail')
+
+    def test_pdf_page_url(self):
+        """
+        Test that the 'pdf-page' URL resolves to the correct view.
+        """
+        url = reverse('pdf-page', args=[1, 1])  # Use a sample ID and page
+        self.assertEqual(resolve(url).view_name, 'pdf-page')
+
+    def test_image_tile_url(self):
+        """
+        Test that the 'image-tile' URL resolves to the correct view.
+        """
+        url = reverse('image-tile', args=[1, 0, 0, 0])  # Use a sample ID and tile position
+        self.assertEqual(resolve(url).view_name, 'image-tile')
+
+    def test_image_file_url(self):
+        """
+        Test that the 'image-file' URL resolves to the correct view.
+        """
+        url = reverse('image-file', args=[1])  # Use a sample ID
+        self.assertEqual(resolve(url).view_name, 'image-file')
+
+    def test_process_image_url(self):
+        """
+        Test that the 'process-image' URL resolves to the correct view.
+        """
+        url = reverse('process-image', args=[1])  # Use a sample ID
+        self.assertEqual(resolve(url).view_name, 'process-image')
+
+    def test_upload_batch_url(self):
+        """
+        Test that the 'upload-batch' URL resolves to the correct view.
+        """
+        url = reverse('upload-batch')
+        self.assertEqual(resolve(url).view_name, 'upload-batch')
+
+    def test_bulk_delete_urls(self):
+        """
+        Test that the bulk delete URLs resolve to the correct views.
+        """
+        self.assertEqual(resolve(reverse('image-bulk-delete')).view_name, 'image-bulk-delete')
+        self.assertEqual(resolve(reverse('pdf-bulk-delete')).view_name, 'pdf-bulk-delete')
+
+    def test_media_url(self):
+        """
+        Test that the 'media' URL resolves to the media view.
+        """
+        url = reverse('media', args=['images/ab/cd/scan.png'])
+        self.assertEqual(url, '/media/images/ab/cd/scan.png')
+        self.assertEqual(resolve(url).view_name, 'media')
+
+    def test_async_urls(self):
+        """
+        Test that the async variants resolve to their views.
+        """
+        self.assertEqual(resolve(reverse('image-list-async')).view_name, 'image-list-async')
+        self.assertEqual(resolve(reverse('pdf-list-async')).view_name, 'pdf-list-async')
+        self.assertEqual(resolve(reverse('image-detail-async', args=[1])).view_name, 'image-detail-async')
+        self.assertEqual(resolve(reverse('pdf-detail-async', args=[1])).view_name, 'pdf-detail-async')
+        self.assertEqual(resolve(reverse('media-async', args=['pdfs/ab/cd/x.pdf'])).view_name, 'media-async')
@@ -0,0 +1,240 @@
+"""
+Deep-zoom tile pyramids for large images.
+
+Level `max_level` holds the image at full resolution and every level below it
+halves both dimensions, down to level 0 which is a single pixel. Each level is
+cut into square tiles of TILE_SIZE pixels, the tiles on the right and bottom
+edges being smaller.
+
+Levels are built lazily, the first time one of their tiles is requested, and
+kept on disk under TILE_CACHE_DIR/ab/cd/<content key>/<tile size>/<level>/<x>_<y>.<ext>,
+the content key being the image digest plus its transforms, sharded like the
+uploads (see storage.sharded_path).
+Only the full-resolution level is cut from a fully decoded image. A lower level
+is built from the tiles of the level above it, four tiles at a time, so memory
+use does not depend on the image size. JPEG sources can also skip the levels
+above: the decoder downsamples by up to 8 while decoding (draft()), so a low
+zoom level costs a fraction of a full decode.
+"""
+import math
+import os
+import shutil
+import tempfile
+import threading
+
+from django.conf import settings
+from PIL import Image as PILImage
+
+from .storage import sharded_path
+from .transforms import content_key, open_transformed, shares_transformed_content
+from .uploads import large_image_limit
+
+# Encoder settings of the tiles, by file extension
+TILE_FORMATS = {
+    '.jpg': ('JPEG', 'image/jpeg', {'quality': 90}),
+    '.png': ('PNG', 'image/png', {}),
+}
+
+# Name of the file marking a level whose tiles have all been written
+COMPLETE_MARKER = 'complete'
+
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def tile_size():
+    return getattr(settings, 'TILE_SIZE', 256)
+
+
+def max_level(width, height):
+    """
+    Index of the full-resolution level.
+    """
+    return math.ceil(math.log2(max(width, height, 1)))
+
+
+def level_dimensions(width, height, level):
+    """
+    Size in pixels of the image at a zoom level.
+    """
+    factor = 2 ** (max_level(width, height) - level)
+    return math.ceil(width / factor), math.ceil(height / factor)
+
+
+def tile_grid(width, height, level):
+    """
+    Number of (columns, rows) of tiles at a zoom level.
+    """
+    level_width, level_height = level_dimensions(width, height, level)
+    size = tile_size()
+    return math.ceil(level_width / size), math.ceil(level_height / size)
+
+
+def tile_extension(image):
+    """
+    Tiles are JPEG, or PNG when the image has an alpha channel.
+    """
+    return '.png' if image.channels in (2, 4) else '.jpg'
+
+
+def tile_content_type(image):
+    return TILE_FORMATS[tile_extension(image)][1]
+
+
+def pyramid_root(key):
+    """
+    Directory holding the tile pyramids of a content key, for every tile size.
+    """
+    return os.path.join(settings.TILE_CACHE_DIR, *sharded_path('', key).split('/'))
+
+
+def _pyramid_dir(image):
+    return os.path.join(pyramid_root(content_key(image)), str(tile_size()))
+
+
+def _tile_path(root, level, x, y, extension):
+    return os.path.join(root, str(level), f'{x}_{y}{extension}')
+
+
+def _level_complete(root, level):
+    return os.path.exists(os.path.join(root, str(level), COMPLETE_MARKER))
+
+
+def _build_lock(root):
+    with _build_locks_lock:
+        return _build_locks.setdefault(root, threading.RLock())
+
+
+def get_tile(image, level, x, y):
+    """
+    Return the path of a tile, building its level first when needed.
+    Raises IndexError when the level or the tile does not exist.
+    """
+    width, height = image.width, image.height
+    if not 0 <= level <= max_level(width, height):
+        raise IndexError(level)
+    columns, rows = tile_grid(width, height, level)
+    if not (0 <= x < columns and 0 <= y < rows):
+        raise IndexError((x, y))
+
+    root = _pyramid_dir(image)
+    extension = tile_extension(image)
+    path = _tile_path(root, level, x, y, extension)
+    if not os.path.exists(path):
+        # The source of a large scan is past Pillow's default limit, it passed the upload check
+        with large_image_limit():
+            _ensure_level(image, root, level, extension)
+    return path
+
+
+def delete_tiles(image):
+    """
+    Delete the tile pyramid of an image, unless another image has the same content and transforms.
+    """
+    if not image.sha256 or shares_transformed_content(image):
+        return
+    delete_pyramid(content_key(image))
+
+
+def delete_pyramid(key):
+    """
+    Delete the cached tiles of a content key, for every tile size.
+    """
+    shutil.rmtree(pyramid_root(key), ignore_errors=True)
+
+
+def _ensure_level(image, root, level, extension):
+    with _build_lock(root):
+        if _level_complete(root, level):
+            return
+        if _level_complete(root, level + 1):
+            _build_level_from_tiles(image, root, level, extension)
+        elif level == max_level(image.width, image.height) or _is_jpeg(image):
+            _build_level_from_source(image, root, level, extension)
+        else:
+            _ensure_level(image, root, level + 1, extension)
+            _build_level_from_tiles(image, root, level, extension)
+        open(os.path.join(root, str(level), COMPLETE_MARKER), 'w').close()
+
+
+def _is_jpeg(image):
+    with open_transformed(image) as file_obj:
+        with PILImage.open(file_obj) as pil_image:
+            return pil_image.format == 'JPEG'
+
+
+def _tile_mode(pil_image, extension):
+    """
+    Convert a decoded image to a mode its tile format can store.
+    """
+    if pil_image.mode == 'P':
+        pil_image = pil_image.convert('RGBA' if 'transparency' in pil_image.info else 'RGB')
+    if extension == '.png':
+        return pil_image if pil_image.mode in ('RGBA', 'LA', 'RGB', 'L') else pil_image.convert('RGBA')
+    return pil_image if pil_image.mode in ('RGB', 'L') else pil_image.convert('RGB')
+
+
+def _save_tile(tile, path, extension):
+    """
+    Write a tile through a temporary file, so a tile path never holds a partial image.
+    """
+    image_format, _, save_options = TILE_FORMATS[extension]
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as temp_file:
+            tile.save(temp_file, format=image_format, **save_options)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+
+
+def _build_level_from_source(image, root, level, extension):
+    """
+    Decode the source at (close to) the resolution of the level and cut it into tiles.
+    """
+    level_width, level_height = level_dimensions(image.width, image.height, level)
+    with open_transformed(image) as file_obj:
+        with PILImage.open(file_obj) as pil_image:
+            pil_image.draft(None, (level_width, level_height))
+            pil_image.load()
+            level_image = _tile_mode(pil_image, extension)
+            if level_image.size != (level_width, level_height):
+                factor = min(level_image.width // level_width, level_image.height // level_height)
+                if factor >= 2:
+                    level_image = level_image.reduce(factor)
+                level_image = level_image.resize((level_width, level_height), PILImage.LANCZOS)
+
+    size = tile_size()
+    columns, rows = tile_grid(image.width, image.height, level)
+    for y in range(rows):
+        for x in range(columns):
+            box = (x * size, y * size, min((x + 1) * size, level_width), min((y + 1) * size, level_height))
+            _save_tile(level_image.crop(box), _tile_path(root, level, x, y, extension), extension)
+
+
+def _build_level_from_tiles(image, root, level, extension):
+    """
+    Build each tile of a level from the (up to) four tiles covering it on the level above.
+    """
+    size = tile_size()
+    upper_width, upper_height = level_dimensions(image.width, image.height, level + 1)
+    columns, rows = tile_grid(image.width, image.height, level)
+    for y in range(rows):
+        for x in range(columns):
+            left, top = 2 * x * size, 2 * y * size
+            region_size = (min(2 * size, upper_width - left), min(2 * size, upper_height - top))
+            region = None
+            for dy in (0, 1):
+                for dx in (0, 1):
+                    if left + dx * size >= upper_width or top + dy * size >= upper_height:
+                        continue
+                    with PILImage.open(_tile_path(root, level + 1, 2 * x + dx, 2 * y + dy, extension)) as child:
+                        child.load()
+                        if region is None:
+                            region = PILImage.new(child.mode, region_size)
+                        region.paste(child, (dx * size, dy * size))
+            tile = region.resize((math.ceil(region_size[0] / 2), math.ceil(region_size[1] / 2)), PILImage.LANCZOS)
+            _save_tile(tile, _tile_path(root, level, x, y, extension), extension)
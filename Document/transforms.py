@@ -0,0 +1,691 @@
+"""
+Non-destructive image transforms.
+
+An Image keeps its uploaded file untouched and records the operations applied
+to it as an ordered list in Image.transforms, e.g. [{"op": "rotate", "angle": 90}].
+Changing the list is a metadata update. The transformed file is only encoded
+when it is requested, in a single decode -> transform -> encode pass, and is
+then cached in the storage under a name derived from the content digest and
+the transform list, so images with the same content and transforms share it.
+
+Operations, in their stored form:
+    rotate  {"angle", "resample", "expand"}   counter-clockwise, in degrees
+    crop    {"left", "top", "right", "bottom"}
+    resize  {"width", "height", "resample", "box"}
+            "box" is the region of the input that is resized, set by plan_transforms
+    format  {"format", "quality"}             encoding of the result
+"""
+import hashlib
+import io
+import json
+import math
+import shutil
+import subprocess
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image as PILImage
+from PIL import JpegImagePlugin
+
+from .models import Image
+from .rendering import content_sha256
+from .storage import sharded_path
+from .uploads import large_image_limit
+
+# Counter-clockwise right-angle rotations, done by transposing the pixels
+RIGHT_ANGLE_TRANSPOSES = {
+    90: PILImage.Transpose.ROTATE_90,
+    180: PILImage.Transpose.ROTATE_180,
+    270: PILImage.Transpose.ROTATE_270,
+}
+
+# Resampling filters accepted for rotations by arbitrary angles
+RESAMPLE_FILTERS = {
+    'nearest': PILImage.Resampling.NEAREST,
+    'bilinear': PILImage.Resampling.BILINEAR,
+    'bicubic': PILImage.Resampling.BICUBIC,
+}
+
+# Resampling filters accepted for resizes
+RESIZE_FILTERS = {
+    **RESAMPLE_FILTERS,
+    'box': PILImage.Resampling.BOX,
+    'lanczos': PILImage.Resampling.LANCZOS,
+}
+
+# Output formats accepted by the format operation, mapped to the PIL format name
+FORMATS = {
+    'jpeg': 'JPEG',
+    'png': 'PNG',
+    'webp': 'WEBP',
+}
+
+# Formats a transformed image can be written in, with the extension of its cached file
+OUTPUT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'WEBP': '.webp',
+    'GIF': '.gif',
+    'TIFF': '.tif',
+    'BMP': '.bmp',
+}
+
+# Image modes each encoder takes as they are, others are converted first
+ENCODER_MODES = {
+    'JPEG': ('RGB', 'L', 'CMYK'),
+    'WEBP': ('RGB', 'RGBA'),
+}
+
+
+def _is_right_angle(angle):
+    return angle % 90 == 0
+
+
+def rotation(angle, resample='bicubic', expand=False):
+    """
+    A counter-clockwise rotation by `angle` degrees. Right-angle rotations are
+    exact, so they carry no resampling filter or expand flag.
+    """
+    angle = angle % 360
+    if angle == int(angle):
+        angle = int(angle)
+    if _is_right_angle(angle):
+        return {'op': 'rotate', 'angle': angle}
+    return {'op': 'rotate', 'angle': angle, 'resample': resample, 'expand': bool(expand)}
+
+
+def crop(left, top, right, bottom):
+    return {'op': 'crop', 'left': left, 'top': top, 'right': right, 'bottom': bottom}
+
+
+def resize(width, height, resample='lanczos', box=None):
+    """
+    A resize to width x height of the `box` region of the input, or of the whole input.
+    """
+    transform = {'op': 'resize', 'width': width, 'height': height, 'resample': resample}
+    if box is not None:
+        transform['box'] = [round(value, 6) for value in box]
+    return transform
+
+
+# Size functions: the size of an image after an operation
+
+def _rotated_size(width, height, transform):
+    """
+    Size of an image after a rotation, computed the way Pillow's rotate() does.
+    """
+    angle = transform['angle']
+    if _is_right_angle(angle):
+        return (height, width) if angle % 180 else (width, height)
+    if not transform['expand']:
+        return width, height
+
+    radians = -math.radians(angle)
+    a, b = round(math.cos(radians), 15), round(math.sin(radians), 15)
+    d, e = round(-math.sin(radians), 15), round(math.cos(radians), 15)
+    center_x, center_y = width / 2.0, height / 2.0
+    c = a * -center_x + b * -center_y + center_x
+    f = d * -center_x + e * -center_y + center_y
+    xs = [a * x + b * y + c for x, y in ((0, 0), (width, 0), (width, height), (0, height))]
+    ys = [d * x + e * y + f for x, y in ((0, 0), (width, 0), (width, height), (0, height))]
+    return math.ceil(max(xs)) - math.floor(min(xs)), math.ceil(max(ys)) - math.floor(min(ys))
+
+
+def _cropped_size(width, height, transform):
+    return transform['right'] - transform['left'], transform['bottom'] - transform['top']
+
+
+def _resized_size(width, height, transform):
+    return transform['width'], transform['height']
+
+
+def _same_size(width, height, transform):
+    return width, height
+
+
+# Apply functions: run an operation on a decoded image
+
+def _apply_rotate(pil_image, transform):
+    angle = transform['angle']
+    if _is_right_angle(angle):
+        return pil_image.transpose(RIGHT_ANGLE_TRANSPOSES[angle])
+    return pil_image.rotate(angle, resample=RESAMPLE_FILTERS[transform['resample']], expand=transform['expand'])
+
+
+def _apply_crop(pil_image, transform):
+    return pil_image.crop((transform['left'], transform['top'], transform['right'], transform['bottom']))
+
+
+def _apply_resize(pil_image, transform):
+    box = tuple(transform['box']) if transform.get('box') else None
+    # reducing_gap lets Pillow shrink by an integer factor first, which is much cheaper
+    return pil_image.resize(
+        (transform['width'], transform['height']), RESIZE_FILTERS[transform['resample']], box=box, reducing_gap=3.0
+    )
+
+
+def _apply_nothing(pil_image, transform):
+    return pil_image
+
+
+# Scale functions: the same operation on the image scaled by a factor, used
+# when the source was decoded at a reduced size
+
+def _scale_nothing(transform, factor):
+    return transform
+
+
+def _scale_crop(transform, factor):
+    left, top = round(transform['left'] * factor), round(transform['top'] * factor)
+    return crop(
+        left, top,
+        max(left + 1, round(transform['right'] * factor)), max(top + 1, round(transform['bottom'] * factor)),
+    )
+
+
+def _scale_resize(transform, factor):
+    box = transform.get('box')
+    return resize(
+        max(1, round(transform['width'] * factor)),
+        max(1, round(transform['height'] * factor)),
+        transform['resample'],
+        [value * factor for value in box] if box else None,
+    )
+
+
+Operation = namedtuple('Operation', ['apply', 'size', 'scale'])
+
+TRANSFORM_OPS = {
+    'rotate': Operation(_apply_rotate, _rotated_size, _scale_nothing),
+    'crop': Operation(_apply_crop, _cropped_size, _scale_crop),
+    'resize': Operation(_apply_resize, _resized_size, _scale_resize),
+    'format': Operation(_apply_nothing, _same_size, _scale_nothing),
+}
+
+
+def transformed_size(width, height, transforms):
+    """
+    Size of an image after its transforms, without decoding it.
+    """
+    for transform in transforms or []:
+        width, height = TRANSFORM_OPS[transform['op']].size(width, height, transform)
+    return width, height
+
+
+def apply_transforms(pil_image, transforms):
+    """
+    Apply a transform list to a decoded image and return the result.
+    """
+    for transform in transforms or []:
+        pil_image = TRANSFORM_OPS[transform['op']].apply(pil_image, transform)
+    return pil_image
+
+
+def scale_transforms(transforms, factor):
+    """
+    Return the transform list for the same image scaled by `factor`.
+    """
+    return [TRANSFORM_OPS[transform['op']].scale(transform, factor) for transform in transforms or []]
+
+
+# Validation of the operations sent by clients
+
+def _number(operation, name, default=None):
+    value = operation.get(name, default)
+    if value is None:
+        raise ValueError(f"'{name}' is required")
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        number = None
+    if number is None or isinstance(value, bool) or not math.isfinite(number):
+        raise ValueError(f"'{name}' must be a number")
+    return number
+
+
+def _integer(operation, name, default=None):
+    number = _number(operation, name, default)
+    if not number.is_integer():
+        raise ValueError(f"'{name}' must be an integer")
+    return int(number)
+
+
+def _choice(operation, name, choices, default):
+    value = str(operation.get(name) or default).lower()
+    if value not in choices:
+        raise ValueError(f"'{name}' must be one of {', '.join(choices)}")
+    return value
+
+
+def _parse_rotate(operation, width, height):
+    expand = operation.get('expand', getattr(settings, 'ROTATE_EXPAND', False))
+    if not isinstance(expand, bool):
+        raise ValueError("'expand' must be true or false")
+    return rotation(
+        _number(operation, 'angle'),
+        _choice(operation, 'resample', RESAMPLE_FILTERS, getattr(settings, 'ROTATE_RESAMPLE', 'bicubic')),
+        expand,
+    )
+
+
+def _parse_crop(operation, width, height):
+    left, top = _integer(operation, 'left'), _integer(operation, 'top')
+    right, bottom = _integer(operation, 'right'), _integer(operation, 'bottom')
+    if not (0 <= left < right <= width and 0 <= top < bottom <= height):
+        raise ValueError(f"The crop box must be a non-empty region of the {width}x{height} image")
+    return crop(left, top, right, bottom)
+
+
+def _parse_resize(operation, width, height):
+    if operation.get('width') is None and operation.get('height') is None:
+        raise ValueError("'width' or 'height' is required")
+    # A missing dimension keeps the aspect ratio
+    if operation.get('width') is None:
+        new_height = _integer(operation, 'height')
+        new_width = max(1, round(new_height * width / height))
+    else:
+        new_width = _integer(operation, 'width')
+        new_height = _integer(operation, 'height', max(1, round(new_width * height / width)))
+    if new_width < 1 or new_height < 1:
+        raise ValueError("'width' and 'height' must be positive")
+    return resize(new_width, new_height, _choice(operation, 'resample', RESIZE_FILTERS, 'lanczos'))
+
+
+def _parse_format(operation, width, height):
+    transform = {'op': 'format', 'format': _choice(operation, 'format', FORMATS, None)}
+    if operation.get('quality') is not None:
+        quality = _integer(operation, 'quality')
+        if not 1 <= quality <= 100:
+            raise ValueError("'quality' must be between 1 and 100")
+        transform['quality'] = quality
+    return transform
+
+
+OPERATION_PARSERS = {
+    'rotate': _parse_rotate,
+    'crop': _parse_crop,
+    'resize': _parse_resize,
+    'format': _parse_format,
+}
+
+
+def parse_operations(operations, width, height):
+    """
+    Validate the operations of a processing request against an image of the
+    given size, before anything is decoded, and return them in their stored form.
+    Raises ValueError naming the first invalid operation.
+    """
+    if not isinstance(operations, list) or not operations:
+        raise ValueError("Operations must be a non-empty list")
+    max_operations = getattr(settings, 'PROCESS_MAX_OPERATIONS', 20)
+    if len(operations) > max_operations:
+        raise ValueError(f"At most {max_operations} operations are allowed")
+    max_dimension = getattr(settings, 'PROCESS_MAX_DIMENSION', 20000)
+
+    transforms = []
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or operation.get('op') not in OPERATION_PARSERS:
+            raise ValueError(f"Operation {index}: 'op' must be one of {', '.join(OPERATION_PARSERS)}")
+        try:
+            transform = OPERATION_PARSERS[operation['op']](operation, width, height)
+            width, height = TRANSFORM_OPS[transform['op']].size(width, height, transform)
+            if width > max_dimension or height > max_dimension:
+                raise ValueError(f"The result would be larger than {max_dimension} pixels")
+        except ValueError as e:
+            raise ValueError(f"Operation {index}: {e}")
+        transforms.append(transform)
+    return transforms
+
+
+# Planning: rewrite a transform list into a cheaper equivalent one
+
+def _merge_rotations(first, second):
+    """
+    Return the single rotation equivalent to `first` followed by `second`, or None
+    when they cannot be merged. Two arbitrary rotations merge when they agree on
+    expand; the merged one resamples once instead of twice.
+    """
+    arbitrary = [op for op in (first, second) if not _is_right_angle(op['angle'])]
+    expand = {op['expand'] for op in arbitrary}
+    if len(expand) > 1:
+        return None
+    if len(arbitrary) == 1 and not arbitrary[0]['expand']:
+        # Without expand the frame keeps its orientation, so only a half turn commutes with it
+        right_angle = first['angle'] + second['angle'] - arbitrary[0]['angle']
+        if right_angle % 180 != 0:
+            return None
+    return rotation(
+        first['angle'] + second['angle'],
+        arbitrary[-1]['resample'] if arbitrary else 'bicubic',
+        expand.pop() if expand else False,
+    )
+
+
+def _region(transform, width, height):
+    """
+    The region of its width x height input that a crop or resize reads.
+    """
+    if transform['op'] == 'crop':
+        return [transform['left'], transform['top'], transform['right'], transform['bottom']]
+    return list(transform.get('box') or [0, 0, width, height])
+
+
+def _fuse_regions(first, second, width, height):
+    """
+    Fuse a crop or resize followed by a crop or resize into a single resize that
+    reads the final region straight from the input of `first`.
+    """
+    left, top, right, bottom = _region(first, width, height)
+    first_width, first_height = TRANSFORM_OPS[first['op']].size(width, height, first)
+    scale_x, scale_y = (right - left) / first_width, (bottom - top) / first_height
+    inner = _region(second, first_width, first_height)
+    box = [left + inner[0] * scale_x, top + inner[1] * scale_y, left + inner[2] * scale_x, top + inner[3] * scale_y]
+    resample = (second if second['op'] == 'resize' else first)['resample']
+    return resize(*TRANSFORM_OPS[second['op']].size(first_width, first_height, second), resample, box)
+
+
+def _unrotate_region(region, angle, width, height):
+    """
+    Map a region of an image rotated by a right angle back onto the width x height
+    image before the rotation.
+    """
+    left, top, right, bottom = region
+    if angle == 90:
+        return [width - bottom, left, width - top, right]
+    if angle == 180:
+        return [width - right, height - bottom, width - left, height - top]
+    return [top, height - right, bottom, height - left]
+
+
+def _move_before_rotation(transform, rotate, width, height):
+    """
+    The crop or resize that, run before a right-angle rotation of a width x height
+    image, gives the same result as `transform` run after it.
+    """
+    rotated_width, rotated_height = _rotated_size(width, height, rotate)
+    region = _unrotate_region(_region(transform, rotated_width, rotated_height), rotate['angle'], width, height)
+    if transform['op'] == 'crop':
+        return crop(*region)
+    new_width, new_height = transform['width'], transform['height']
+    if rotate['angle'] % 180:
+        new_width, new_height = new_height, new_width
+    return resize(new_width, new_height, transform['resample'], None if region == [0, 0, width, height] else region)
+
+
+def _is_identity(transform, width, height):
+    if transform['op'] == 'rotate':
+        return transform['angle'] == 0
+    if transform['op'] in ('crop', 'resize'):
+        return (
+            _region(transform, width, height) == [0, 0, width, height]
+            and TRANSFORM_OPS[transform['op']].size(width, height, transform) == (width, height)
+        )
+    return False
+
+
+def _rewrite_pair(first, second, width, height):
+    """
+    Return the operations replacing `first` followed by `second` on a width x height
+    input, or None when the pair is left as it is.
+    """
+    ops = (first['op'], second['op'])
+    if ops == ('rotate', 'rotate'):
+        merged = _merge_rotations(first, second)
+        return None if merged is None else [merged]
+    if ops == ('crop', 'crop'):
+        return [crop(
+            first['left'] + second['left'], first['top'] + second['top'],
+            first['left'] + second['right'], first['top'] + second['bottom'],
+        )]
+    if first['op'] in ('crop', 'resize') and second['op'] in ('crop', 'resize'):
+        return [_fuse_regions(first, second, width, height)]
+    if first['op'] == 'rotate' and _is_right_angle(first['angle']) and second['op'] in ('crop', 'resize'):
+        # Crop or shrink first, so that fewer pixels are rotated
+        if second['op'] == 'resize' and second['width'] * second['height'] >= width * height:
+            return None
+        return [_move_before_rotation(second, first, width, height), first]
+    return None
+
+
+def plan_transforms(transforms, width, height):
+    """
+    Rewrite the transform list of a width x height image into an equivalent one
+    that is cheaper to run:
+
+    - consecutive rotations are merged and whole turns are dropped,
+    - consecutive crops and resizes are fused into a single resize of a region
+      of the input, so a crop before or after a resize costs nothing extra,
+    - crops, and resizes that shrink the image, move ahead of right-angle
+      rotations, so fewer pixels are rotated,
+    - only the last format change is kept, at the end, since it only affects
+      the encoding.
+    """
+    formats = [transform for transform in transforms or [] if transform['op'] == 'format']
+    transforms = [transform for transform in transforms or [] if transform['op'] != 'format']
+
+    changed = True
+    while changed:
+        changed = False
+        sizes = [(width, height)]
+        for transform in transforms:
+            sizes.append(TRANSFORM_OPS[transform['op']].size(*sizes[-1], transform))
+
+        for index, transform in enumerate(transforms):
+            if _is_identity(transform, *sizes[index]):
+                del transforms[index]
+                changed = True
+                break
+            if index + 1 < len(transforms):
+                rewritten = _rewrite_pair(transform, transforms[index + 1], *sizes[index])
+                if rewritten is not None:
+                    transforms[index:index + 2] = rewritten
+                    changed = True
+                    break
+
+    if formats:
+        transforms.append(formats[-1])
+    return transforms
+
+
+# Cache keys
+
+def transforms_key(transforms):
+    """
+    Short digest identifying a transform list, empty for no transforms.
+    """
+    if not transforms:
+        return ''
+    return hashlib.sha256(json.dumps(transforms, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def content_key(image):
+    """
+    Identifies what an image looks like: its content digest, plus its transforms.
+    Caches of the transformed image (tiles, the materialized file) are keyed on it.
+    """
+    key = transforms_key(image.transforms)
+    return f'{content_sha256(image)}-{key}' if key else content_sha256(image)
+
+
+def shares_transformed_content(image):
+    """
+    Whether another image has the same content and the same transforms.
+    """
+    others = Image.objects.filter(sha256=image.sha256).exclude(pk=image.pk).values_list('transforms', flat=True)
+    return any((transforms or []) == (image.transforms or []) for transforms in others)
+
+
+# Encoding
+
+def _jpegtran_rotate(file_obj, angle):
+    """
+    Rotate a JPEG losslessly with jpegtran, which moves the DCT blocks without
+    decoding them. Returns None when jpegtran is not installed or when the image
+    size is not a whole number of blocks, since the partial edge blocks cannot
+    be moved losslessly.
+    """
+    jpegtran = getattr(settings, 'JPEGTRAN_PATH', None) or shutil.which('jpegtran')
+    if not jpegtran:
+        return None
+    file_obj.seek(0)
+    # jpegtran rotates clockwise
+    result = subprocess.run(
+        [jpegtran, '-copy', 'all', '-perfect', '-rotate', str(360 - int(angle))],
+        input=file_obj.read(),
+        capture_output=True,
+    )
+    if result.returncode != 0 or not result.stdout:
+        return None
+    return result.stdout
+
+
+def output_format(pil_image, transforms=None):
+    """
+    The format of a transformed image: the one set by a format operation, else
+    the format of the source, or PNG when that is not one of OUTPUT_EXTENSIONS.
+    """
+    for transform in reversed(transforms or []):
+        if transform['op'] == 'format':
+            return FORMATS[transform['format']]
+    return pil_image.format if pil_image.format in OUTPUT_EXTENSIONS else 'PNG'
+
+
+def _save_options(pil_image, image_format, transforms):
+    """
+    Encoder options that keep the transformed image as close as possible to the source.
+    Unless a quality is requested, a re-encoded JPEG reuses the quantization tables
+    and chroma subsampling of the original, so it is not degraded by a second set of tables.
+    """
+    options = {}
+    for key in ('icc_profile', 'exif'):
+        if pil_image.info.get(key):
+            options[key] = pil_image.info[key]
+
+    quality = next((t.get('quality') for t in reversed(transforms) if t['op'] == 'format'), None)
+    if quality is not None:
+        options['quality'] = quality
+    elif image_format == 'JPEG' and isinstance(pil_image, JpegImagePlugin.JpegImageFile):
+        options['qtables'] = pil_image.quantization
+        subsampling = JpegImagePlugin.get_sampling(pil_image)
+        if subsampling != -1:
+            options['subsampling'] = subsampling
+    return options
+
+
+def _encoder_mode(pil_image, image_format):
+    """
+    Convert an image to a mode the encoder of `image_format` can write.
+    """
+    modes = ENCODER_MODES.get(image_format)
+    if modes is None or pil_image.mode in modes:
+        return pil_image
+    has_alpha = pil_image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in pil_image.info
+    return pil_image.convert('RGBA' if has_alpha and 'RGBA' in modes else 'RGB')
+
+
+def _draft_first_resize(pil_image, transforms):
+    """
+    When the first operation resizes a JPEG, let the decoder downsample by a power
+    of two while decoding, and move the resized region to the reduced image.
+    Returns the transforms to run on the decoded image.
+    """
+    if pil_image.format != 'JPEG' or not transforms or transforms[0]['op'] != 'resize':
+        return transforms
+    first = transforms[0]
+    width, height = pil_image.size
+    left, top, right, bottom = _region(first, width, height)
+    pil_image.draft(pil_image.mode, (
+        math.ceil(first['width'] * width / (right - left)), math.ceil(first['height'] * height / (bottom - top)),
+    ))
+    if pil_image.size == (width, height):
+        return transforms
+    scale_x, scale_y = pil_image.width / width, pil_image.height / height
+    box = [left * scale_x, top * scale_y, right * scale_x, bottom * scale_y]
+    return [resize(first['width'], first['height'], first['resample'], box)] + transforms[1:]
+
+
+def render_transformed(file_obj, transforms):
+    """
+    Decode an image, apply its transforms and encode the result, in one pass.
+
+    A JPEG whose only transform is a right-angle rotation is rotated losslessly
+    with jpegtran when it is available. Returns (encoded_bytes, image_format).
+    """
+    with PILImage.open(file_obj) as pil_image:
+        image_format = output_format(pil_image, transforms)
+        if (
+            pil_image.format == 'JPEG' and len(transforms) == 1
+            and transforms[0]['op'] == 'rotate' and _is_right_angle(transforms[0]['angle'])
+        ):
+            data = _jpegtran_rotate(file_obj, transforms[0]['angle'])
+            if data is not None:
+                return data, image_format
+
+        transformed = apply_transforms(pil_image, _draft_first_resize(pil_image, transforms))
+        buffer = io.BytesIO()
+        _encoder_mode(transformed, image_format).save(
+            buffer, format=image_format, **_save_options(pil_image, image_format, transforms)
+        )
+    return buffer.getvalue(), image_format
+
+
+def transformed_name(key, extension):
+    """
+    Storage name of the cached transformed file of a content key, in the sharded
+    layout of the uploads: transformed/ab/cd/<key><extension>.
+    """
+    return sharded_path('transformed', f'{key}{extension}')
+
+
+def materialize(image):
+    """
+    Return the storage name and content type of the transformed file of an image,
+    encoding and caching it on first request. An image without transforms is its
+    own uploaded file.
+    """
+    with image.file.open('rb'), large_image_limit():
+        with PILImage.open(image.file) as pil_image:
+            image_format = output_format(pil_image, image.transforms)
+            source_format = pil_image.format
+        if not image.transforms:
+            return image.file.name, PILImage.MIME.get(source_format, 'application/octet-stream')
+
+        name = transformed_name(content_key(image), OUTPUT_EXTENSIONS[image_format])
+        if not default_storage.exists(name):
+            data, image_format = render_transformed(image.file, image.transforms)
+            stored_name = default_storage.save(name, ContentFile(data))
+            if stored_name != name:
+                # Another request cached the same file in the meantime
+                default_storage.delete(stored_name)
+    return name, PILImage.MIME[image_format]
+
+
+@contextmanager
+def open_transformed(image):
+    """
+    Open the transformed file of an image for reading, materializing it if needed.
+    """
+    name, content_type = materialize(image)
+    with default_storage.open(name, 'rb') as file_obj:
+        yield file_obj
+
+
+def release_transformed(image):
+    """
+    Delete the cached transformed file of an image, unless another image has the
+    same content and transforms.
+    """
+    if not image.transforms or not image.sha256 or shares_transformed_content(image):
+        return
+    delete_transformed_files(content_key(image))
+
+
+def delete_transformed_files(key):
+    """
+    Delete the cached transformed file of a content key, whatever its format.
+    """
+    for extension in OUTPUT_EXTENSIONS.values():
+        default_storage.delete(transformed_name(key, extension))
@@ -0,0 +1,626 @@
+import base64
+import hashlib
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from django.db import transaction
+from PIL import Image as PILImage
+from PyPDF2.errors import PdfReadError
+
+from .models import FileDeletion, Image, PDF, PDFPage, UploadChunk, UploadSession
+from .render_worker import open_document
+
+# Size of the blocks read from the request body when streaming an upload to disk
+UPLOAD_CHUNK_SIZE = getattr(settings, 'UPLOAD_CHUNK_SIZE', 64 * 1024)
+
+# Optional hard limit (in bytes) for streamed uploads, None disables the check
+MAX_UPLOAD_SIZE = getattr(settings, 'MAX_UPLOAD_SIZE', None)
+
+_batch_pool = None
+_batch_pool_lock = threading.Lock()
+
+# Threads inside large_image_limit, and Pillow's own limit to restore when the last one leaves
+_pixel_limit_users = 0
+_pixel_limit_default = None
+_pixel_limit_lock = threading.Lock()
+
+# Default extension given to stored files of each supported type
+FILE_EXTENSIONS = {
+    'image': '.png',
+    'pdf': '.pdf',
+}
+
+# Model and parsed metadata fields of each supported type
+DOCUMENT_MODELS = {
+    'image': Image,
+    'pdf': PDF,
+}
+METADATA_FIELDS = {
+    'image': ('width', 'height', 'channels'),
+    'pdf': ('num_pages', 'page_width', 'page_height'),
+}
+
+# Fields of a PDFPage that describe the page itself
+PAGE_FIELDS = ('page_number', 'width', 'height', 'mediabox', 'rotation', 'has_text', 'has_images')
+
+# A PDF starts with this header, readers accept it anywhere in the first PDF_HEADER_SEARCH bytes
+PDF_HEADER = b'%PDF-'
+PDF_HEADER_SEARCH = 1024
+
+
+class UploadError(Exception):
+    """
+    Raised when an upload is rejected before it reaches the storage backend.
+    """
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+class Sha256UploadHandler(FileUploadHandler):
+    """
+    Upload handler that hashes every multipart file while it streams in.
+
+    It must come first in FILE_UPLOAD_HANDLERS: chunks are passed on unchanged to
+    the handlers that store the file, and the hex digests are recorded on
+    request.upload_sha256, keyed by field name.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.digest = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.digest.update(raw_data)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if not hasattr(self.request, 'upload_sha256'):
+            self.request.upload_sha256 = {}
+        self.request.upload_sha256[self.field_name] = self.digest.hexdigest()
+        return None
+
+
+def file_sha256(file_obj):
+    """
+    Hash a file block by block, for files whose digest was not computed on the way in.
+    """
+    digest = hashlib.sha256()
+    file_obj.seek(0)
+    for block in iter(lambda: file_obj.read(UPLOAD_CHUNK_SIZE), b''):
+        digest.update(block)
+    file_obj.seek(0)
+    return digest.hexdigest()
+
+
+def base64_chunks(file_obj, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Encode a file to base64 block by block, yielding ASCII bytes.
+
+    Blocks are encoded in multiples of 3 bytes, so every piece ends on a whole
+    base64 quantum and the pieces join into the encoding of the whole file.
+    Only one block is held in memory at a time.
+    """
+    aligned_size = max(3, chunk_size - chunk_size % 3)
+    file_obj.seek(0)
+    pending = b''
+    while True:
+        block = file_obj.read(aligned_size - len(pending))
+        if not block:
+            break
+        pending += block
+        if len(pending) == aligned_size:
+            yield base64.b64encode(pending)
+            pending = b''
+    if pending:
+        yield base64.b64encode(pending)
+
+
+def base64_length(size):
+    """
+    Length of the base64 encoding of `size` bytes.
+    """
+    return 4 * ((size + 2) // 3)
+
+
+def unique_filename(file_type):
+    """
+    Generate a unique filename with the correct extension for the file type.
+    """
+    return f"{uuid.uuid4()}{FILE_EXTENSIONS[file_type]}"
+
+
+def _check_signature(file_type, head):
+    """
+    Cheap check on the first bytes of a stream so obviously wrong uploads
+    are rejected before the whole body has been written to disk.
+    """
+    if file_type == 'pdf' and PDF_HEADER not in head[:PDF_HEADER_SEARCH]:
+        raise UploadError("Invalid PDF file")
+
+
+def spool_stream(stream, file_type, content_type='application/octet-stream'):
+    """
+    Copy a raw request body into a temporary file block by block.
+
+    The returned TemporaryUploadedFile is backed by a real file on disk, so the
+    storage backend can move it into place instead of copying it again. The
+    content is hashed on the way and the hex digest is set as its `sha256`.
+    """
+    if stream is None:
+        raise UploadError("File data is required")
+
+    spooled = TemporaryUploadedFile(unique_filename(file_type), content_type, 0, None)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        while True:
+            chunk = stream.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            if size == 0:
+                _check_signature(file_type, chunk)
+            size += len(chunk)
+            if MAX_UPLOAD_SIZE is not None and size > MAX_UPLOAD_SIZE:
+                raise UploadError("File is too large", status_code=413)
+            digest.update(chunk)
+            spooled.write(chunk)
+    except Exception:
+        spooled.close()
+        raise
+
+    if size == 0:
+        spooled.close()
+        raise UploadError("File data is required")
+
+    spooled.size = size
+    spooled.sha256 = digest.hexdigest()
+    spooled.seek(0)
+    return spooled
+
+
+def max_image_pixels():
+    """
+    Largest image, in pixels, accepted on upload (MAX_IMAGE_PIXELS).
+    """
+    return getattr(settings, 'MAX_IMAGE_PIXELS', 25000 * 25000)
+
+
+@contextmanager
+def large_image_limit():
+    """
+    Let Pillow open images of up to max_image_pixels() inside the block.
+
+    Pillow's decompression bomb limit is a module global: it is raised while
+    any thread is inside the block and restored when the last one leaves. Only
+    upload headers, whose size is checked right away, and stored images, which
+    passed that check, are opened in such a block.
+    """
+    global _pixel_limit_users, _pixel_limit_default
+    with _pixel_limit_lock:
+        if _pixel_limit_users == 0:
+            _pixel_limit_default = PILImage.MAX_IMAGE_PIXELS
+            if _pixel_limit_default is not None:
+                PILImage.MAX_IMAGE_PIXELS = max(_pixel_limit_default, max_image_pixels())
+        _pixel_limit_users += 1
+    try:
+        yield
+    finally:
+        with _pixel_limit_lock:
+            _pixel_limit_users -= 1
+            if _pixel_limit_users == 0:
+                PILImage.MAX_IMAGE_PIXELS = _pixel_limit_default
+
+
+def inspect_image(file_obj):
+    """
+    Return (width, height, channels) for an image file.
+
+    PIL only parses the header here, the pixel data is never decoded.
+    Raises UnidentifiedImageError when the file is not an image, and
+    DecompressionBombError when it has more than max_image_pixels() pixels.
+    """
+    file_obj.seek(0)
+    with large_image_limit(), PILImage.open(file_obj) as pil_image:
+        width, height = pil_image.size
+        channels = len(pil_image.getbands())
+    file_obj.seek(0)
+    if width * height > max_image_pixels():
+        raise PILImage.DecompressionBombError(
+            f"Image size ({width * height} pixels) exceeds limit of {max_image_pixels()} pixels"
+        )
+    return width, height, channels
+
+
+def inspect_pdf(file_obj):
+    """
+    Return (num_pages, page_width, page_height, pages) for a PDF file.
+
+    page_width and page_height are those of the first page, `pages` holds the
+    unsaved PDFPage rows of every page (see read_pages).
+    Raises PdfReadError when the file is not a valid PDF.
+    """
+    # PyMuPDF also opens images and other documents, require the PDF header
+    file_obj.seek(0)
+    if PDF_HEADER not in file_obj.read(PDF_HEADER_SEARCH):
+        file_obj.seek(0)
+        raise PdfReadError("Missing PDF header")
+
+    if hasattr(file_obj, 'temporary_file_path'):
+        source = file_obj.temporary_file_path()
+    else:
+        file_obj.seek(0)
+        source = file_obj.read()
+    try:
+        pdf_document = open_document(source)
+    except (RuntimeError, ValueError) as e:
+        raise PdfReadError(str(e))
+    finally:
+        file_obj.seek(0)
+
+    try:
+        if not pdf_document.is_pdf:
+            raise PdfReadError("Not a PDF document")
+        pages = read_pages(pdf_document)
+    finally:
+        pdf_document.close()
+    if not pages:
+        raise PdfReadError("The PDF has no pages")
+    return len(pages), pages[0].width, pages[0].height, pages
+
+
+def read_pages(pdf_document):
+    """
+    Walk the page tree of an open document and return an unsaved PDFPage per page.
+
+    Only the page dictionaries and their resources are read: the mediabox and
+    rotation come from the page object, and a page has text when its resources
+    declare a font and images when they reference an image XObject. Content
+    streams are never parsed, so the cost does not depend on what the pages draw.
+    """
+    pages = []
+    for page_num in range(len(pdf_document)):
+        page = pdf_document.load_page(page_num)
+        mediabox = page.mediabox
+        pages.append(PDFPage(
+            page_number=page_num + 1,
+            width=mediabox.width,
+            height=mediabox.height,
+            mediabox=[mediabox.x0, mediabox.y0, mediabox.x1, mediabox.y1],
+            rotation=page.rotation,
+            has_text=bool(pdf_document.get_page_fonts(page_num)),
+            has_images=bool(pdf_document.get_page_images(page_num)),
+        ))
+    return pages
+
+
+def store_pages(pdf, pages, ignore_conflicts=False):
+    """
+    Insert the page rows of a PDF with a single bulk insert.
+    """
+    for page in pages:
+        page.pdf = pdf
+    PDFPage.objects.bulk_create(pages, ignore_conflicts=ignore_conflicts)
+
+
+def find_duplicate(file_type, sha256):
+    """
+    Return the oldest Image/PDF whose file has the given digest, or None.
+    """
+    return DOCUMENT_MODELS[file_type].objects.filter(sha256=sha256).order_by('id').first()
+
+
+def reuse_blob(file_type, name):
+    """
+    Claim a stored blob for a row about to be inserted in the current transaction.
+
+    The blob may have been queued for deletion when its last row was deleted
+    (see deletion.py): the queue entries are dropped, waiting for the sweeper if
+    it is processing them. Returns False when the sweeper has removed the file
+    already, in which case the upload has to be stored again.
+    """
+    FileDeletion.objects.filter(kind=FileDeletion.KIND_FILE, name=name).delete()
+    return _file_storage(file_type).exists(name)
+
+
+def create_document(file_type, file_obj, sha256=None):
+    """
+    Validate a file of the given type and create the matching Image or PDF row.
+
+    `file_obj` must be a Django File whose name is the final filename. When a
+    file with the same SHA-256 digest is already stored, the new row points at
+    the existing blob and copies its metadata: nothing is parsed or written.
+    """
+    if sha256 is None:
+        sha256 = file_sha256(file_obj)
+
+    model = DOCUMENT_MODELS[file_type]
+    existing = find_duplicate(file_type, sha256)
+    if existing is not None:
+        if file_type == 'image' and existing.transforms:
+            # The size of a transformed image is its transformed size, read the file's own
+            width, height, channels = inspect_image(file_obj)
+            metadata = {'width': width, 'height': height, 'channels': channels}
+        else:
+            metadata = {name: getattr(existing, name) for name in METADATA_FIELDS[file_type]}
+        document = model(file=existing.file.name, sha256=sha256, **metadata)
+        with transaction.atomic():
+            if reuse_blob(file_type, existing.file.name):
+                document.save()
+                if file_type == 'pdf':
+                    # The page table only depends on the content, copy it
+                    store_pages(document, [
+                        PDFPage(**{name: getattr(page, name) for name in PAGE_FIELDS})
+                        for page in existing.pages.all()
+                    ])
+                return document
+        # The blob was deleted since the duplicate was found, store this copy
+
+    if file_type == 'image':
+        width, height, channels = inspect_image(file_obj)
+        document = Image(file=file_obj, sha256=sha256, width=width, height=height, channels=channels)
+        document.save()
+        return document
+
+    num_pages, page_width, page_height, pages = inspect_pdf(file_obj)
+    document = PDF(file=file_obj, sha256=sha256, num_pages=num_pages, page_width=page_width, page_height=page_height)
+    with transaction.atomic():
+        document.save()
+        store_pages(document, pages)
+    return document
+
+
+def detect_file_type(file_obj):
+    """
+    Tell a PDF from an image by its first bytes.
+    """
+    file_obj.seek(0)
+    head = file_obj.read(PDF_HEADER_SEARCH)
+    file_obj.seek(0)
+    return 'pdf' if PDF_HEADER in head else 'image'
+
+
+def _get_batch_pool():
+    """
+    Return the process-wide pool validating the files of batch uploads, creating it on first use.
+    """
+    global _batch_pool
+    with _batch_pool_lock:
+        if _batch_pool is None:
+            _batch_pool = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'BATCH_UPLOAD_WORKERS', 4),
+                thread_name_prefix='upload-validator',
+            )
+        return _batch_pool
+
+
+def _inspect_batch_file(file_obj):
+    """
+    Hash and validate one file of a batch. Runs on the batch pool and never touches the database.
+    Returns (file_type, sha256, metadata, pages), or the exception that rejected the file.
+    """
+    try:
+        file_type = detect_file_type(file_obj)
+        sha256 = file_sha256(file_obj)
+        if file_type == 'image':
+            width, height, channels = inspect_image(file_obj)
+            return file_type, sha256, {'width': width, 'height': height, 'channels': channels}, None
+        num_pages, page_width, page_height, pages = inspect_pdf(file_obj)
+        return file_type, sha256, {'num_pages': num_pages, 'page_width': page_width, 'page_height': page_height}, pages
+    except Exception as e:
+        return e
+
+
+def _file_storage(file_type):
+    return DOCUMENT_MODELS[file_type]._meta.get_field('file').storage
+
+
+def _save_batch_file(file_type, file_obj):
+    field = DOCUMENT_MODELS[file_type]._meta.get_field('file')
+    filename = field.generate_filename(None, unique_filename(file_type))
+    return field.storage.save(filename, file_obj, max_length=field.max_length)
+
+
+def create_documents(files):
+    """
+    Validate and store many uploaded files (images and PDFs, told apart by their
+    content) at once.
+
+    The files are hashed and validated in parallel on the batch pool, then the
+    new blobs are written to storage, also in parallel. A file identical to one
+    already stored, or to an earlier file of the batch, reuses that blob. All
+    the rows are then inserted with bulk inserts in a single transaction; if
+    anything fails the blobs written so far are deleted and nothing is created.
+
+    Returns, for each file in order, the created Image/PDF or the exception
+    that rejected the file.
+    """
+    pool = _get_batch_pool()
+    results = list(pool.map(_inspect_batch_file, files))
+    accepted = [index for index, result in enumerate(results) if not isinstance(result, Exception)]
+
+    # Blobs already stored, by (type, digest)
+    blob_names = {}
+    for file_type, model in DOCUMENT_MODELS.items():
+        digests = {results[index][1] for index in accepted if results[index][0] == file_type}
+        for sha256, name in model.objects.filter(sha256__in=digests).order_by('-id').values_list('sha256', 'file'):
+            blob_names[(file_type, sha256)] = name
+
+    # Only the first file of each new content is written
+    to_write = {}
+    reused = {}
+    for index in accepted:
+        key = results[index][:2]
+        if key in blob_names:
+            reused.setdefault(key, index)
+        elif key not in to_write:
+            to_write[key] = index
+    futures = {key: pool.submit(_save_batch_file, key[0], files[index]) for key, index in to_write.items()}
+
+    written = []
+    try:
+        # Wait for every write, even after a failure, so none is left behind
+        errors = []
+        for key, future in futures.items():
+            try:
+                blob_names[key] = future.result()
+                written.append(key)
+            except Exception as e:
+                errors.append(e)
+        if errors:
+            raise errors[0]
+
+        documents = {file_type: [] for file_type in DOCUMENT_MODELS}
+        with transaction.atomic():
+            for key, index in reused.items():
+                if not reuse_blob(key[0], blob_names[key]):
+                    # The blob was deleted since it was looked up, store this copy
+                    blob_names[key] = _save_batch_file(key[0], files[index])
+                    written.append(key)
+            for index in accepted:
+                file_type, sha256, metadata, pages = results[index]
+                document = DOCUMENT_MODELS[file_type](file=blob_names[(file_type, sha256)], sha256=sha256, **metadata)
+                documents[file_type].append((document, pages))
+                results[index] = document
+            for file_type, model in DOCUMENT_MODELS.items():
+                model.objects.bulk_create([document for document, _ in documents[file_type]])
+            page_rows = []
+            for pdf, pages in documents['pdf']:
+                for page in pages:
+                    page.pdf = pdf
+                page_rows.extend(pages)
+            PDFPage.objects.bulk_create(page_rows)
+    except BaseException:
+        # Leave neither rows nor orphaned files behind
+        for key in written:
+            _file_storage(key[0]).delete(blob_names[key])
+        raise
+
+    return results
+
+
+class _AssembledFile(File):
+    """
+    A File wrapping the assembled upload on disk. Exposing temporary_file_path()
+    lets FileSystemStorage move it into place instead of copying it.
+    """
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def session_path(session):
+    """
+    Path of the file that the chunks of an upload session are written into.
+    """
+    return os.path.join(settings.UPLOAD_SESSION_DIR, str(session.id), 'data')
+
+
+def create_session(file_type, total_size=None):
+    """
+    Open a new upload session and create its (empty) data file.
+    """
+    if total_size is not None and MAX_UPLOAD_SIZE is not None and total_size > MAX_UPLOAD_SIZE:
+        raise UploadError("File is too large", status_code=413)
+
+    session = UploadSession.objects.create(file_type=file_type, total_size=total_size)
+    path = session_path(session)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    return session
+
+
+def write_chunk(session, index, offset, stream, checksum=None):
+    """
+    Write one chunk of an upload session at its byte offset.
+
+    The chunk is hashed while it is streamed to a file of its own, and rejected
+    if it does not match `checksum` (a hex SHA-256). Only a verified chunk is
+    copied into the session data, so re-sending a chunk with the same index
+    replaces the previous attempt only when the new one is good, and clients
+    can safely retry after a failure.
+    """
+    if session.status != UploadSession.STATUS_OPEN:
+        raise UploadError("Upload session is already committed", status_code=409)
+    if index < 0 or offset < 0:
+        raise UploadError("Chunk index and offset must not be negative")
+    if stream is None:
+        raise UploadError("Chunk data is required")
+
+    path = session_path(session)
+    digest = hashlib.sha256()
+    size = 0
+    with tempfile.TemporaryFile(dir=os.path.dirname(path)) as chunk_file:
+        while True:
+            block = stream.read(UPLOAD_CHUNK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            end = offset + size
+            if session.total_size is not None and end > session.total_size:
+                raise UploadError("Chunk extends past the declared file size")
+            if MAX_UPLOAD_SIZE is not None and end > MAX_UPLOAD_SIZE:
+                raise UploadError("File is too large", status_code=413)
+            digest.update(block)
+            chunk_file.write(block)
+
+        if size == 0:
+            raise UploadError("Chunk data is required")
+        if checksum and checksum.lower() != digest.hexdigest():
+            raise UploadError("Chunk checksum mismatch")
+
+        chunk_file.seek(0)
+        with open(path, 'r+b') as data_file:
+            data_file.seek(offset)
+            shutil.copyfileobj(chunk_file, data_file, UPLOAD_CHUNK_SIZE)
+
+    chunk, _ = UploadChunk.objects.update_or_create(
+        session=session,
+        index=index,
+        defaults={'offset': offset, 'size': size, 'sha256': digest.hexdigest()},
+    )
+    return chunk
+
+
+def assemble_session(session):
+    """
+    Check that the received chunks cover the whole file and return it as a File
+    named with the final filename, with its digest set as `sha256`.
+    """
+    expected_offset = 0
+    for chunk in session.chunks.order_by('offset'):
+        if chunk.offset != expected_offset:
+            raise UploadError(f"Missing data at offset {expected_offset}")
+        expected_offset += chunk.size
+
+    if expected_offset == 0:
+        raise UploadError("No chunks have been uploaded")
+    if session.total_size is not None and expected_offset != session.total_size:
+        raise UploadError(f"Missing data at offset {expected_offset}")
+
+    path = session_path(session)
+    with open(path, 'r+b') as data_file:
+        # Drop anything past the last chunk left over from an overwritten attempt
+        data_file.truncate(expected_offset)
+
+    assembled = _AssembledFile(open(path, 'rb'), name=unique_filename(session.file_type))
+    assembled.sha256 = file_sha256(assembled)
+    return assembled
+
+
+def discard_session_data(session):
+    """
+    Remove the on-disk data of an upload session.
+    """
+    shutil.rmtree(os.path.dirname(session_path(session)), ignore_errors=True)
@@ -1,10 +1,20 @@
 from django.urls import include, path
 from .views import *
+from .async_views import image_detail_async, image_list_async, pdf_detail_async, pdf_list_async, serve_media_async
 
 urlpatterns = [
     # Upload a file (image or PDF)
     path('upload/', upload_file, name='upload-file'),
 
+    # Upload many files in one request
+    path('upload/batch/', upload_batch, name='upload-batch'),
+
+    # Resumable upload sessions for large files
+    path('uploads/', upload_session_create, name='upload-session-create'),
+    path('uploads/<uuid:session_id>/', upload_session_detail, name='upload-session-detail'),
+    path('uploads/<uuid:session_id>/chunks/<int:index>/', upload_session_chunk, name='upload-session-chunk'),
+    path('uploads/<uuid:session_id>/commit/', upload_session_commit, name='upload-session-commit'),
+
     #file_to_base64 (image or PDF)
     path('file_to_base64/', file_to_base64, name='file_to_base64'),
 
@@ -20,18 +30,45 @@ urlpatterns = [
     # Retrieve details of a specific PDF
     path('pdfs/<int:id>/', pdf_detail, name='pdf-detail'),
 
+    # Render a single page of a PDF on demand
+    path('pdfs/<int:id>/pages/<int:page>/', pdf_page, name='pdf-page'),
+
+    # File of an image with its transforms applied
+    path('images/<int:id>/file/', image_file, name='image-file'),
+
+    # Deep-zoom tile pyramid of an image
+    path('images/<int:id>/tiles/', image_tiles, name='image-tiles'),
+    path('images/<int:id>/tiles/<int:z>/<int:x>/<int:y>', image_tile, name='image-tile'),
+
     # Delete a specific image
     path('images/delete/<int:id>', image_delete, name='image-delete'),
 
     # Delete a specific PDF
     path('pdfs/delete/<int:id>', pdf_delete, name='pdf-delete'),
 
+    # Delete many images or PDFs at once, by id or by filter
+    path('images/delete/', image_bulk_delete, name='image-bulk-delete'),
+    path('pdfs/delete/', pdf_bulk_delete, name='pdf-bulk-delete'),
+
     # Rotate an image
     path('rotate/', rotate_image, name='rotate-image'),
 
+    # Apply a list of operations to an image in one pass
+    path('images/<int:id>/process/', process_image, name='process-image'),
+
     # Convert a PDF to images
     path('convert_pdf_to_image/', convert_pdf_to_image, name='convert-pdf-to-image'),
 
+    # Progress of an asynchronous PDF conversion
+    path('jobs/<int:id>/', job_detail, name='job-detail'),
+
+    # Async variants of the read-heavy endpoints, for ASGI deployments
+    path('async/images/', image_list_async, name='image-list-async'),
+    path('async/pdfs/', pdf_list_async, name='pdf-list-async'),
+    path('async/images/<int:id>/', image_detail_async, name='image-detail-async'),
+    path('async/pdfs/<int:id>/', pdf_detail_async, name='pdf-detail-async'),
+    path('async/media/<path:name>', serve_media_async, name='media-async'),
+
 
 
 
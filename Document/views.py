@@ -1,24 +1,67 @@
-import io
-import os
-from django.http import Http404
-from django.shortcuts import get_object_or_404, render
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import parse_etags
+from django.views.decorators.http import require_safe
+from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Image, PDF
-from .serializers import ImageSerializer, PDFSerializer
+from rest_framework.utils.urls import replace_query_param
+from django.db import transaction
+from .imaging import schedule_derivatives
+from .db import reads_from_replica
+from .jobs import enqueue_conversion
+from .media import accel_response, file_response, media_access_allowed, normalize_name, stat_media_file
+from .models import ConversionJob, Image, PDF, UploadSession
+from .deletion import delete_images, delete_pdfs
+from .filters import IMAGE_FILTER_FIELDS, LOOKUPS, PDF_FILTER_FIELDS, filter_queryset, get_ordering
+from .pagination import KeysetPagination
+from .rendering import (
+    content_sha256, convert_pdf, ensure_page_table, page_etag, parse_render_options,
+    render_single_page,
+)
+from .tiles import delete_tiles, get_tile, max_level, tile_content_type, tile_size
+from .transforms import (
+    RESAMPLE_FILTERS, content_key, materialize, parse_operations, plan_transforms, release_transformed, rotation,
+    transformed_size,
+)
+from .serializers import (
+    ConversionJobSerializer, ImageSerializer, PDFPageSerializer, PDFSerializer, UploadChunkSerializer,
+    UploadSessionSerializer,
+)
+from .uploads import (
+    FILE_EXTENSIONS, UploadError, assemble_session, base64_chunks, base64_length, create_document, create_documents,
+    create_session, discard_session_data, inspect_image, spool_stream, unique_filename, write_chunk,
+)
 import base64
+import hashlib
 from django.core.files.base import ContentFile
-from PIL import Image as PILImage, UnidentifiedImageError
-from PyPDF2 import PdfReader
+from django.core.files.storage import default_storage
+from PIL import UnidentifiedImageError
 from PyPDF2.errors import PdfReadError
-import uuid  # For generating unique filenames
-import fitz  # PyMuPDF
 
 
 # Create your views here.
 @api_view(['POST'])
 def upload_file(request):
+    """
+    Upload an image or PDF.
+
+    Three request formats are accepted:
+    - application/json with a base64 string in 'file' and the 'type' field
+    - multipart/form-data with the file part in 'file' (or a base64 string) and the 'type' field
+    - a raw application/octet-stream body with the type given as ?type=image|pdf
+
+    The multipart and raw forms are streamed to a temporary file in chunks, so large
+    files are never held in memory as a whole.
+    """
+    content_type = request.content_type or ''
+
+    if content_type.startswith('application/octet-stream'):
+        return _upload_raw(request)
+    if 'file' in request.FILES:
+        return _upload_multipart(request)
+
     file_data = request.data.get('file')
     file_type = request.data.get('type')  # 'image' or 'pdf'
 
@@ -32,60 +75,279 @@ def upload_file(request):
         # Decode base64 file data
         decoded_file = base64.b64decode(file_data)
 
-        # Generate a unique filename with the correct extension
-        if file_type == 'image':
-            file_extension = '.png'  # Default extension for images
-        elif file_type == 'pdf':
-            file_extension = '.pdf'  # Default extension for PDFs
-        else:
+        if file_type not in FILE_EXTENSIONS:
             return Response({"error": "Invalid file type. Supported types: image, pdf"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Generate a unique filename
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_content = ContentFile(decoded_file, name=unique_filename)
+        file_content = ContentFile(decoded_file, name=unique_filename(file_type))
+        return _store_upload(file_type, file_content, hashlib.sha256(decoded_file).hexdigest())
 
-        if file_type == 'image':
-            try:
-                # Validate and process the image
-                pil_image = PILImage.open(file_content)
-                width, height = pil_image.size
-                channels = len(pil_image.getbands())
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-                image = Image(file=file_content, width=width, height=height, channels=channels)
-                image.save()
 
-                serializer = ImageSerializer(image)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+def _upload_raw(request):
+    """
+    Stream a raw request body to a temporary file and store it.
+    """
+    file_type = request.query_params.get('type')
+    if not file_type:
+        return Response({"error": "File type is required (image or pdf)"}, status=status.HTTP_400_BAD_REQUEST)
+    if file_type not in FILE_EXTENSIONS:
+        return Response({"error": "Invalid file type. Supported types: image, pdf"}, status=status.HTTP_400_BAD_REQUEST)
 
-            except UnidentifiedImageError:
-                return Response({"error": "Invalid image file"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        spooled = spool_stream(request.stream, file_type)
+    except UploadError as e:
+        return Response({"error": e.message}, status=e.status_code)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        elif file_type == 'pdf':
-            try:
-                # Validate and process the PDF
-                pdf_reader = PdfReader(file_content)
-                num_pages = len(pdf_reader.pages)
-                page_width = pdf_reader.pages[0].mediabox.width
-                page_height = pdf_reader.pages[0].mediabox.height
+    try:
+        return _store_upload(file_type, spooled, spooled.sha256)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    finally:
+        spooled.close()
+
+
+def _upload_multipart(request):
+    """
+    Store a multipart upload. Django's upload handlers have already written
+    large files to a temporary file in chunks while the body was parsed.
+    """
+    uploaded_file = request.FILES['file']
+    file_type = request.data.get('type')
+
+    if not file_type:
+        return Response({"error": "File type is required (image or pdf)"}, status=status.HTTP_400_BAD_REQUEST)
+    if file_type not in FILE_EXTENSIONS:
+        return Response({"error": "Invalid file type. Supported types: image, pdf"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        uploaded_file.name = unique_filename(file_type)
+        # Hashed while it was received by Sha256UploadHandler, when it is installed
+        sha256 = getattr(request, 'upload_sha256', {}).get('file')
+        return _store_upload(file_type, uploaded_file, sha256)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+def _store_upload(file_type, file_obj, sha256=None):
+    """
+    Validate the file, create the Image/PDF row and build the response.
+    A file identical to one already stored reuses the stored blob.
+    """
+    if file_type == 'image':
+        try:
+            image = create_document('image', file_obj, sha256)
+            schedule_derivatives(image)
+            serializer = ImageSerializer(image)
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        except UnidentifiedImageError:
+            return Response({"error": "Invalid image file"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        pdf = create_document('pdf', file_obj, sha256)
+        serializer = PDFSerializer(pdf)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    except PdfReadError:
+        return Response({"error": "Invalid PDF file"}, status=status.HTTP_400_BAD_REQUEST)
+
+@api_view(['POST'])
+def upload_batch(request):
+    """
+    Upload many images and PDFs in one multipart request, one 'files' part per file.
+
+    The files are validated in parallel and their rows inserted in a single
+    transaction (see uploads.create_documents). The response lists a result per
+    file, in order: its status and either the created document or the error.
+    The status code is 201 when every file was stored, 207 otherwise.
+    """
+    files = request.FILES.getlist('files')
+    if not files:
+        return Response({"error": "No files provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        names = [uploaded_file.name for uploaded_file in files]
+        documents = create_documents(files)
+
+        results = []
+        for index, (name, document) in enumerate(zip(names, documents)):
+            result = {"index": index, "name": name}
+            if isinstance(document, Image):
+                schedule_derivatives(document)
+                result.update(status=status.HTTP_201_CREATED, type='image', data=ImageSerializer(document).data)
+            elif isinstance(document, PDF):
+                result.update(status=status.HTTP_201_CREATED, type='pdf', data=PDFSerializer(document).data)
+            elif isinstance(document, UnidentifiedImageError):
+                result.update(status=status.HTTP_400_BAD_REQUEST, error="Invalid image file")
+            elif isinstance(document, PdfReadError):
+                result.update(status=status.HTTP_400_BAD_REQUEST, error="Invalid PDF file")
+            else:
+                result.update(status=status.HTTP_500_INTERNAL_SERVER_ERROR, error=f"An error occurred: {str(document)}")
+            results.append(result)
+
+        all_created = all(result["status"] == status.HTTP_201_CREATED for result in results)
+        return Response(
+            {"results": results},
+            status=status.HTTP_201_CREATED if all_created else status.HTTP_207_MULTI_STATUS
+        )
+
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+def upload_session_create(request):
+    """
+    Open a resumable upload session. The file is then sent with
+    upload_session_chunk and turned into an Image/PDF by upload_session_commit.
+    """
+    file_type = request.data.get('type')  # 'image' or 'pdf'
+    total_size = request.data.get('size')
+
+    if not file_type:
+        return Response({"error": "File type is required (image or pdf)"}, status=status.HTTP_400_BAD_REQUEST)
+    if file_type not in FILE_EXTENSIONS:
+        return Response({"error": "Invalid file type. Supported types: image, pdf"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        if total_size is not None:
+            total_size = int(total_size)
+            if total_size <= 0:
+                return Response({"error": "File size must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+
+        session = create_session(file_type, total_size)
+        serializer = UploadSessionSerializer(session)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    except UploadError as e:
+        return Response({"error": e.message}, status=e.status_code)
+    except ValueError:
+        return Response({"error": "File size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-                pdf = PDF(file=file_content, num_pages=num_pages, page_width=page_width, page_height=page_height)
-                pdf.save()
+@api_view(['GET', 'DELETE'])
+def upload_session_detail(request, session_id):
+    """
+    Report the chunks received by an upload session, or abort it.
+    """
+    try:
+        session = get_object_or_404(UploadSession, id=session_id)
+
+        if request.method == 'DELETE':
+            discard_session_data(session)
+            session.delete()
+            return Response(status=status.HTTP_204_NO_CONTENT)
+
+        serializer = UploadSessionSerializer(session)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    except Http404:
+        return Response({"error": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['PUT'])
+def upload_session_chunk(request, session_id, index):
+    """
+    Store one numbered chunk of an upload session.
+
+    The raw request body is the chunk data. Its position in the file is given by
+    the X-Chunk-Offset header, and an optional X-Chunk-SHA256 header is checked
+    against the received bytes.
+    """
+    offset = request.headers.get('X-Chunk-Offset')
+    if offset is None:
+        return Response({"error": "Chunk offset is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        session = get_object_or_404(UploadSession, id=session_id)
+        chunk = write_chunk(session, index, int(offset), request.stream, request.headers.get('X-Chunk-SHA256'))
+        serializer = UploadChunkSerializer(chunk)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    except Http404:
+        return Response({"error": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+    except UploadError as e:
+        return Response({"error": e.message}, status=e.status_code)
+    except ValueError:
+        return Response({"error": "Chunk offset must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['POST'])
+def upload_session_commit(request, session_id):
+    """
+    Assemble an upload session, validate it like upload_file and create the Image/PDF row.
+    Committing an already committed session returns the document it created.
+    """
+    try:
+        with transaction.atomic():
+            session = get_object_or_404(UploadSession.objects.select_for_update(), id=session_id)
 
-                serializer = PDFSerializer(pdf)
-                return Response(serializer.data, status=status.HTTP_201_CREATED)
+            if session.status == UploadSession.STATUS_COMMITTED:
+                if session.image is not None:
+                    return Response(ImageSerializer(session.image).data, status=status.HTTP_200_OK)
+                if session.pdf is not None:
+                    return Response(PDFSerializer(session.pdf).data, status=status.HTTP_200_OK)
+                return Response({"error": "Uploaded file no longer exists"}, status=status.HTTP_410_GONE)
 
+            assembled = assemble_session(session)
+            try:
+                document = create_document(session.file_type, assembled, assembled.sha256)
+            except UnidentifiedImageError:
+                return Response({"error": "Invalid image file"}, status=status.HTTP_400_BAD_REQUEST)
             except PdfReadError:
                 return Response({"error": "Invalid PDF file"}, status=status.HTTP_400_BAD_REQUEST)
+            finally:
+                assembled.close()
+
+            session.status = UploadSession.STATUS_COMMITTED
+            if session.file_type == 'image':
+                session.image = document
+                schedule_derivatives(document)
+                data = ImageSerializer(document).data
+            else:
+                session.pdf = document
+                data = PDFSerializer(document).data
+            session.save()
+
+        discard_session_data(session)
+        return Response(data, status=status.HTTP_201_CREATED)
 
+    except Http404:
+        return Response({"error": "Upload session not found."}, status=status.HTTP_404_NOT_FOUND)
+    except UploadError as e:
+        return Response({"error": e.message}, status=e.status_code)
     except Exception as e:
         return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# Streamed forms of file_to_base64: (content type, prefix, suffix)
+BASE64_STREAM_MODES = {
+    'json': ('application/json', b'{"base64": "', b'"}'),
+    'text': ('text/plain; charset=us-ascii', b'', b''),
+}
+
+
 #Extra API to get file in base64
 @api_view(['POST'])
 def file_to_base64(request):
     """
     Handles file uploads, validates the file type, and returns the base64-encoded string.
+
+    With ?stream=json or ?stream=text the encoding is streamed from the uploaded
+    file block by block, inside the usual {"base64": ...} JSON envelope or as
+    plain text, so memory use does not grow with the file size.
+    Images are validated from their header only.
     """
+    stream_mode = request.query_params.get('stream')
+    if stream_mode is not None and stream_mode not in BASE64_STREAM_MODES:
+        return Response(
+            {"error": f"Invalid stream mode. Supported modes: {', '.join(BASE64_STREAM_MODES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
     # Check if a file is provided in the request
     if 'file' not in request.FILES:
         return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
@@ -102,21 +364,19 @@ def file_to_base64(request):
         return Response({"error": "Unsupported file type"}, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        # Read the file content
-        file_content = uploaded_file.read()
-
         # If it's an image, validate it using PIL
         if file_extension in allowed_image_extensions:
             try:
-                # Open the image using PIL to validate it
-                img = PILImage.open(io.BytesIO(file_content))
-                img.verify()  # Verify that it is a valid image
-                img.close()
+                # Only the header is parsed, the pixel data is never decoded
+                inspect_image(uploaded_file)
             except Exception as e:
                 return Response({"error": f"Invalid image file: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
 
+        if stream_mode is not None:
+            return _stream_base64(uploaded_file, stream_mode)
+
         # Encode the file content to base64
-        base64_data = base64.b64encode(file_content).decode("utf-8")
+        base64_data = b''.join(base64_chunks(uploaded_file)).decode("utf-8")
 
         # Return the base64-encoded data
         return Response({"base64": base64_data}, status=status.HTTP_200_OK)
@@ -124,25 +384,67 @@ def file_to_base64(request):
     except Exception as e:
         return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
+def _stream_base64(uploaded_file, stream_mode):
+    """
+    Stream the base64 encoding of an uploaded file. The uploaded file stays open
+    until the response is closed, after the last block has been sent.
+    """
+    content_type, prefix, suffix = BASE64_STREAM_MODES[stream_mode]
+
+    def body():
+        if prefix:
+            yield prefix
+        yield from base64_chunks(uploaded_file)
+        if suffix:
+            yield suffix
+
+    response = StreamingHttpResponse(body(), content_type=content_type)
+    response['Content-Length'] = len(prefix) + base64_length(uploaded_file.size) + len(suffix)
+    return response
+
 @api_view(['GET'])
+@reads_from_replica
 def image_list(request):
+    """
+    List images one page at a time, oldest first unless 'ordering' is given.
+    Filters: uploaded_at, width, height and channels, each also with the
+    __gt/__gte/__lt/__lte suffixes (e.g. ?width__gte=4000).
+    See KeysetPagination for the 'cursor' and 'page_size' query parameters.
+    """
     try:
-        images = Image.objects.all()
+        queryset = filter_queryset(Image.objects.all(), request.query_params, IMAGE_FILTER_FIELDS)
+        paginator = KeysetPagination(get_ordering(request.query_params, IMAGE_FILTER_FIELDS))
+        images = paginator.paginate_queryset(queryset, request)
         serializer = ImageSerializer(images, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
+    except ValueError as ve:
+        return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@reads_from_replica
 def pdf_list(request):
+    """
+    List PDFs one page at a time, oldest first unless 'ordering' is given.
+    Filters: uploaded_at, num_pages, page_width and page_height, each also with the
+    __gt/__gte/__lt/__lte suffixes (e.g. ?num_pages__gt=50).
+    See KeysetPagination for the 'cursor' and 'page_size' query parameters.
+    """
     try:
-        pdfs = PDF.objects.all()
+        queryset = filter_queryset(PDF.objects.all(), request.query_params, PDF_FILTER_FIELDS)
+        paginator = KeysetPagination(get_ordering(request.query_params, PDF_FILTER_FIELDS))
+        pdfs = paginator.paginate_queryset(queryset, request)
         serializer = PDFSerializer(pdfs, many=True)
-        return Response(serializer.data)
+        return paginator.get_paginated_response(serializer.data)
+    except ValueError as ve:
+        return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@reads_from_replica
 def image_detail(request, id):
     try:
         # Attempt to fetch the image by ID
@@ -160,12 +462,30 @@ def image_detail(request, id):
         return Response({"error": f"An internal error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 @api_view(['GET'])
+@reads_from_replica
 def pdf_detail(request, id):
+    """
+    Return the details of a PDF.
+
+    With ?include=pages the response also carries its page table under 'pages':
+    at most 'pages_size' rows (LIST_PAGE_SIZE by default) following page
+    'pages_after' (0 by default), with the URL of the next rows in 'next'.
+    """
+    include_pages = 'pages' in request.query_params.get('include', '').split(',')
+    if include_pages:
+        try:
+            pages_after, pages_size = _page_table_window(request)
+        except ValueError as ve:
+            return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         # Attempt to fetch the PDF by ID
         pdf = get_object_or_404(PDF, id=id)
         serializer = PDFSerializer(pdf)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        data = serializer.data
+        if include_pages:
+            data['pages'] = _page_table(request, pdf, pages_after, pages_size)
+        return Response(data, status=status.HTTP_200_OK)
     except Http404:
         # Handle the case where the PDF is not found
         return Response({"error": "PDF not found."}, status=status.HTTP_404_NOT_FOUND)
@@ -176,12 +496,59 @@ def pdf_detail(request, id):
         # Catch any other unexpected errors
         return Response({"error": f"An internal error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _page_table_window(request):
+    """
+    Read the 'pages_after' and 'pages_size' query parameters of pdf_detail.
+    """
+    try:
+        pages_after = int(request.query_params.get('pages_after', 0))
+    except ValueError:
+        pages_after = -1
+    if pages_after < 0:
+        raise ValueError("pages_after must be a non-negative integer")
+
+    pages_size = request.query_params.get('pages_size')
+    if pages_size is None:
+        return pages_after, getattr(settings, 'LIST_PAGE_SIZE', 100)
+    try:
+        pages_size = int(pages_size)
+    except ValueError:
+        pages_size = 0
+    if pages_size <= 0:
+        raise ValueError("Page size must be a positive integer")
+    return pages_after, min(pages_size, getattr(settings, 'LIST_MAX_PAGE_SIZE', 1000))
+
+
+def _page_table(request, pdf, pages_after, pages_size):
+    """
+    One window of the page table of a PDF, fetched by page number range.
+    """
+    ensure_page_table(pdf)
+    rows = list(_page_table_rows(pdf, pages_after, pages_size))
+    return _page_table_body(request, pdf, rows, pages_size)
+
+
+def _page_table_rows(pdf, pages_after, pages_size):
+    # One extra row tells whether there is a next window
+    return pdf.pages.filter(page_number__gt=pages_after).order_by('page_number')[:pages_size + 1]
+
+
+def _page_table_body(request, pdf, rows, pages_size):
+    next_url = None
+    if len(rows) > pages_size:
+        rows = rows[:pages_size]
+        next_url = replace_query_param(request.build_absolute_uri(), 'pages_after', rows[-1].page_number)
+    return {
+        'count': pdf.num_pages,
+        'next': next_url,
+        'results': PDFPageSerializer(rows, many=True).data,
+    }
+
 @api_view(['DELETE'])
 def image_delete(request, id):
     try:
         image = get_object_or_404(Image, id=id)
-        image.file.delete()  # Delete the file from the filesystem
-        image.delete()  # Delete the record from the database
+        delete_images(Image.objects.filter(id=image.id))  # Its files go to the sweeper once nothing else uses them
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Exception as e:
         return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
@@ -190,14 +557,77 @@ def image_delete(request, id):
 def pdf_delete(request, id):
     try:
         pdf = get_object_or_404(PDF, id=id)
-        pdf.file.delete()  # Delete the file from the filesystem
-        pdf.delete()  # Delete the record from the database
+        delete_pdfs(PDF.objects.filter(id=pdf.id))  # Along with the pages rendered from it, see delete_pdfs
         return Response(status=status.HTTP_204_NO_CONTENT)
     except Exception as e:
         return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+def image_bulk_delete(request):
+    """
+    Delete many images at once, see _bulk_delete.
+    """
+    return _bulk_delete(request, Image, IMAGE_FILTER_FIELDS, delete_images)
+
+@api_view(['POST'])
+def pdf_bulk_delete(request):
+    """
+    Delete many PDFs at once, see _bulk_delete.
+    """
+    return _bulk_delete(request, PDF, PDF_FILTER_FIELDS, delete_pdfs)
+
+def _bulk_delete(request, model, fields, delete):
+    """
+    Delete the rows listed in 'ids', or matching 'filters', or both.
+
+    'filters' takes the filters of the list endpoint, e.g.
+    {"uploaded_at__lt": "2024-01-01T00:00:00Z"}. The rows are deleted in one
+    transaction and their files are removed afterwards by the background sweeper.
+    """
+    ids = request.data.get('ids')
+    filters = request.data.get('filters')
+
+    if ids is None and filters is None:
+        return Response({"error": "Either ids or filters is required"}, status=status.HTTP_400_BAD_REQUEST)
+    if ids is not None and (
+        not isinstance(ids, list) or not all(isinstance(value, int) and not isinstance(value, bool) for value in ids)
+    ):
+        return Response({"error": "ids must be a list of integers"}, status=status.HTTP_400_BAD_REQUEST)
+    if filters is not None:
+        if not isinstance(filters, dict) or not filters:
+            return Response({"error": "filters must be a non-empty object"}, status=status.HTTP_400_BAD_REQUEST)
+        allowed = {f'{name}__{lookup}' if lookup else name for name in fields for lookup in LOOKUPS}
+        unknown = sorted(set(filters) - allowed)
+        if unknown:
+            return Response({"error": f"Unsupported filter: {unknown[0]}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        queryset = model.objects.all()
+        if ids is not None:
+            queryset = queryset.filter(id__in=ids)
+        if filters is not None:
+            queryset = filter_queryset(queryset, filters, fields)
+    except ValueError as ve:
+        return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        deleted = delete(queryset)
+        return Response({"deleted": deleted}, status=status.HTTP_200_OK)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 @api_view(['POST'])
 def rotate_image(request):
+    """
+    Rotate an image counter-clockwise by 'angle' degrees.
+
+    The rotation is recorded in the image's transform list, merged with a
+    preceding rotation, and the file itself is left untouched: the rotated file
+    is only encoded when it is requested (GET /api/images/<id>/file/).
+    Multiples of 90 degrees are lossless pixel moves. Other angles are resampled
+    with the 'resample' filter (nearest, bilinear or bicubic, ROTATE_RESAMPLE by
+    default); 'expand' grows the image to keep the corners.
+    """
     image_id = request.data.get('image_id')
     angle = request.data.get('angle')
 
@@ -206,15 +636,23 @@ def rotate_image(request):
         return Response({"error": "Image ID is required"}, status=status.HTTP_400_BAD_REQUEST)
     if not angle:
         return Response({"error": "Rotation angle is required"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        angle = float(angle)
+    except (TypeError, ValueError):
+        return Response({"error": "Rotation angle must be a number"}, status=status.HTTP_400_BAD_REQUEST)
+
+    resample = str(request.data.get('resample') or getattr(settings, 'ROTATE_RESAMPLE', 'bicubic')).lower()
+    if resample not in RESAMPLE_FILTERS:
+        return Response(
+            {"error": f"Invalid resampling filter. Supported filters: {', '.join(RESAMPLE_FILTERS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    expand = _is_true(request.data.get('expand', getattr(settings, 'ROTATE_EXPAND', False)))
 
     try:
-        image = Image.objects.get(id=image_id)
-        pil_image = PILImage.open(image.file)
-        rotated_image = pil_image.rotate(int(angle))
-        buffer = io.BytesIO()
-        rotated_image.save(buffer, format='PNG')
-        image.file.save(f'rotated_{image.file.name}', ContentFile(buffer.getvalue()))
-        image.save()
+        with transaction.atomic():
+            image = Image.objects.select_for_update().get(id=image_id)
+            _update_transforms(image, [rotation(angle, resample, expand)])
 
         serializer = ImageSerializer(image)
         return Response(serializer.data, status=status.HTTP_200_OK)
@@ -224,50 +662,247 @@ def rotate_image(request):
     except Exception as e:
         return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+def process_image(request, id):
+    """
+    Apply an ordered list of operations ('operations') to an image: rotate,
+    crop, resize and format, e.g.
+    [{"op": "resize", "width": 800}, {"op": "crop", "left": 0, "top": 0, "right": 400, "bottom": 300},
+     {"op": "format", "format": "webp", "quality": 80}].
+
+    The whole list is validated before anything is decoded. It is then merged
+    with the image's transforms and planned (crops and resizes fused, crops moved
+    before rotations), and the result is produced by a single decode, transform
+    and encode pass when the file is requested.
+    """
+    operations = request.data.get('operations')
+
+    try:
+        with transaction.atomic():
+            image = get_object_or_404(Image.objects.select_for_update(), id=id)
+            try:
+                transforms = parse_operations(operations, image.width, image.height)
+            except ValueError as ve:
+                return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+            _update_transforms(image, transforms)
+
+        serializer = ImageSerializer(image)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    except Http404:
+        return Response({"error": "Image not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+def _update_transforms(image, transforms):
+    """
+    Append transforms to an image, plan the resulting list and update the row.
+    Nothing is decoded: the size comes from the file header and the transform list.
+    """
+    with image.file.open('rb'):
+        width, height, channels = inspect_image(image.file)  # Size of the untransformed file
+    transforms = plan_transforms((image.transforms or []) + transforms, width, height)
+
+    # Caches of the previous transforms are no longer reachable from this image
+    delete_tiles(image)
+    release_transformed(image)
+
+    image.transforms = transforms
+    image.width, image.height = transformed_size(width, height, transforms)
+    image.save(update_fields=['transforms', 'width', 'height'])
+    schedule_derivatives(image)
+
 @api_view(['POST'])
 def convert_pdf_to_image(request):
+    """
+    Convert every page of a PDF to an Image.
+
+    By default the pages are rendered inside the request. With "async": true the
+    conversion is queued and the response is a job that can be followed with job_detail.
+    The output is chosen with 'format' (png, jpeg, webp), 'quality' and 'compression'.
+    """
     pdf_id = request.data.get('pdf_id')
     if not pdf_id:
         return Response({"error": "PDF ID is required"}, status=status.HTTP_400_BAD_REQUEST)
 
+    try:
+        options = parse_render_options(request.data)
+    except ValueError as ve:
+        return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         # Get the PDF object
         pdf = PDF.objects.get(id=pdf_id)
-        pdf.file.seek(0)
-        pdf_content = pdf.file.read()
 
-        # Open the PDF using PyMuPDF
-        pdf_document = fitz.open(stream=pdf_content, filetype="pdf")
-        image_list = []
+        if _is_true(request.data.get('async')):
+            job = enqueue_conversion(pdf, options)
+            serializer = ConversionJobSerializer(job)
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
 
-        # Convert each page to an image
-        for page_num in range(len(pdf_document)):
-            page = pdf_document[page_num]
-            pix = page.get_pixmap()
-            img_data = pix.tobytes()
+        images = convert_pdf(pdf, options=options)
+        serializer = ImageSerializer(images, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
 
-            # Create a PIL Image object from the image data
-            pil_image = PILImage.open(io.BytesIO(img_data))
+    except PDF.DoesNotExist:
+        return Response({"error": "PDF not found"}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-            # Extract image metadata
-            width, height = pil_image.size
-            channels = len(pil_image.getbands())
+@api_view(['GET'])
+def pdf_page(request, id, page):
+    """
+    Render a single page (1-based) of a PDF on demand and return the image bytes.
 
-            # Save the image to a ContentFile
-            buffer = io.BytesIO()
-            pil_image.save(buffer, format="PNG")
-            image_file = ContentFile(buffer.getvalue(), name=f'page_{page_num+1}.png')
+    Accepts the 'output' (png, jpeg, webp), 'quality', 'compression' and 'scale'
+    or 'dpi' query parameters. The response carries a strong ETag derived from the PDF content,
+    the page and the render settings, so a matching If-None-Match gets a 304
+    without rendering anything.
+    """
+    try:
+        options = parse_render_options(request.query_params, format_param='output')
+    except ValueError as ve:
+        return Response({"error": str(ve)}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Save the image to the database
-            new_image = Image(file=image_file, width=width, height=height, channels=channels)
-            new_image.save()
+    try:
+        pdf = get_object_or_404(PDF, id=id)
+        if page < 1 or (pdf.num_pages is not None and page > pdf.num_pages):
+            raise IndexError(page)
 
-            # Serialize the image and add it to the response list
-            image_list.append(ImageSerializer(new_image).data)
+        etag = page_etag(content_sha256(pdf), page, options)
+        cache_control = f"public, max-age={getattr(settings, 'PAGE_CACHE_MAX_AGE', 3600)}"
 
-        return Response(image_list, status=status.HTTP_200_OK)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            data, content_type = render_single_page(pdf, page, options)
+            response = HttpResponse(data, content_type=content_type)
 
-    except PDF.DoesNotExist:
-        return Response({"error": "PDF not found"}, status=status.HTTP_404_NOT_FOUND)
+        response['ETag'] = etag
+        response['Cache-Control'] = cache_control
+        return response
+
+    except Http404:
+        return Response({"error": "PDF not found."}, status=status.HTTP_404_NOT_FOUND)
+    except IndexError:
+        return Response({"error": "Page not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def image_file(request, id):
+    """
+    Return the file of an image with its transforms applied.
+
+    The transformed file is encoded on the first request and cached, later
+    requests stream the cached copy. An image without transforms returns its
+    uploaded file.
+    """
+    try:
+        image = get_object_or_404(Image, id=id)
+        etag = '"%s"' % content_key(image)
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            name, content_type = materialize(image)
+            response = FileResponse(default_storage.open(name, 'rb'), content_type=content_type)
+
+        response['ETag'] = etag
+        return response
+
+    except Http404:
+        return Response({"error": "Image not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def image_tiles(request, id):
+    """
+    Describe the deep-zoom tile pyramid of an image: its size, the tile size, the
+    number of zoom levels and the tile format. Nothing is built until a tile is requested.
+    """
+    try:
+        image = get_object_or_404(Image, id=id)
+        return Response({
+            "width": image.width,
+            "height": image.height,
+            "tile_size": tile_size(),
+            "levels": max_level(image.width, image.height) + 1,
+            "content_type": tile_content_type(image),
+        }, status=status.HTTP_200_OK)
+    except Http404:
+        return Response({"error": "Image not found."}, status=status.HTTP_404_NOT_FOUND)
     except Exception as e:
-        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
\ No newline at end of file
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def image_tile(request, id, z, x, y):
+    """
+    Return tile (x, y) of zoom level z of an image.
+
+    The level is built and cached on disk by the first request that needs it.
+    Tiles only depend on the image content, so they carry a strong ETag and a
+    matching If-None-Match gets a 304.
+    """
+    try:
+        image = get_object_or_404(Image, id=id)
+        path = get_tile(image, z, x, y)
+
+        etag = '"%s"' % hashlib.sha256(f"{content_key(image)}:{tile_size()}:{z}:{x}:{y}".encode()).hexdigest()
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=tile_content_type(image))
+
+        response['ETag'] = etag
+        response['Cache-Control'] = f"public, max-age={getattr(settings, 'PAGE_CACHE_MAX_AGE', 3600)}"
+        return response
+
+    except Http404:
+        return Response({"error": "Image not found."}, status=status.HTTP_404_NOT_FOUND)
+    except IndexError:
+        return Response({"error": "Tile not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": f"An error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+@api_view(['GET'])
+def job_detail(request, id):
+    """
+    Report the progress of a conversion job and, once done, the created images.
+    """
+    try:
+        job = get_object_or_404(ConversionJob, id=id)
+        serializer = ConversionJobSerializer(job)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    except Http404:
+        return Response({"error": "Job not found."}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({"error": f"An internal error occurred: {str(e)}"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@require_safe
+def serve_media(request, name):
+    """
+    Serve a stored media file.
+
+    The file is only served while it may be (see media.media_access_allowed).
+    With MEDIA_ACCEL set the transfer is handed to the front proxy; otherwise
+    conditional requests are answered here, a single byte range is sent with
+    206 Partial Content and the whole file goes through FileResponse.
+    """
+    name = normalize_name(name)
+    if name is None or not media_access_allowed(name):
+        raise Http404("Media file not found.")
+    path, stat = stat_media_file(name)
+    return accel_response(name, path) or file_response(request, name, path, stat)
+
+
+def _is_true(value):
+    """
+    Interpret a boolean flag sent either as JSON or as a form/query string.
+    """
+    if isinstance(value, str):
+        return value.lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
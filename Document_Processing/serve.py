@@ -0,0 +1,37 @@
+"""
+Opt-in ASGI entry point: serves the ASGI application (asgi.py) with uvicorn.
+
+    python -m Document_Processing.serve
+
+The docker image runs the WSGI application with threaded gunicorn workers by
+default. Every endpoint except /api/async/ is a synchronous view, and under
+ASGI synchronous views run one at a time per worker, on the thread Django
+keeps for sync code, so a long conversion or media stream would hold up every
+other synchronous request of its worker. Run this server for the /api/async/
+routes only, e.g. behind a proxy that sends /api/async/ here and everything
+else to gunicorn.
+
+Configured from the environment:
+    HOST, PORT          address to bind (default 0.0.0.0:8000)
+    WEB_CONCURRENCY     number of worker processes (default 2)
+    FORWARDED_ALLOW_IPS addresses of the proxies trusted for X-Forwarded-* headers (default 127.0.0.1)
+"""
+import os
+
+import uvicorn
+
+
+def main():
+    uvicorn.run(
+        'Document_Processing.asgi:application',
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 8000)),
+        workers=int(os.environ.get('WEB_CONCURRENCY', 2)),
+        forwarded_allow_ips=os.environ.get('FORWARDED_ALLOW_IPS', '127.0.0.1'),
+        proxy_headers=True,
+        lifespan='off',  # Django does not implement the ASGI lifespan protocol
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -83,9 +83,54 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Writers take the lock when their transaction starts, and wait for it (see Document.db)
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+        # A file, not memory, so tests see the journaling used in production
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Runs the tests with temporary storage directories and removes the test database's WAL files
+TEST_RUNNER = 'Document_Processing.test_runner.DocumentTestRunner'
+
+#DATABASE
+# Set POSTGRES_DB (with POSTGRES_HOST, POSTGRES_PORT, POSTGRES_USER and POSTGRES_PASSWORD) to use PostgreSQL.
+# Connections are kept open for DB_CONN_MAX_AGE seconds, or pooled with POSTGRES_POOL_MAX_SIZE > 0 (psycopg 3 pool).
+# POSTGRES_REPLICA_HOST adds a 'replica' database that serves the list and detail reads (Document.db.ReadReplicaRouter).
+if os.environ.get('POSTGRES_DB'):
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ['POSTGRES_DB'],
+        'USER': os.environ.get('POSTGRES_USER', 'postgres'),
+        'PASSWORD': os.environ.get('POSTGRES_PASSWORD', ''),
+        'HOST': os.environ.get('POSTGRES_HOST', 'localhost'),
+        'PORT': os.environ.get('POSTGRES_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {},
+    }
+    POSTGRES_POOL_MAX_SIZE = int(os.environ.get('POSTGRES_POOL_MAX_SIZE', 0))
+    if POSTGRES_POOL_MAX_SIZE:
+        # The pool replaces persistent connections
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('POSTGRES_POOL_MIN_SIZE', 2)),
+            'max_size': POSTGRES_POOL_MAX_SIZE,
+            'timeout': 10,
+        }
+    if os.environ.get('POSTGRES_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['POSTGRES_REPLICA_HOST'],
+            'PORT': os.environ.get('POSTGRES_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+DATABASE_ROUTERS = ['Document.db.ReadReplicaRouter']
+# Journaling, lock wait in milliseconds and sync level applied to every SQLite connection
+SQLITE_JOURNAL_MODE = 'WAL'
+SQLITE_BUSY_TIMEOUT = 5000
+SQLITE_SYNCHRONOUS = 'NORMAL'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -132,3 +177,73 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+#MEDIA DELIVERY
+# Front proxy sending the files of /media/: 'nginx' (X-Accel-Redirect), 'sendfile' (X-Sendfile) or None to send them from Django
+MEDIA_ACCEL = None
+# Internal nginx location aliased to MEDIA_ROOT, used as the X-Accel-Redirect prefix
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+
+#UPLOADS
+# Directory holding the partial data of resumable upload sessions
+UPLOAD_SESSION_DIR = os.path.join(BASE_DIR, 'upload_sessions')
+# Multipart uploads are hashed while they stream in, for content deduplication
+FILE_UPLOAD_HANDLERS = [
+    'Document.uploads.Sha256UploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+# Most files accepted in one request, /api/upload/batch/ sends one part per file
+DATA_UPLOAD_MAX_NUMBER_FILES = 1000
+# Number of threads validating the files of a batch upload
+BATCH_UPLOAD_WORKERS = 4
+
+#BACKGROUND JOBS
+# Number of threads in the local pool that runs asynchronous PDF conversions
+CONVERSION_WORKERS = 2
+# Seconds without progress after which a running job is considered dead and claimed again, and claims allowed per job
+CONVERSION_JOB_STALE_SECONDS = 600
+CONVERSION_JOB_MAX_ATTEMPTS = 3
+# Hand the pending and stale jobs to the worker pool when the process serves its first request
+CONVERSION_RESUME_ON_START = True
+
+#PDF RENDERING
+# Number of processes used to render the pages of one PDF, 1 renders in the request process
+RENDER_WORKERS = 1
+
+#LIST ENDPOINTS
+# Default and maximum number of rows returned by one page of /api/images/ and /api/pdfs/
+LIST_PAGE_SIZE = 100
+LIST_MAX_PAGE_SIZE = 1000
+# Seconds that clients and proxies may cache a page from /api/pdfs/<id>/pages/<n>/
+PAGE_CACHE_MAX_AGE = 3600
+
+#MEDIA GARBAGE COLLECTION
+# Files checked per query by collect_media_garbage, and age under which a file is never collected
+MEDIA_GC_BATCH_SIZE = 1000
+MEDIA_GC_GRACE_SECONDS = 3600
+
+#IMAGE DERIVATIVES
+# Longest-side sizes of the downscaled copies generated for every uploaded image
+IMAGE_DERIVATIVE_SIZES = [128, 512, 2048]
+
+#IMAGE ROTATION
+# Resampling filter (nearest, bilinear, bicubic) and expand default for rotations by arbitrary angles
+ROTATE_RESAMPLE = 'bicubic'
+ROTATE_EXPAND = False
+# jpegtran binary used for lossless JPEG rotations, looked up on PATH when not set
+JPEGTRAN_PATH = None
+
+#IMAGE PROCESSING
+# Limits of the operation lists accepted by /api/images/<id>/process/
+PROCESS_MAX_OPERATIONS = 20
+PROCESS_MAX_DIMENSION = 20000
+
+#IMAGE TILES
+# Side in pixels of the deep-zoom tiles served by /api/images/<id>/tiles/<z>/<x>/<y>
+TILE_SIZE = 256
+# Directory caching the tile pyramids, one per image content
+TILE_CACHE_DIR = os.path.join(BASE_DIR, 'tile_cache')
+# Largest image, in pixels, accepted on upload. Pillow keeps its own limit (about 179 million) for any
+# other image; stored images, which passed this check, are decoded up to it (see uploads.large_image_limit)
+MAX_IMAGE_PIXELS = 25000 * 25000
@@ -0,0 +1,47 @@
+"""
+Test runner keeping test runs out of the working tree.
+
+The tests write uploads, upload sessions and tiles, and background tasks keep
+writing after the request that started them returned, so the storage settings
+point at a temporary directory for the whole run, which is removed once the
+worker pool is idle. The SQLite test database is a file in WAL mode (see the
+DATABASES setting); its -wal and -shm files are removed with it.
+"""
+import os
+import shutil
+import tempfile
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+from Document.jobs import shutdown_executor
+
+
+class DocumentTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.storage_root = tempfile.mkdtemp(prefix='document-tests-')
+        self.storage_override = override_settings(
+            MEDIA_ROOT=os.path.join(self.storage_root, 'media'),
+            UPLOAD_SESSION_DIR=os.path.join(self.storage_root, 'upload_sessions'),
+            TILE_CACHE_DIR=os.path.join(self.storage_root, 'tile_cache'),
+        )
+        self.storage_override.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        shutdown_executor()
+        self.storage_override.disable()
+        shutil.rmtree(self.storage_root, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        test_files = [
+            str(connection.settings_dict['NAME']) for connection in connections.all()
+            if connection.vendor == 'sqlite' and not connection.is_in_memory_db()
+        ]
+        super().teardown_databases(old_config, **kwargs)
+        for name in test_files:
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(name + suffix):
+                    os.remove(name + suffix)
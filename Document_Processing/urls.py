@@ -14,16 +14,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+from Document.views import serve_media
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('Document.urls')),  # Include the app's URLs
     path('', include('Document.urls')),  # Map root URL to your app's URLs
-
+    # Media files are served in every environment, see Document.media
+    re_path(r'^%s(?P<name>.+)$' % re.escape(settings.MEDIA_URL.lstrip('/')), serve_media, name='media'),
 ]
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
\ No newline at end of file
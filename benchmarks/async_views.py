@@ -0,0 +1,99 @@
+"""
+Benchmark: synchronous views against their async variants under ASGI.
+
+Drives the ASGI application in-process with many concurrent requests, so the
+numbers show how the views share one worker process rather than the network.
+Synchronous views run one at a time on the thread Django keeps for sync code;
+the async variants only go back to it for their queries.
+
+    python benchmarks/async_views.py --requests 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Document_Processing.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+
+def populate(images, pdf_size):
+    """
+    Create image rows and one stored PDF of `pdf_size` bytes. Returns the PDF name.
+    """
+    from django.core.files.base import ContentFile
+    from django.core.files.storage import default_storage
+    from Document.models import Image, PDF
+
+    Image.objects.bulk_create(
+        Image(file=f'images/scan_{index}.png', width=1000 + index, height=1400, channels=3) for index in range(images)
+    )
+    name = default_storage.save('pdfs/report.pdf', ContentFile(os.urandom(pdf_size)))
+    PDF.objects.create(file=name, num_pages=1)
+    return name
+
+
+async def run(urls, requests, concurrency, headers=None):
+    """
+    Send `requests` GETs cycling over `urls`, `concurrency` at a time. Returns requests per second.
+    """
+    from django.test import AsyncClient
+
+    client = AsyncClient()
+    queue = iter(range(requests))
+
+    async def worker():
+        for index in queue:
+            response = await client.get(urls[index % len(urls)], headers=headers or {})
+            assert response.status_code in (200, 206), response.status_code
+            if response.streaming and response.is_async:
+                async for _ in response.streaming_content:
+                    pass
+            elif response.streaming:
+                for _ in response.streaming_content:
+                    pass
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--pdf-size', type=int, default=8 * 1024 * 1024)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings.DATABASES['default']['NAME'] = os.path.join(tmp_dir, 'bench.sqlite3')
+        settings.MEDIA_ROOT = os.path.join(tmp_dir, 'media')
+        settings.ALLOWED_HOSTS = ['*']
+        django.setup()
+
+        from django.core.management import call_command
+
+        call_command('migrate', verbosity=0)
+        name = populate(500, args.pdf_size)
+
+        cases = [
+            ('image list', ['/api/images/?page_size=50'], ['/api/async/images/?page_size=50'], None),
+            ('image detail', [f'/api/images/{id}/' for id in range(1, 101)],
+             [f'/api/async/images/{id}/' for id in range(1, 101)], None),
+            ('media file', [f'/media/{name}'], [f'/api/async/media/{name}'], None),
+            ('media range', [f'/media/{name}'], [f'/api/async/media/{name}'], {'Range': 'bytes=1048576-2097151'}),
+        ]
+        print(f"{'endpoint':>14} {'sync req/s':>11} {'async req/s':>12} {'speedup':>8}")
+        for label, sync_urls, async_urls, headers in cases:
+            sync_rate = asyncio.run(run(sync_urls, args.requests, args.concurrency, headers))
+            async_rate = asyncio.run(run(async_urls, args.requests, args.concurrency, headers))
+            print(f"{label:>14} {sync_rate:>11.1f} {async_rate:>12.1f} {async_rate / sync_rate:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
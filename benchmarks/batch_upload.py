@@ -0,0 +1,98 @@
+"""
+Benchmark: N single uploads against batch uploads of the same files.
+
+Runs the API in-process against a throw-away SQLite database and media
+directory, so the numbers show the per-request and per-row overhead rather
+than the network.
+
+    python benchmarks/batch_upload.py --files 500 --batch-size 100
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Document_Processing.settings')
+
+import django  # noqa: E402
+from django.conf import settings  # noqa: E402
+from PIL import Image as PILImage  # noqa: E402
+
+
+def build_scans(count, first=0):
+    """
+    Small distinct PNG scans, so no upload is deduplicated.
+    """
+    scans = []
+    for index in range(first, first + count):
+        image_file = BytesIO()
+        PILImage.new('L', (200, 280), index % 256).save(image_file, 'PNG')
+        image_file.write(index.to_bytes(4, 'big'))  # Trailing bytes make every file unique
+        scans.append(image_file.getvalue())
+    return scans
+
+
+def run_single(client, scans):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    start = time.perf_counter()
+    for index, content in enumerate(scans):
+        response = client.post(
+            '/api/upload/', {'file': SimpleUploadedFile(f'scan_{index}.png', content), 'type': 'image'},
+            format='multipart'
+        )
+        assert response.status_code == 201, response.data
+    return len(scans) / (time.perf_counter() - start)
+
+
+def run_batch(client, scans, batch_size):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+
+    start = time.perf_counter()
+    for offset in range(0, len(scans), batch_size):
+        files = [
+            SimpleUploadedFile(f'scan_{offset + index}.png', content)
+            for index, content in enumerate(scans[offset:offset + batch_size])
+        ]
+        response = client.post('/api/upload/batch/', {'files': files}, format='multipart')
+        assert response.status_code == 201, response.data
+    return len(scans) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=300)
+    parser.add_argument('--batch-size', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings.DATABASES['default']['NAME'] = os.path.join(tmp_dir, 'bench.sqlite3')
+        settings.MEDIA_ROOT = os.path.join(tmp_dir, 'media')
+        settings.IMAGE_DERIVATIVE_SIZES = []  # Measure the uploads only
+        django.setup()
+
+        from django.core.management import call_command
+        from django.test.utils import setup_test_environment
+        from rest_framework.test import APIClient
+
+        setup_test_environment()
+        call_command('migrate', verbosity=0)
+        client = APIClient()
+
+        single = run_single(client, build_scans(args.files))
+        batch = run_batch(client, build_scans(args.files, first=args.files), args.batch_size)
+
+        # Let the background derivative tasks finish before the database goes away
+        from Document.jobs import _get_executor
+        _get_executor().shutdown(wait=True)
+
+        print(f"{'mode':>8} {'files/s':>10} {'speedup':>8}")
+        print(f"{'single':>8} {single:>10.1f} {1:>7.2f}x")
+        print(f"{'batch':>8} {batch:>10.1f} {batch / single:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: PDF page rendering throughput against the number of worker processes.
+
+Builds a synthetic PDF and renders it with the same slicing and worker function
+that Document.rendering uses, for each worker count.
+
+    python benchmarks/render_workers.py --pages 200 --workers 1 2 4 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from Document.render_worker import page_slices, render_page_range  # noqa: E402
+
+
+def build_pdf(path, pages):
+    """
+    Write a PDF with text and vector drawings on every page.
+    """
+    document = fitz.open()
+    for page_num in range(pages):
+        page = document.new_page(width=612, height=792)
+        for line in range(40):
+            page.insert_text((40, 40 + line * 18), f"Page {page_num + 1} line {line + 1} " * 4, fontsize=9)
+        for ring in range(30):
+            page.draw_circle((306, 396), 10 + ring * 8, color=(ring / 30, 0.2, 0.6))
+    document.save(path)
+    document.close()
+
+
+def run(path, page_count, workers):
+    """
+    Render all pages with the given number of workers and return pages per second.
+    The pool is started and warmed up before timing so process start-up is excluded.
+    """
+    if workers == 1:
+        start = time.perf_counter()
+        render_page_range(path, 0, page_count)
+        return page_count / (time.perf_counter() - start)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        list(pool.map(render_page_range, [path] * workers, [0] * workers, [1] * workers))
+
+        slices = page_slices(page_count, workers)
+        starts, stops = zip(*slices)
+        start = time.perf_counter()
+        list(pool.map(render_page_range, [path] * len(slices), starts, stops))
+        return page_count / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=120)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bench.pdf')
+        build_pdf(path, args.pages)
+
+        baseline = None
+        print(f"{'workers':>8} {'pages/s':>10} {'speedup':>8}")
+        for workers in sorted(set(args.workers)):
+            pages_per_second = run(path, args.pages, workers)
+            baseline = baseline or pages_per_second
+            print(f"{workers:>8} {pages_per_second:>10.1f} {pages_per_second / baseline:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()